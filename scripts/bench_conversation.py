@@ -0,0 +1,72 @@
+"""End-to-end conversation benchmark with no network and no API key.
+
+Drives the scripted conversations from bench_turns.py through the real
+CarScraperAgent: rules, LLM chains, cache, scraping and matching. Scraping
+goes to the local replay server. The model is the fake or replay backend
+(LLM_MODE), answering after --llm-latency-ms. Reports p50/p95 turn latency and
+the per-chain LLM metrics, so everything but the model itself is profiled.
+
+    PYTHONPATH=src python scripts/bench_conversation.py --llm-mode fake --llm-latency-ms 800
+    PYTHONPATH=src LLM_RECORDINGS=recordings.jsonl python scripts/bench_conversation.py --llm-mode replay
+"""
+import argparse
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import time
+
+from bench_scrape import _pct
+from replay_server import Corpus, ReplayServer
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--llm-mode", default="fake", choices=("fake", "replay"))
+    ap.add_argument("--llm-latency-ms", type=float, default=800.0)
+    ap.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    ap.add_argument("--latency-ms", type=float, default=20.0, help="replay server latency per page")
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+
+    server = ReplayServer(Corpus(), latency_ms=args.latency_ms, seed=1).start()
+    os.environ["DRIVE_BASE_URL"] = server.base_url  # must be set before car_agent.scraping is imported
+
+    from bench_turns import CONVERSATIONS  # imports car_agent
+    from car_agent.agent import CarScraperAgent
+    from car_agent.config import Settings
+    from car_agent.llm.cache import LLMCache, set_llm_cache
+    from car_agent.llm.instrumentation import LLMMetrics, get_llm_metrics, set_llm_metrics
+    from car_agent.scraping.http import DriveTransport, set_transport
+    from car_agent.scraping.http_cache import set_detail_cache
+    from car_agent.scraping.rate_limit import HostRateLimiter
+
+    settings = dataclasses.replace(Settings(), llm_mode=args.llm_mode, search_job_mode="inline",
+                                   llm_offline_latency_ms=args.llm_latency_ms,
+                                   llm_offline_jitter_ms=args.llm_jitter_ms)
+    set_transport(DriveTransport(limiter=HostRateLimiter(rate=1000.0, burst=8), backoff_base_s=0.01))
+    set_detail_cache(None)
+    set_llm_cache(LLMCache(None, max_entries=0))
+    set_llm_metrics(LLMMetrics())
+    agent = CarScraperAgent(settings, enable_aws=False)
+
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.repeat):
+            for turns in CONVERSATIONS:
+                session = {}
+                for message in turns:
+                    start = time.perf_counter()
+                    session = agent.process_conversation("bench", message, session)["session_data"]
+                    latencies.append(time.perf_counter() - start)
+    server.stop()
+
+    print(f"llm {args.llm_mode} ({args.llm_latency_ms}±{args.llm_jitter_ms} ms), pages {server.counts}")
+    print(f"turns {len(latencies)}  p50 {_pct(latencies, 50) * 1000:.1f} ms  "
+          f"p95 {_pct(latencies, 95) * 1000:.1f} ms  {agent.turn_stats.as_dict()}")
+    print(json.dumps(get_llm_metrics().snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
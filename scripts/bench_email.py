@@ -0,0 +1,83 @@
+"""Emails/sec for digest delivery against the local SES stand-in.
+
+Builds --queries recurring-query results spread over --recipients addresses.
+Two ways of sending them:
+- per query: the old path, one send_email per query from --senders threads
+  (queries finishing together), errors printed and dropped.
+- digest: DigestMailer, one templated digest per recipient, bulk sends paced by
+  the quota-sized token bucket, with retries and dead letters.
+
+    PYTHONPATH=src python scripts/bench_email.py --queries 2000 --recipients 500 --rate 50
+"""
+import argparse
+import contextlib
+import dataclasses
+import io
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from local_ses import LocalSES
+
+from car_agent.agent import format_results
+from car_agent.aws.digest import DigestCollector
+from car_agent.aws.emailer import DigestMailer, Emailer, FileDeadLetterStore
+from car_agent.config import Settings
+
+
+def results(n_queries, n_recipients, seed=9):
+    rng = random.Random(seed)
+    out = []
+    for q in range(n_queries):
+        listings = [{"name": f"{2015 + i % 9} Mazda CX-3 Maxx", "price": rng.randint(12000, 35000),
+                     "mileage": rng.randint(10, 150) * 1000, "year": 2015 + i % 9, "location": "VIC",
+                     "url": f"https://www.drive.com.au/cars-for-sale/car/{q * 100 + i}/"}
+                    for i in range(rng.randint(1, 12))]
+        out.append((f"user{rng.randrange(n_recipients)}@example.com", f"q{q}",
+                    {"make": "Mazda", "model": "CX-3", "location": "VIC"}, listings))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--recipients", type=int, default=500)
+    ap.add_argument("--rate", type=float, default=50.0, help="SES MaxSendRate of the stand-in")
+    ap.add_argument("--latency-ms", type=float, default=60.0, help="SES API round trip")
+    ap.add_argument("--failure-rate", type=float, default=0.01)
+    ap.add_argument("--senders", type=int, default=8, help="concurrent senders on the per-query path")
+    args = ap.parse_args()
+
+    work = results(args.queries, args.recipients)
+    settings = dataclasses.replace(Settings(), from_email="bench@example.com")
+
+    ses = LocalSES(max_send_rate=args.rate, latency_ms=args.latency_ms, seed=1)
+    emailer = Emailer(ses, settings)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=args.senders) as pool:
+        list(pool.map(lambda w: emailer.send_email(w[0], "New car listings", format_results(w[3])), work))
+    elapsed = time.perf_counter() - start
+    print(f"per query: {ses.counts['sent']:>5} of {len(work)} emails sent in {elapsed:>6.1f} s "
+          f"({ses.counts['sent'] / elapsed:>6.1f} emails/s), {len(work) - ses.counts['sent']} dropped")
+
+    ses = LocalSES(max_send_rate=args.rate, latency_ms=args.latency_ms, failure_rate=args.failure_rate, seed=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        dead = os.path.join(tmp, "dead_letters.jsonl")
+        mailer = DigestMailer(ses, settings, FileDeadLetterStore(dead))
+        collector = DigestCollector()
+        for email, qid, criteria, listings in work:
+            collector.add(email, qid, criteria, listings)
+        digests = collector.digests()
+        with contextlib.redirect_stdout(io.StringIO()):
+            delivered = mailer.send_digests(digests)
+        report = mailer.report
+        dead_count = sum(1 for _ in open(dead)) if os.path.exists(dead) else 0
+    print(f"digest:    {len(delivered):>5} of {len(digests)} digests sent in {report.wall_s:>6.1f} s "
+          f"({report.emails_per_s:>6.1f} emails/s, covering {len(work)} query results), "
+          f"{dead_count} dead-lettered  {report.as_dict()}  ses {dict(ses.counts)}")
+
+
+if __name__ == "__main__":
+    main()
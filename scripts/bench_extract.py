@@ -0,0 +1,104 @@
+"""Micro-benchmark: detail pages parsed per second, legacy BeautifulSoup path vs extract_detail.
+
+    python scripts/bench_extract.py [--seconds 3] [--fixtures scripts/fixtures/drive/detail]
+"""
+import argparse
+import glob
+import os
+import re
+import time
+import warnings
+
+from bs4 import BeautifulSoup
+
+from car_agent.scraping.extract import extract_detail
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# ----- legacy implementation (drive_scraper.scrape_detail_page before the extractor rewrite) -----
+
+def legacy_parse_price(text):
+    match = re.search(r'[\$]?([\d,]+\.?\d*)', text.replace('k', '000'))
+    return int(match.group(1).replace(',', '')) if match else 0
+
+
+def legacy_extract_year_from_title(text):
+    match = re.search(r'\b(20\d{2}|19\d{2})\b', text)
+    return int(match.group(1)) if match else 0
+
+
+def legacy_parse_mileage(soup):
+    for selector in ['[data-testid="mileage"]', '.mileage', '[class*="km"]', '[class*="mileage"]']:
+        el = soup.select_one(selector)
+        if el:
+            match = re.search(r'(\d{1,3}(?:,\d{3})*)', el.get_text())
+            if match:
+                return int(match.group(1).replace(',', ''))
+    match = re.search(r'(\d{1,3}(?:,\d{3})*)\s*km', soup.get_text(), re.I)
+    return int(match.group(1).replace(',', '')) if match else 0
+
+
+def legacy_parse_location(soup):
+    for selector in ['[data-testid="location"]', '.location', '[class*="location"]']:
+        el = soup.select_one(selector)
+        if el:
+            return el.get_text(strip=True).upper()
+    return "VIC"
+
+
+def legacy_parse(html, url):
+    soup = BeautifulSoup(html, 'lxml')
+    title_el = soup.find('h1') or soup.find('title')
+    name = title_el.get_text(strip=True) if title_el else "Unknown"
+    price_text = ""
+    for selector in ['[data-testid="price"]', '.price', '.listing-price', 'span:contains("$")', '[class*="price"]']:
+        el = soup.select_one(selector)
+        if el:
+            price_text = el.get_text(strip=True)
+            break
+    return {
+        "name": name,
+        "price": legacy_parse_price(price_text),
+        "year": legacy_extract_year_from_title(name),
+        "mileage": legacy_parse_mileage(soup) or 0,
+        "location": legacy_parse_location(soup) or "VIC",
+        "url": url,
+    }
+
+
+def bench(fn, pages, seconds):
+    n = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for name, html in pages:
+            fn(html, name)
+            n += 1
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--fixtures", default=os.path.join(HERE, "fixtures", "drive", "detail"))
+    args = ap.parse_args()
+
+    pages = [(os.path.basename(p), open(p, encoding="utf-8").read())
+             for p in sorted(glob.glob(os.path.join(args.fixtures, "*.html")))]
+    if not pages:
+        raise SystemExit(f"no fixtures in {args.fixtures}")
+
+    warnings.simplefilter("ignore", FutureWarning)  # legacy ':contains' selector
+    for name, html in pages:
+        old, new = legacy_parse(html, name), extract_detail(html, name)
+        print(f"{name}: legacy={ {k: old[k] for k in ('price', 'year', 'mileage', 'location')} }")
+        print(f"{' ' * len(name)}  new   ={ {k: new[k] for k in ('price', 'year', 'mileage', 'location')} } via {new['field_sources']}")
+
+    legacy_rate = bench(legacy_parse, pages, args.seconds)
+    new_rate = bench(extract_detail, pages, args.seconds)
+    print(f"\nlegacy (BeautifulSoup + select_one): {legacy_rate:8.1f} pages/s")
+    print(f"extract_detail (lxml single pass):   {new_rate:8.1f} pages/s  ({new_rate / legacy_rate:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Replay a skewed stream of chat messages through the cached extractors.
+
+Uses a simulated model (fixed latency + token count, no network) so the
+numbers show what the cache saves, not what OpenAI costs today. The second
+pass starts with an empty in-process LRU over the same SQLite file, i.e. a
+fresh Lambda container sharing the persistent tier.
+
+    PYTHONPATH=src python scripts/bench_llm_cache.py --messages 2000 --latency-ms 40
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
+
+from car_agent.llm import extractors
+from car_agent.llm.cache import LLMCache, SqliteLLMCacheStore, set_llm_cache
+
+MENU_REPLIES = ["1", "2", "1 ", "One", "one time", "2.", "regular updates"]
+SCHEDULES = ["weekly to x@y.com", "Daily updates to john@example.com", "every 3 days to sam@example.com"]
+CRITERIA = [
+    "Mazda CX-3 from 2020 under $25000",
+    "2018 Toyota Camry under $25,000 in Sydney",
+    "used Hyundai i30 automatic under 100000 km",
+    "Toyota RAV4 in VIC",
+]
+
+
+class SimulatedLLM(Runnable):
+    model_name = "simulated-gpt-4o-mini"
+
+    def __init__(self, latency_s, tokens):
+        self.latency_s = latency_s
+        self.tokens = tokens
+        self.calls = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency_s)
+        return AIMessage(content=json.dumps({}), usage_metadata={
+            "input_tokens": self.tokens - 20, "output_tokens": 20, "total_tokens": self.tokens})
+
+
+def workload(n, seed):
+    rng = random.Random(seed)
+    pool = MENU_REPLIES + SCHEDULES + CRITERIA
+    weights = [1.0 / (i + 1) for i in range(len(pool))]
+    msgs = rng.choices(pool, weights=weights, k=n)
+    # a tail of one-off searches that never repeat
+    return [m if rng.random() > 0.1 else f"{m} variant {i}" for i, m in enumerate(msgs)]
+
+
+def run(messages, llm, cache):
+    set_llm_cache(cache)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for msg in messages:
+            if "@" in msg:
+                extractors.extract_schedule_details(llm, msg)
+            else:
+                extractors.extract_car_criteria(llm, msg)
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=2000)
+    ap.add_argument("--latency-ms", type=float, default=40.0)
+    ap.add_argument("--tokens", type=int, default=450)
+    ap.add_argument("--max-entries", type=int, default=256)
+    args = ap.parse_args()
+
+    messages = workload(args.messages, seed=7)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteLLMCacheStore(os.path.join(tmp, "llm_cache.sqlite"))
+        for label in ("cold process", "warm shared tier"):
+            llm = SimulatedLLM(args.latency_ms / 1000.0, args.tokens)
+            cache = LLMCache(store, max_entries=args.max_entries)
+            wall = run(messages, llm, cache)
+            print(f"{label:<17} {len(messages)} msgs in {wall:6.2f}s, model calls {llm.calls:>4}, "
+                  f"{cache.stats.as_dict()}")
+
+    llm = SimulatedLLM(args.latency_ms / 1000.0, args.tokens)
+    wall = run(messages, llm, LLMCache(None, max_entries=0))
+    print(f"{'no cache':<17} {len(messages)} msgs in {wall:6.2f}s, model calls {llm.calls:>4}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Throughput of parse_listings_with_llm against a simulated model.
+
+The simulated model answers every listing in a batch with its index, in
+shuffled order, and leaves some out (--drop-rate) so retries are exercised.
+Its latency grows with prompt size. Reports listings/sec, tokens per listing
+and misplaced records (should always be 0) for each concurrency level.
+
+    PYTHONPATH=src python scripts/bench_llm_parser.py --listings 300 --drop-rate 0.05
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import re
+import threading
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
+
+from car_agent.scraping.llm_parser import LLMParseStats, count_tokens, parse_listings_with_llm
+
+_ITEM_RE = re.compile(r"^\[(\d+)\] .*?price (\d+)", re.M)
+
+
+class SimulatedListingLLM(Runnable):
+    model_name = "simulated-gpt-4o-mini"
+
+    def __init__(self, base_ms, per_1k_tokens_ms, drop_rate, seed=3):
+        self.base_s = base_ms / 1000.0
+        self.per_token_s = per_1k_tokens_ms / 1000.0 / 1000.0
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def invoke(self, input, config=None, **kwargs):
+        prompt = input.to_string() if hasattr(input, "to_string") else str(input)
+        tokens = count_tokens(prompt)
+        with self._lock:
+            items = [(int(i), int(p)) for i, p in _ITEM_RE.findall(prompt) if self.rng.random() >= self.drop_rate]
+            self.rng.shuffle(items)
+        listings = [{"index": i, "price": p, "make": "Mazda", "model": "CX-3"} for i, p in items]
+        time.sleep(self.base_s + tokens * self.per_token_s)
+        reply = json.dumps({"listings": listings})
+        out_tokens = count_tokens(reply)
+        return AIMessage(content=reply, usage_metadata={
+            "input_tokens": tokens, "output_tokens": out_tokens, "total_tokens": tokens + out_tokens})
+
+
+def snippets(n, seed=5):
+    rng = random.Random(seed)
+    filler = "Well maintained, full service history, one owner, log books, roadworthy included. "
+    return [f"{2012 + i % 12} Mazda CX-3 Maxx Sport price {10000 + i} "
+            f"{rng.randint(20, 180) * 1000} km VIC. " + filler * rng.randint(1, 25) for i in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--listings", type=int, default=300)
+    ap.add_argument("--drop-rate", type=float, default=0.05)
+    ap.add_argument("--base-ms", type=float, default=300.0)
+    ap.add_argument("--per-1k-tokens-ms", type=float, default=60.0)
+    ap.add_argument("--concurrency", default="1,2,4,8")
+    args = ap.parse_args()
+
+    texts = snippets(args.listings)
+    for c in (int(x) for x in args.concurrency.split(",")):
+        llm = SimulatedListingLLM(args.base_ms, args.per_1k_tokens_ms, args.drop_rate)
+        stats = LLMParseStats()
+        with contextlib.redirect_stdout(io.StringIO()):
+            records = parse_listings_with_llm(llm, texts, concurrency=c, stats=stats)
+        misplaced = sum(1 for i, r in enumerate(records) if r and r.get("price") != 10000 + i)
+        print(f"concurrency {c:>2}: {stats.listings_per_s:>7.1f} listings/s  "
+              f"{stats.tokens_per_listing:>6.1f} tokens/listing  batches {stats.batches:>3}  "
+              f"retried {stats.retried_listings:>3}  unresolved {stats.unresolved:>2}  misplaced {misplaced}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""GSI queries versus full-table scans on a large CarQueries table.
+
+Loads --items recurring queries (spread over --users users, --active-rate of
+them active and due) into a fresh table, then times "one user's queries" and
+"active queries that are due" both ways: Storage's GSI reads, and a paginated
+scan with a filter (what dynamodb_local_query.py used to do).
+
+    PYTHONPATH=src python scripts/dynamodb_local_bootstrap.py
+    PYTHONPATH=src python scripts/bench_query_vs_scan.py --items 100000
+    PYTHONPATH=src python scripts/bench_query_vs_scan.py --items 100000 --moto   # in-process, no Docker
+"""
+import argparse
+import dataclasses
+import random
+import time
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+
+from bench_scrape import _pct
+
+from car_agent.aws.storage import Storage
+from car_agent.aws.tables import create_tables
+from car_agent.config import Settings
+
+TABLE = "CarQueriesBench"
+
+
+def load(storage, n_items, n_users, active_rate, now, seed=7):
+    rng = random.Random(seed)
+    items = []
+    for i in range(n_items):
+        item = {
+            "query_id": f"q{i:07d}",
+            "user_id": f"user{rng.randrange(n_users):05d}",
+            "timestamp": f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}T00:00:{i % 60:02d}.{i:06d}",
+            "criteria": '{"make": "Mazda", "model": "CX-3"}',
+            "email": "bench@example.com",
+            "frequency": "rate(1 day)",
+            "active": rng.random() < active_rate,
+        }
+        if item["active"]:
+            item["status"] = "active"
+            item["next_run_at"] = now - rng.randint(-86400, 86400)  # about half are due
+        items.append(item)
+    start = time.perf_counter()
+    storage.batch_put(storage.queries_table, items, concurrency=8)
+    return time.perf_counter() - start
+
+
+def scan_all(table, filter_expression):
+    found = scanned = pages = 0
+    kwargs = {"FilterExpression": filter_expression}
+    while True:
+        resp = table.scan(**kwargs)
+        found += len(resp.get("Items", []))
+        scanned += resp.get("ScannedCount", 0)
+        pages += 1
+        if "LastEvaluatedKey" not in resp:
+            return found, scanned, pages
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def query_all(fn):
+    found = pages = 0
+    cursor = None
+    while True:
+        page = fn(cursor)
+        found += len(page.items)
+        pages += 1
+        cursor = page.cursor
+        if not cursor:
+            return found, found, pages
+
+
+def timed(label, fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found, read, pages = fn()
+        times.append(time.perf_counter() - start)
+    print(f"  {label:<6} p50 {_pct(times, 50) * 1000:>9.1f} ms  p95 {_pct(times, 95) * 1000:>9.1f} ms  "
+          f"returned {found:>6}  items read {read:>7}  pages {pages:>4}")
+
+
+def run(args, dynamodb):
+    settings = dataclasses.replace(Settings(), queries_table_name=TABLE)
+    create_tables(dynamodb, settings)
+    storage = Storage(dynamodb, settings)
+    now = int(time.time())
+    if storage.queries_table.item_count < args.items:
+        load_s = load(storage, args.items, args.users, args.active_rate, now)
+        print(f"loaded {args.items} queries in {load_s:.1f} s ({args.items / load_s:.0f} items/s)")
+
+    user = "user00042"
+    print(f"one user's queries ({user}):")
+    timed("query", lambda: query_all(lambda c: storage.list_user_queries(user, limit=100, cursor=c)), args.repeat)
+    timed("scan", lambda: scan_all(storage.queries_table, Attr("user_id").eq(user)), args.repeat)
+    print("due active queries:")
+    timed("query", lambda: query_all(lambda c: storage.list_due_queries(now=now, limit=1000, cursor=c,
+                                                                        projection=["query_id"])), args.repeat)
+    timed("scan", lambda: scan_all(storage.queries_table, Attr("active").eq(True) & Attr("next_run_at").lte(now)),
+          args.repeat)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--endpoint", default="http://localhost:8000")
+    ap.add_argument("--moto", action="store_true", help="use moto's in-process DynamoDB instead of DynamoDB Local")
+    ap.add_argument("--items", type=int, default=100_000)
+    ap.add_argument("--users", type=int, default=5_000)
+    ap.add_argument("--active-rate", type=float, default=0.1)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    if args.moto:
+        try:
+            from moto import mock_aws
+        except ImportError:
+            raise SystemExit("moto is not installed: pip install -r requirements-dev.txt")
+
+        with mock_aws():
+            run(args, boto3.resource("dynamodb", region_name="us-east-1"))
+        return
+    run(args, boto3.resource("dynamodb", endpoint_url=args.endpoint, region_name="us-east-1",
+                             aws_access_key_id="fake", aws_secret_access_key="fake"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Write throughput of Storage.store_search against DynamoDB Local.
+
+Creates the results table (HASH search_id, RANGE item_key) if it is missing,
+then stores synthetic result sets of increasing size. The old layout, one
+json.dumps blob on a single item, is written alongside for comparison; it
+fails once a result set passes DynamoDB's 400 KB item limit.
+
+    docker run -d --name dynamodb-local -p 8000:8000 amazon/dynamodb-local
+    PYTHONPATH=src python scripts/bench_result_writes.py --sizes 10,100,1000 --repeat 3
+    PYTHONPATH=src python scripts/bench_result_writes.py --moto   # in-process, no Docker
+"""
+import argparse
+import contextlib
+import dataclasses
+import io
+import json
+import random
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+from car_agent.aws.storage import Storage
+from car_agent.config import Settings
+
+TABLE = "CarSearchResultsBench"
+LEGACY_TABLE = "CarSearchResultsBenchLegacy"
+
+
+def results(n, description_chars, seed=11):
+    rng = random.Random(seed)
+    words = "service history one owner log books roadworthy tinted windows reverse camera".split()
+    out = []
+    for i in range(n):
+        out.append({
+            "url": f"https://www.drive.com.au/cars-for-sale/car/{100000 + i}/",
+            "source": "drive.com.au",
+            "name": f"{2012 + i % 12} Mazda CX-3 Maxx Sport",
+            "price": 12000 + rng.randint(0, 20000),
+            "year": 2012 + i % 12,
+            "mileage": rng.randint(10, 200) * 1000,
+            "location": "VIC",
+            "description": " ".join(rng.choice(words) for _ in range(description_chars // 8)),
+            "field_sources": {"price": "jsonld", "year": "jsonld", "mileage": "dom", "location": "card"},
+            "field_confidence": {"price": 0.95, "year": 0.95, "mileage": 0.8, "location": 0.8},
+        })
+    return out
+
+
+def ensure_table(dynamodb, name, key_schema, attrs):
+    try:
+        table = dynamodb.create_table(TableName=name, KeySchema=key_schema, AttributeDefinitions=attrs,
+                                      BillingMode="PAY_PER_REQUEST")
+        table.wait_until_exists()
+        return table
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ResourceInUseException":
+            raise
+        return dynamodb.Table(name)
+
+
+def run(args, dynamodb):
+    ensure_table(dynamodb, TABLE,
+                 [{"AttributeName": "search_id", "KeyType": "HASH"}, {"AttributeName": "item_key", "KeyType": "RANGE"}],
+                 [{"AttributeName": "search_id", "AttributeType": "S"}, {"AttributeName": "item_key", "AttributeType": "S"}])
+    legacy = ensure_table(dynamodb, LEGACY_TABLE,
+                          [{"AttributeName": "user_id", "KeyType": "HASH"}, {"AttributeName": "timestamp", "KeyType": "RANGE"}],
+                          [{"AttributeName": "user_id", "AttributeType": "S"}, {"AttributeName": "timestamp", "AttributeType": "S"}])
+    settings = dataclasses.replace(Settings(), results_table_name=TABLE)
+
+    for n in (int(x) for x in args.sizes.split(",")):
+        records = results(n, args.description_chars)
+        blob = json.dumps(records)
+        storage = Storage(dynamodb, settings)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for r in range(args.repeat):
+                storage.store_search(f"bench{r}", {"make": "Mazda"}, records, "one-time")
+        per_listing_s = (time.perf_counter() - start) / args.repeat
+
+        start = time.perf_counter()
+        legacy_note = ""
+        try:
+            for r in range(args.repeat):
+                legacy.put_item(Item={"user_id": f"bench{r}", "timestamp": f"{time.time():.6f}",
+                                      "criteria": "{}", "results": blob, "result_count": n})
+            legacy_s = (time.perf_counter() - start) / args.repeat
+        except ClientError as e:
+            legacy_s, legacy_note = None, f"rejected: {e.response['Error']['Code']}"
+
+        stats = storage.stats.as_dict()
+        legacy_text = f"{legacy_s * 1000:>8.1f} ms" if legacy_s is not None else legacy_note
+        print(f"{n:>6} listings ({len(blob) / 1024:>8.1f} KB json): per-listing {per_listing_s * 1000:>8.1f} ms "
+              f"({n / per_listing_s:>7.0f} listings/s)  single item {legacy_text}  {stats}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--endpoint", default="http://localhost:8000")
+    ap.add_argument("--moto", action="store_true", help="use moto's in-process DynamoDB instead of DynamoDB Local")
+    ap.add_argument("--sizes", default="10,100,1000")
+    ap.add_argument("--description-chars", type=int, default=1500)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    if args.moto:
+        try:
+            from moto import mock_aws
+        except ImportError:
+            raise SystemExit("moto is not installed: pip install -r requirements-dev.txt")
+
+        with mock_aws():
+            run(args, boto3.resource("dynamodb", region_name="us-east-1"))
+        return
+    run(args, boto3.resource("dynamodb", endpoint_url=args.endpoint, region_name="us-east-1",
+                             aws_access_key_id="fake", aws_secret_access_key="fake"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Recurring-runner throughput (queries/minute) against local stand-ins.
+
+Seeds --queries due recurring queries into moto's in-process DynamoDB. Their
+criteria are drawn from a few makes/models with varying price and year bounds,
+so many of them share a crawl. The runner then sweeps them with scraping
+against the replay server, the fake LLM backend and digests sent through the
+local SES stand-in. A second sweep after the queries are due again should email
+nothing, because every listing is already in each query's seen index.
+
+    PYTHONPATH=src python scripts/bench_runner.py --queries 200 --concurrency 4
+"""
+import argparse
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from local_ses import LocalSES
+from replay_server import Corpus, ReplayServer
+
+BASES = [
+    {"make": "Mazda", "model": "CX-5", "location": "VIC"},
+    {"make": "Mazda", "model": "CX-3", "location": "VIC"},
+    {"make": "Toyota", "model": "RAV4", "location": "VIC"},
+    {"make": "Toyota", "model": "Camry", "location": "NSW"},
+    {"make": "Hyundai", "model": "i30", "location": "VIC"},
+]
+
+
+def seed(storage, n, now, seed=5):
+    rng = random.Random(seed)
+    items = []
+    for i in range(n):
+        criteria = dict(rng.choice(BASES))
+        if rng.random() < 0.5:
+            criteria["price_max"] = rng.choice([20000, 30000, 40000])
+        if rng.random() < 0.3:
+            criteria["year_min"] = rng.choice([2015, 2018])
+        items.append({
+            "query_id": f"bench_{i:05d}", "user_id": f"user{i % 50}", "timestamp": f"2026-01-01T00:{i % 60:02d}",
+            "criteria": json.dumps(criteria), "email": f"user{i % 50}@example.com", "frequency": "rate(1 day)",
+            "end_date": "", "active": True, "status": "active", "next_run_at": int(now) - rng.randint(0, 3600),
+        })
+    storage.batch_put(storage.queries_table, items)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--latency-ms", type=float, default=20.0, help="replay server latency per page")
+    ap.add_argument("--llm-latency-ms", type=float, default=300.0)
+    ap.add_argument("--ses-rate", type=float, default=14.0, help="SES MaxSendRate of the stand-in")
+    args = ap.parse_args()
+
+    server = ReplayServer(Corpus(), latency_ms=args.latency_ms, seed=1).start()
+    os.environ["DRIVE_BASE_URL"] = server.base_url  # must be set before car_agent.scraping is imported
+
+    import boto3
+    try:
+        from moto import mock_aws
+    except ImportError:
+        raise SystemExit("moto is not installed: pip install -r requirements-dev.txt")
+
+    from car_agent.aws.emailer import DigestMailer, FileDeadLetterStore
+    from car_agent.aws.storage import Storage
+    from car_agent.aws.tables import create_tables
+    from car_agent.config import Settings
+    from car_agent.llm.client import build_llm
+    from car_agent.runner import RecurringRunner
+    from car_agent.scraping.coalesce import LocalLeaseStore
+    from car_agent.scraping.http import DriveTransport, set_transport
+    from car_agent.scraping.http_cache import set_detail_cache
+    from car_agent.scraping.rate_limit import HostRateLimiter
+
+    settings = dataclasses.replace(Settings(), llm_mode="fake", llm_offline_latency_ms=args.llm_latency_ms,
+                                   from_email="bench@example.com")
+    dead_letters = FileDeadLetterStore(os.path.join(tempfile.mkdtemp(), "dead_letters.jsonl"))
+    set_transport(DriveTransport(limiter=HostRateLimiter(rate=1000.0, burst=16), backoff_base_s=0.01))
+    set_detail_cache(None)
+
+    with mock_aws():
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+        create_tables(dynamodb, settings)
+        storage = Storage(dynamodb, settings)
+        now = time.time()
+        seed(storage, args.queries, now)
+
+        for label, at in (("first run", now), ("next day", now + 86400 + 60)):
+            ses = LocalSES(max_send_rate=args.ses_rate, latency_ms=50)
+            runner = RecurringRunner(settings, storage, DigestMailer(ses, settings, dead_letters),
+                                     llm=build_llm(settings),
+                                     lease_store=LocalLeaseStore(), concurrency=args.concurrency)
+            with contextlib.redirect_stdout(io.StringIO()):
+                report = runner.run(now=at)
+            print(f"{label:<10} {report.queries_per_min:>8.0f} queries/min  crawls {report.crawls:>3}  "
+                  f"emails {len(ses.outbox):>4}  {report.as_dict()}")
+            print(f"           coalescing: {runner.coalescer.report.as_dict()}")
+    server.stop()
+    print(f"replay server pages: {server.counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Offline scraper benchmark against the local replay server.
+
+Runs get_unique_listing_urls, scrape_detail_page and scrape_drive end to end
+against scripts/replay_server.py and reports pages/sec, p50/p95 latency,
+peak RSS and allocations. Results are written as JSON (default
+bench_results/scrape-<git sha>.json) so two commits can be compared:
+
+    python scripts/bench_scrape.py --latency-ms 50 --jitter-ms 20
+    python scripts/bench_scrape.py --compare bench_results/scrape-abc1234.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from replay_server import Corpus, ReplayServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+CRITERIA = {"make": "Mazda", "model": "CX-3", "listing_type": "used", "location": "vic",
+            "year_min": 2018, "price_max": 25000}
+
+
+def _git_sha():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def _peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_phase(name, server, fn, repeat):
+    """Time `fn` `repeat` times, then run it once more under tracemalloc."""
+    before = dict(server.counts)
+    latencies = []
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            t = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - t)
+    wall = time.perf_counter() - start
+    pages = sum(server.counts[k] - before[k] for k in ("search", "detail", "not_modified"))
+
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    snapshot = tracemalloc.take_snapshot()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+
+    result = {
+        "calls": repeat,
+        "pages": pages,
+        "wall_s": round(wall, 4),
+        "pages_per_s": round(pages / wall, 2) if wall else 0.0,
+        "p50_ms": round(_pct(latencies, 50) * 1000, 2),
+        "p95_ms": round(_pct(latencies, 95) * 1000, 2),
+        "alloc_peak_kb": round(alloc_peak / 1024, 1),
+        "alloc_live_blocks": blocks,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+    print(f"{name:<12} {result['pages_per_s']:>9.1f} pages/s  p50 {result['p50_ms']:>8.2f} ms  "
+          f"p95 {result['p95_ms']:>8.2f} ms  alloc peak {result['alloc_peak_kb']:>9.1f} KB  "
+          f"rss {result['peak_rss_mb']:.1f} MB")
+    return result
+
+
+def compare(current, previous):
+    print(f"\nvs {previous.get('git_sha')} ({previous.get('timestamp')}):")
+    for phase, cur in current["phases"].items():
+        prev = previous.get("phases", {}).get(phase)
+        if not prev:
+            continue
+        parts = []
+        for key in ("pages_per_s", "p50_ms", "p95_ms", "alloc_peak_kb"):
+            if prev.get(key):
+                parts.append(f"{key} {(cur[key] - prev[key]) / prev[key] * 100:+.1f}%")
+        print(f"  {phase:<12} " + "  ".join(parts))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--jitter-ms", type=float, default=10.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--max-results", type=int, default=20)
+    ap.add_argument("--rate", type=float, default=1000.0,
+                    help="per-host requests/s for the token bucket (the production default is much lower)")
+    ap.add_argument("--concurrency", type=int, default=None)
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--compare", default=None)
+    args = ap.parse_args()
+
+    server = ReplayServer(Corpus(), latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                          error_rate=args.error_rate, seed=1).start()
+    os.environ["DRIVE_BASE_URL"] = server.base_url  # must be set before car_agent.scraping is imported
+
+    from car_agent.scraping import drive_scraper
+    from car_agent.scraping.constants import DEFAULT_DETAIL_CONCURRENCY
+    from car_agent.scraping.http import DriveTransport, set_transport
+    from car_agent.scraping.http_cache import set_detail_cache
+    from car_agent.scraping.rate_limit import HostRateLimiter
+
+    concurrency = args.concurrency or DEFAULT_DETAIL_CONCURRENCY
+    set_transport(DriveTransport(limiter=HostRateLimiter(rate=args.rate, burst=concurrency), backoff_base_s=0.01))
+    set_detail_cache(None)
+
+    detail_urls = drive_scraper.get_unique_listing_urls(CRITERIA, max_page=1)
+    print(f"replay server {server.base_url}: {len(server.corpus.listings)} listings, "
+          f"{len(detail_urls)} detail URLs on page 1, latency {args.latency_ms}±{args.jitter_ms} ms\n")
+
+    phases = {
+        "search": run_phase("search", server, lambda: drive_scraper.get_unique_listing_urls(CRITERIA, max_page=1),
+                            args.repeat),
+        "detail": run_phase("detail", server, lambda: [drive_scraper.scrape_detail_page(u) for u in detail_urls],
+                            args.repeat),
+        "scrape_drive": run_phase("scrape_drive", server,
+                                  lambda: drive_scraper.scrape_drive(CRITERIA, None, max_results=args.max_results,
+                                                                     max_page=None, concurrency=concurrency),
+                                  args.repeat),
+    }
+    server.stop()
+
+    result = {
+        "git_sha": _git_sha(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "phases": phases,
+    }
+    out = args.out or os.path.join(ROOT, "bench_results", f"scrape-{result['git_sha']}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nwrote {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare search results with filters in the URL fragment vs real query parameters.
+
+For each query in fixtures/drive/search_queries.json, crawls every search page
+from the replay server twice: once the way build_drive_url used to (filters
+after '#', which never reach the server) and once with the current builder.
+Reports cards returned, cards that fail the criteria client-side and search
+pages fetched, i.e. how much the site now filters for us.
+
+    PYTHONPATH=src python scripts/bench_search_filters.py
+"""
+import contextlib
+import io
+import json
+import os
+
+from replay_server import Corpus, ReplayServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+QUERIES = os.path.join(HERE, "fixtures", "drive", "search_queries.json")
+
+
+def crawl(urls_for_page, card_filter, parse_search_cards, transport, max_pages=50):
+    """(cards returned, cards passing criteria, pages fetched) over all result pages."""
+    seen, passing, pages = set(), 0, 0
+    for page in range(1, max_pages + 1):
+        resp = transport.get(urls_for_page(page))
+        pages += 1
+        cards = [c for c in parse_search_cards(resp.text) if c["url"] not in seen]
+        if not cards:
+            break
+        for card in cards:
+            seen.add(card["url"])
+            passing += card_filter(card)
+    return len(seen), passing, pages
+
+
+def main():
+    server = ReplayServer(Corpus(), seed=1).start()
+    os.environ["DRIVE_BASE_URL"] = server.base_url  # must be set before car_agent.scraping is imported
+
+    from car_agent.scraping.drive_scraper import card_matches_criteria, parse_search_cards
+    from car_agent.scraping.drive_url import build_drive_url, search_params
+    from car_agent.scraping.http import get_transport
+
+    transport = get_transport()
+    with open(QUERIES) as f:
+        queries = json.load(f)
+
+    print(f"{'query':<58} {'fragment':>14} {'query params':>14} {'pages':>9}")
+    totals = [0, 0, 0, 0]
+    for criteria in queries:
+        base = build_drive_url(criteria).split("?", 1)[0]
+        fragment = "&".join(f"{k}={v}" for k, v in search_params(criteria))
+
+        def legacy(page, base=base, fragment=fragment):
+            # Only the path reaches the server; pagination is sent for real here so
+            # the full unfiltered result set is counted.
+            return f"{base}?page={page}#{fragment}" if page > 1 else f"{base}#{fragment}"
+
+        def current(page, criteria=criteria):
+            return build_drive_url(criteria, page=page)
+
+        def keep(card, criteria=criteria):
+            return card_matches_criteria(card, criteria)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            old = crawl(legacy, keep, parse_search_cards, transport)
+            new = crawl(current, keep, parse_search_cards, transport)
+        label = " ".join(f"{k}={v}" for k, v in criteria.items() if k != "listing_type")[:58]
+        print(f"{label:<58} {old[0]:>5} ({old[1]:>3} ok) {new[0]:>5} ({new[1]:>3} ok) {old[2]:>4}->{new[2]:<4}")
+        for i, v in enumerate((old[0], new[0], old[2], new[2])):
+            totals[i] += v
+
+    server.stop()
+    cut = (1 - totals[1] / totals[0]) * 100 if totals[0] else 0.0
+    print(f"\ncards returned: {totals[0]} -> {totals[1]} ({cut:.0f}% fewer); "
+          f"search pages: {totals[2]} -> {totals[3]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""One-time searches inside the chat turn vs background search jobs (no network, no API key).
+
+Runs the one-time-search conversations from bench_turns.py against the replay
+server (--latency-ms per page), with the fake LLM. Inline mode reports how long
+the "1" turn blocks. Job mode reports how long that turn takes to answer, plus
+the time until a poller (every --poll-ms) sees the first listing and the last
+one. Each user resubmits the same search with probability --resubmit while it
+runs, and the report counts how many crawls were actually started.
+
+    PYTHONPATH=src python scripts/bench_search_jobs.py --latency-ms 1000 --users 4 --resubmit 0.5
+"""
+import argparse
+import contextlib
+import dataclasses
+import io
+import os
+import random
+import time
+
+from bench_scrape import _pct
+from replay_server import Corpus, ReplayServer
+
+
+def criteria_turns(agent, conversations):
+    """(user_id, session_data) positioned just before each conversation's one-time choice."""
+    out = []
+    for i, turns in enumerate(conversations):
+        session = {}
+        for message in turns[:-1]:
+            session = agent.process_conversation(f"u{i}", message, session)["session_data"]
+        if session.get("state") == "ASK_UPDATE_TYPE":
+            out.append((f"u{i}", turns[-1], session))
+    return out
+
+
+def inline(agent, starts):
+    return [_timed(agent.process_conversation, user_id, choice, dict(session))[1]
+            for user_id, choice, session in starts]
+
+
+def with_jobs(agent, starts, poll_s, resubmit, rng):
+    acks, first, last = [], {}, []
+    pending = {}
+    for user_id, choice, session in starts:
+        result, ack = _timed(agent.process_conversation, user_id, choice, dict(session))
+        acks.append(ack)
+        pending[result["job_id"]] = (user_id, choice, session, time.perf_counter() - ack)
+    while pending:
+        time.sleep(poll_s)
+        for job_id, (user_id, choice, session, started) in list(pending.items()):
+            if rng.random() < resubmit:  # an impatient user asks again
+                agent.process_conversation(user_id, choice, dict(session))
+            poll = agent.poll_search(user_id, job_id)
+            if poll["listings"]:
+                first.setdefault(job_id, time.perf_counter() - started)
+            if poll["done"]:
+                last.append(time.perf_counter() - started)
+                del pending[job_id]
+    return acks, list(first.values()), last
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency-ms", type=float, default=200.0, help="replay server latency per page")
+    ap.add_argument("--users", type=int, default=4, help="copies of each conversation, as different users")
+    ap.add_argument("--workers", type=int, default=16, help="SEARCH_JOB_WORKERS (Lambda mode: one invocation per job)")
+    ap.add_argument("--poll-ms", type=float, default=100.0)
+    ap.add_argument("--resubmit", type=float, default=0.5, help="chance per poll that a user resubmits")
+    args = ap.parse_args()
+
+    server = ReplayServer(Corpus(), latency_ms=args.latency_ms, seed=1).start()
+    os.environ["DRIVE_BASE_URL"] = server.base_url  # must be set before car_agent.scraping is imported
+
+    from bench_turns import CONVERSATIONS  # imports car_agent
+    from car_agent.agent import CarScraperAgent
+    from car_agent.config import Settings
+    from car_agent.scraping.http import DriveTransport, set_transport
+    from car_agent.scraping.http_cache import set_detail_cache
+    from car_agent.scraping.rate_limit import HostRateLimiter
+
+    set_transport(DriveTransport(limiter=HostRateLimiter(rate=1000.0, burst=8), backoff_base_s=0.01))
+    set_detail_cache(None)
+    conversations = CONVERSATIONS * args.users
+    base = dataclasses.replace(Settings(), llm_mode="fake", search_job_workers=args.workers)
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for mode in ("inline", "thread"):
+            agent = CarScraperAgent(dataclasses.replace(base, search_job_mode=mode), enable_aws=False)
+            starts = criteria_turns(agent, conversations)
+            if mode == "inline":
+                results[mode] = inline(agent, starts)
+            else:
+                results[mode] = with_jobs(agent, starts, args.poll_ms / 1000, args.resubmit, random.Random(5))
+                stats = agent.search_jobs.stats.as_dict()
+    server.stop()
+
+    ms = lambda xs, q: _pct(xs, q) * 1000 if xs else 0.0  # noqa: E731
+    blocked = results["inline"]
+    acks, first, last = results["thread"]
+    print(f"{len(blocked)} one-time searches, replay latency {args.latency_ms:g} ms/page, {args.workers} workers")
+    print(f"inline   turn p50 {ms(blocked, 50):>7.0f} ms  p95 {ms(blocked, 95):>7.0f} ms")
+    print(f"jobs     turn p50 {ms(acks, 50):>7.1f} ms  p95 {ms(acks, 95):>7.1f} ms  "
+          f"first listing p50 {ms(first, 50):>6.0f} ms ({len(first)} jobs)  last p50 {ms(last, 50):>6.0f} ms  p95 {ms(last, 95):>6.0f} ms")
+    print(f"jobs     {stats}")
+
+
+if __name__ == "__main__":
+    main()
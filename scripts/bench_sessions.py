@@ -0,0 +1,99 @@
+"""Server-side sessions vs client round-tripped session_data.
+
+Replays bench_turns.CONVERSATIONS through two agents ("containers") that share
+a SQLite session store, with the fake LLM and scraping stubbed out. Each turn
+goes to the container that served the previous one with probability --sticky,
+otherwise to the other one. --retry-rate of turns are sent again with the
+same turn_id and the old token, as a client does when a response is lost.
+The report covers request/response bytes per turn for both protocols, session
+cache hits, store reads and conflicts, and how many retries were answered
+without running the turn again.
+
+    PYTHONPATH=src python scripts/bench_sessions.py --repeat 20 --sticky 0.7 --retry-rate 0.1
+"""
+import argparse
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from bench_scrape import _pct
+from bench_turns import CONVERSATIONS
+
+from car_agent.agent import CarScraperAgent
+from car_agent.config import Settings
+
+
+def legacy(agent, repeat):
+    sizes = []
+    for _ in range(repeat):
+        for turns in CONVERSATIONS:
+            session = {}
+            for message in turns:
+                request = {"user_id": "u1", "message": message, "session_data": session}
+                sent = len(json.dumps(request))
+                result = agent.process_conversation("u1", message, json.loads(json.dumps(session)))
+                session = result.get("session_data") or {}
+                sizes.append((sent, len(json.dumps(result))))
+    return sizes
+
+
+def with_sessions(agents, repeat, sticky, retry_rate, rng):
+    sizes, latencies = [], []
+    retries = replayed = 0
+    served = 0
+    for c in range(repeat):
+        for i, turns in enumerate(CONVERSATIONS):
+            token = None
+            for j, message in enumerate(turns):
+                if rng.random() > sticky:
+                    served = 1 - served
+                request = {"user_id": f"u{i}", "message": message, "session_token": token, "turn_id": f"{c}-{i}-{j}"}
+                start = time.perf_counter()
+                result = agents[served].converse(request["user_id"], message, token, request["turn_id"])
+                latencies.append((time.perf_counter() - start) * 1000)
+                sizes.append((len(json.dumps(request)), len(json.dumps(result))))
+                if rng.random() < retry_rate:
+                    retries += 1
+                    turns_before = sum(a.turn_stats.turns for a in agents)
+                    retry = agents[rng.randrange(2)].converse(request["user_id"], message, token, request["turn_id"])
+                    replayed += sum(a.turn_stats.turns for a in agents) == turns_before
+                    assert retry["response"] == result["response"]
+                token = result["session_token"]
+    return sizes, latencies, retries, replayed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--sticky", type=float, default=0.7, help="chance a turn hits the previous container")
+    ap.add_argument("--retry-rate", type=float, default=0.1)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = dataclasses.replace(Settings(), llm_mode="fake", search_job_mode="inline",
+                                       session_sqlite_path=os.path.join(tmp, "sessions.sqlite"))
+        agents = [CarScraperAgent(settings, enable_aws=False) for _ in range(3)]
+        for agent in agents:
+            agent.scrape_cars = lambda criteria: []
+        with contextlib.redirect_stdout(io.StringIO()):
+            old = legacy(agents.pop(), args.repeat)
+            new, latencies, retries, replayed = with_sessions(agents, args.repeat, args.sticky, args.retry_rate,
+                                                              random.Random(4))
+
+    for label, sizes in (("session_data", old), ("session_token", new)):
+        print(f"{label:<14} turns {len(sizes):>5}  request {sum(s for s, _ in sizes) / len(sizes):>6.0f} B  "
+              f"(max {max(s for s, _ in sizes):>4})  response {sum(r for _, r in sizes) / len(sizes):>6.0f} B")
+    stats = [a.sessions.stats.as_dict() for a in agents]
+    total = {k: sum(s[k] for s in stats) for k in stats[0]}
+    print(f"sessions       turn p50 {_pct(latencies, 50):.2f} ms  p95 {_pct(latencies, 95):.2f} ms  {total}")
+    print(f"retries        {retries} sent, {replayed} answered without re-running the turn; "
+          f"extractions reused: {sum(a.turn_stats.session_reuses for a in agents)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Per-turn latency of process_conversation with and without the rule-based fast path.
+
+Replays scripted conversations through CarScraperAgent with a simulated model
+(fixed latency, no network) and scraping stubbed out, then reports how many
+turns never reached the LLM and p50/p95 turn latency for each mode.
+
+    PYTHONPATH=src python scripts/bench_turns.py --latency-ms 800
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+
+from langchain_core.messages import AIMessage
+
+from bench_llm_cache import SimulatedLLM
+from bench_scrape import _pct
+
+from car_agent.agent import CarScraperAgent
+from car_agent.config import Settings
+from car_agent.llm.cache import LLMCache, set_llm_cache
+
+CONVERSATIONS = [
+    ["Mazda CX-3 used car from 2020 under $25000 in Victoria", "1"],
+    ["2018 Toyota Camry under $25,000 in Sydney", "2", "Send me daily updates to john@example.com, stop after 2025-12-31"],
+    ["I want a cx5 automatic under 80k km", "one time"],
+    ["used Hyundai i30 automatic under 100000 km in NSW", "2", "weekly to x@y.com"],
+    ["something cheap and reliable for a first car", "1"],
+    ["Toyota RAV4 in VIC", "regular updates", "every 3 days to sam@example.com until 2026-01-31"],
+    ["a Kia Sportage with low kms", "1"],
+    ["Mazda 3 2019 in Brisbane", "1"],
+]
+
+
+class ScriptedLLM(SimulatedLLM):
+    """Answers criteria prompts with criteria and schedule prompts with a schedule."""
+
+    def invoke(self, input, config=None, **kwargs):
+        message = super().invoke(input, config, **kwargs)
+        if "scheduling" in str(input):
+            content = {"email": "bench@example.com", "frequency": "rate(1 day)"}
+        else:
+            content = {"make": "Toyota", "model": "Corolla"}
+        return AIMessage(content=json.dumps(content), usage_metadata=message.usage_metadata)
+
+
+def run(fast_path, latency_s, repeat):
+    settings = Settings(openai_api_key="offline", rules_fast_path=fast_path, search_job_mode="inline")
+    agent = CarScraperAgent(settings, enable_aws=False)
+    agent.llm = ScriptedLLM(latency_s, tokens=450)
+    agent.scrape_cars = lambda criteria: []
+    set_llm_cache(LLMCache(None, max_entries=0))  # measure routing, not caching
+
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            for turns in CONVERSATIONS:
+                session = {}
+                for message in turns:
+                    start = time.perf_counter()
+                    session = agent.process_conversation("bench", message, session)["session_data"]
+                    latencies.append(time.perf_counter() - start)
+    return agent.turn_stats.as_dict(), latencies
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency-ms", type=float, default=800.0, help="simulated model round trip")
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+
+    for label, fast_path in (("llm only", False), ("rules first", True)):
+        stats, latencies = run(fast_path, args.latency_ms / 1000.0, args.repeat)
+        print(f"{label:<12} turns {stats['turns']:>3}  without LLM {stats['no_llm_rate']:>6.1%}  "
+              f"p50 {_pct(latencies, 50) * 1000:>8.2f} ms  p95 {_pct(latencies, 95) * 1000:>8.2f} ms  {stats}")
+
+
+if __name__ == "__main__":
+    main()
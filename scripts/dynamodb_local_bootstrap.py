@@ -0,0 +1,32 @@
+"""Create every table the agent uses, with its GSIs and TTL, on DynamoDB Local.
+
+Table names come from Settings (CAR_QUERIES_TABLE, CAR_RESULTS_TABLE, ...);
+tables that already exist are left alone.
+
+    docker run -d --name dynamodb-local -p 8000:8000 amazon/dynamodb-local
+    PYTHONPATH=src python scripts/dynamodb_local_bootstrap.py
+"""
+import argparse
+
+import boto3
+
+from car_agent.aws.tables import create_tables
+from car_agent.config import Settings
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--endpoint", default="http://localhost:8000")
+    args = ap.parse_args()
+
+    dynamodb = boto3.resource("dynamodb", endpoint_url=args.endpoint, region_name="us-east-1",
+                              aws_access_key_id="fake", aws_secret_access_key="fake")
+    created = create_tables(dynamodb, Settings())
+    print(f"created: {created or 'nothing (all tables exist)'}")
+    for table in dynamodb.tables.all():
+        indexes = [i["IndexName"] for i in table.global_secondary_indexes or []]
+        print(f"  {table.name}: {table.item_count} items, GSIs {indexes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 import boto3
 from datetime import datetime
 import json
+import time
+
+from car_agent.aws.storage import Storage
+from car_agent.aws.tables import create_tables
+from car_agent.config import Settings
 
 # Connect to DynamoDB Local (running on localhost:8000)
 dynamodb = boto3.resource(
@@ -13,23 +18,11 @@ dynamodb = boto3.resource(
 
 print("Connected to DynamoDB Local")
 
-# Create test table
-try:
-    table = dynamodb.create_table(
-        TableName='CarQueries',
-        KeySchema=[
-            {'AttributeName': 'query_id', 'KeyType': 'HASH'}  # Partition key
-        ],
-        AttributeDefinitions=[
-            {'AttributeName': 'query_id', 'AttributeType': 'S'}  # String type
-        ],
-        BillingMode='PAY_PER_REQUEST'
-    )
-    print(f"Created table: {table.table_name}")
-    table.wait_until_exists()
-except Exception as e:
-    print(f"Table may already exist: {e}")
-    table = dynamodb.Table('CarQueries')
+# Create the tables (with their GSIs) if they don't exist yet
+settings = Settings()
+print(f"Created tables: {create_tables(dynamodb, settings)}")
+storage = Storage(dynamodb, settings)
+table = storage.queries_table
 
 # Insert test data
 test_query = {
@@ -44,21 +37,30 @@ test_query = {
     'email': 'test@example.com',
     'frequency': 'rate(1 day)',
     'active': True,
-    'created_at': datetime.utcnow().isoformat()
+    'status': 'active',
+    'next_run_at': int(time.time()),
+    'timestamp': datetime.utcnow().isoformat()
 }
 
 table.put_item(Item=test_query)
 print(f"Inserted item with query_id: {test_query['query_id']}")
 
 # Retrieve and verify
-response = table.get_item(Key={'query_id': 'test_123'})
+item = storage.get_query('test_123', consistent=True)
 print(f"\nRetrieved item:")
-print(json.dumps(response['Item'], indent=2, default=str))
+print(json.dumps(item, indent=2, default=str))
+
+# List this user's queries through the user_id/timestamp index (no table scan)
+print("\nQueries for user_456:")
+cursor = None
+while True:
+    page = storage.list_user_queries('user_456', limit=25, cursor=cursor, projection=['query_id', 'email'])
+    for q in page.items:
+        print(f"  - {q['query_id']}: {q.get('email')}")
+    cursor = page.cursor
+    if not cursor:
+        break
 
-# List all items
-print("\nScanning all items in table:")
-scan_response = table.scan()
-for item in scan_response['Items']:
-    print(f"  - {item['query_id']}: {item.get('email')}")
+print(f"\nDue now: {[q['query_id'] for q in storage.list_due_queries(projection=['query_id']).items]}")
 
 print("\n✅ DynamoDB Local test successful!")
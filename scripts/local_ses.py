@@ -0,0 +1,119 @@
+"""In-process stand-in for the SES v1 client calls the agent makes.
+
+Enforces MaxSendRate as a token bucket holding one second of sends: a call
+that would overdraw it fails with Throttling, as SES does. Destinations fail
+with TransientFailure at `failure_rate`. Templated sends are rendered with
+aws/digest.py's renderer, so rendering cost is included, and kept in `outbox`
+or written as .eml files under `outbox_dir`.
+
+    from local_ses import LocalSES
+    ses = LocalSES(max_send_rate=14, latency_ms=80)
+    DigestMailer(ses, settings).send_digests(digests)
+"""
+import collections
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from email.message import EmailMessage
+
+from botocore.exceptions import ClientError
+
+from car_agent.aws.digest import render_digest
+
+
+def _error(code, message, op):
+    return ClientError({"Error": {"Code": code, "Message": message}}, op)
+
+
+class LocalSES:
+    def __init__(self, max_send_rate=14.0, max_24h=50000, latency_ms=0.0, failure_rate=0.0,
+                 outbox_dir=None, seed=None):
+        self.max_send_rate = max_send_rate
+        self.max_24h = max_24h
+        self.latency_s = latency_ms / 1000.0
+        self.failure_rate = failure_rate
+        self.outbox_dir = outbox_dir
+        self.rng = random.Random(seed)
+        self.outbox = []
+        self.templates = {}
+        self.counts = collections.Counter()
+        self._tokens = float(max_send_rate)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    # ----- quota / throttling -----
+
+    def get_send_quota(self):
+        return {"Max24HourSend": float(self.max_24h), "MaxSendRate": float(self.max_send_rate),
+                "SentLast24Hours": float(self.counts["sent"])}
+
+    def _admit(self, n, op):
+        time.sleep(self.latency_s)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.max_send_rate, self._tokens + (now - self._last) * self.max_send_rate)
+            self._last = now
+            if self._tokens + 1e-6 < n:
+                self.counts["throttled_calls"] += 1
+                raise _error("Throttling", "Maximum sending rate exceeded.", op)
+            self._tokens -= n
+
+    def _deliver(self, to, subject, text, html=None):
+        msg = EmailMessage()
+        msg["To"], msg["Subject"] = to, subject
+        msg.set_content(text)
+        if html:
+            msg.add_alternative(html, subtype="html")
+        with self._lock:
+            self.counts["sent"] += 1
+            self.outbox.append((to, subject))
+        if self.outbox_dir:
+            os.makedirs(self.outbox_dir, exist_ok=True)
+            with open(os.path.join(self.outbox_dir, f"{uuid.uuid4().hex}.eml"), "wb") as f:
+                f.write(bytes(msg))
+        return uuid.uuid4().hex
+
+    # ----- SES API -----
+
+    def create_template(self, Template):
+        with self._lock:
+            if Template["TemplateName"] in self.templates:
+                raise _error("AlreadyExists", "Template already exists", "CreateTemplate")
+            self.templates[Template["TemplateName"]] = Template
+        return {}
+
+    def update_template(self, Template):
+        with self._lock:
+            if Template["TemplateName"] not in self.templates:
+                raise _error("TemplateDoesNotExist", "Template does not exist", "UpdateTemplate")
+            self.templates[Template["TemplateName"]] = Template
+        return {}
+
+    def send_email(self, Source, Destination, Message):
+        self._admit(len(Destination["ToAddresses"]), "SendEmail")
+        for to in Destination["ToAddresses"]:
+            self._deliver(to, Message["Subject"]["Data"], Message["Body"]["Text"]["Data"])
+        return {"MessageId": uuid.uuid4().hex}
+
+    def send_bulk_templated_email(self, Source, Template, DefaultTemplateData, Destinations):
+        if Template not in self.templates:
+            raise _error("TemplateDoesNotExist", f"Template {Template} does not exist", "SendBulkTemplatedEmail")
+        if len(Destinations) > 50:
+            raise _error("InvalidParameterValue", "Too many destinations", "SendBulkTemplatedEmail")
+        self._admit(len(Destinations), "SendBulkTemplatedEmail")
+        status = []
+        for dest in Destinations:
+            with self._lock:
+                failed = self.rng.random() < self.failure_rate
+            if failed:
+                self.counts["transient_failures"] += 1
+                status.append({"Status": "TransientFailure", "Error": "simulated"})
+                continue
+            data = json.loads(dest.get("ReplacementTemplateData") or DefaultTemplateData)
+            subject, text, html = render_digest(data)
+            for to in dest["Destination"]["ToAddresses"]:
+                status.append({"Status": "Success", "MessageId": self._deliver(to, subject, text, html)})
+        return {"Status": status}
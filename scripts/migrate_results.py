@@ -0,0 +1,120 @@
+"""Copy stored searches from the old results table to the per-listing one.
+
+The old CarSearchResults table keys one item per search on HASH user_id,
+RANGE timestamp, with the listings as one JSON attribute. The new table
+(CAR_RESULTS_TABLE, default CarSearchResultsV2) keys on HASH search_id,
+RANGE item_key: a "#search" header plus one item per listing. DynamoDB cannot
+change a table's key schema in place, so the searches are copied across.
+
+Steps, each safe to re-run:
+1. create the new results table if it is missing
+2. rewrite every old search through Storage.store_search, keeping its
+   timestamp, so a search keeps its search_id (user_id#timestamp) and a
+   second run overwrites the same items
+
+The old table is only read; drop it once get_search finds the copies.
+
+    PYTHONPATH=src python scripts/migrate_results.py --dry-run
+    PYTHONPATH=src python scripts/migrate_results.py --moto --seed 200   # self-contained demo
+"""
+import argparse
+import dataclasses
+import json
+
+import boto3
+
+from car_agent.aws.storage import Storage
+from car_agent.aws.tables import create_tables
+from car_agent.config import Settings
+
+LEGACY_TABLE = "CarSearchResults"
+
+
+def seed_legacy(dynamodb, table_name, n):
+    """Old-style searches: one item per search, listings as a JSON string."""
+    table = dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[{"AttributeName": "user_id", "KeyType": "HASH"},
+                   {"AttributeName": "timestamp", "KeyType": "RANGE"}],
+        AttributeDefinitions=[{"AttributeName": "user_id", "AttributeType": "S"},
+                              {"AttributeName": "timestamp", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    with table.batch_writer() as batch:
+        for i in range(n):
+            results = [{"url": f"https://www.drive.com.au/cars-for-sale/car/{i}-{j}", "name": "2019 Mazda CX-5",
+                        "price": 20000 + j, "year": 2019, "mileage": 40000 + j, "location": "VIC"}
+                       for j in range(i % 7)]
+            batch.put_item(Item={"user_id": f"user{i % 50}", "timestamp": f"2026-01-01T00:{i // 60:02d}:{i % 60:02d}",
+                                 "criteria": json.dumps({"make": "Mazda"}), "results": json.dumps(results),
+                                 "query_type": "one_time", "result_count": len(results)})
+
+
+def legacy_searches(table):
+    kwargs = {}
+    while True:
+        resp = table.scan(**kwargs)
+        yield from resp.get("Items", [])
+        if "LastEvaluatedKey" not in resp:
+            return
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def migrate(dynamodb, settings, from_table, dry_run):
+    if from_table == settings.results_table_name:
+        raise SystemExit(f"--from-table and CAR_RESULTS_TABLE are both {from_table}: point CAR_RESULTS_TABLE "
+                         f"at the new table")
+    storage = Storage(dynamodb, settings)
+
+    if dry_run:
+        print(f"tables: (dry run) would create {settings.results_table_name} if missing")
+    else:
+        print(f"tables created: {create_tables(dynamodb, settings) or 'none'}")
+
+    searches = listings = failed = 0
+    for item in legacy_searches(dynamodb.Table(from_table)):
+        results = json.loads(item.get("results") or "[]")
+        searches += 1
+        listings += len(results)
+        if dry_run:
+            continue
+        search_id = storage.store_search(item["user_id"], json.loads(item.get("criteria") or "{}"), results,
+                                         item.get("query_type", ""), query_id=item.get("query_id"),
+                                         timestamp=item["timestamp"])
+        failed += search_id is None
+    verb = "to copy" if dry_run else "copied"
+    print(f"searches {verb}: {searches - failed} ({listings} listings) from {from_table} "
+          f"to {settings.results_table_name}, failed: {failed}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--from-table", default=LEGACY_TABLE)
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--moto", action="store_true", help="run against moto with --seed old-style searches")
+    ap.add_argument("--seed", type=int, default=200)
+    args = ap.parse_args()
+
+    settings = Settings()
+    if not args.moto:
+        migrate(boto3.resource("dynamodb", region_name=settings.aws_region), settings, args.from_table, args.dry_run)
+        return
+
+    try:
+        from moto import mock_aws
+    except ImportError:
+        raise SystemExit("moto is not installed: pip install -r requirements-dev.txt")
+    settings = dataclasses.replace(settings, aws_region="us-east-1")
+    with mock_aws():
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+        seed_legacy(dynamodb, args.from_table, args.seed)
+        migrate(dynamodb, settings, args.from_table, args.dry_run)
+        if not args.dry_run:
+            storage = Storage(dynamodb, settings)
+            header, page = storage.get_search("user1#2026-01-01T00:00:01")
+            print(f"get_search(user1#2026-01-01T00:00:01): {header['result_count']} listings, "
+                  f"first {page.items[0]['url'] if page.items else None}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Move recurring queries from per-query EventBridge schedules to schedule buckets.
+
+Steps, each safe to re-run:
+1. add the schedule_bucket GSI to the queries table if it is missing
+2. put every active query without a schedule_bucket into its bucket
+3. create the bucket schedules (one per interval and slot)
+4. delete the per-query car-scraper-<query_id> schedules
+
+Set SCHEDULE_MODE=bucket on the Lambda afterwards, so that new queries only get
+bucket membership. Between steps 3 and 4 a query can be fired by both of its
+schedules, and the runner skips whichever firing comes second because that
+query is no longer due.
+
+    PYTHONPATH=src python scripts/migrate_schedules.py --dry-run
+    PYTHONPATH=src python scripts/migrate_schedules.py --moto --seed 500   # self-contained demo
+"""
+import argparse
+import collections
+import dataclasses
+import json
+import time
+
+import boto3
+
+from car_agent.aws.scheduler import Scheduler, bucket_for
+from car_agent.aws.storage import Storage
+from car_agent.aws.tables import add_missing_indexes, create_tables
+from car_agent.config import Settings
+
+
+def seed_per_query(storage, scheduler, n):
+    """Old-style queries: no schedule_bucket, one schedule each."""
+    items = []
+    for i in range(n):
+        query_id = f"user{i % 50}_{1700000000 + i}"
+        frequency = ["rate(1 day)", "rate(7 days)", "rate(6 hours)", "rate(2 days)"][i % 4]
+        items.append({"query_id": query_id, "user_id": f"user{i % 50}", "timestamp": f"2026-01-01T00:{i % 60:02d}",
+                      "criteria": json.dumps({"make": "Mazda"}), "email": f"user{i % 50}@example.com",
+                      "frequency": frequency, "end_date": "", "active": True, "status": "active",
+                      "next_run_at": int(time.time())})
+        old = dataclasses.replace(scheduler._settings, schedule_mode="query")
+        Scheduler(scheduler._client, old).create_schedule(query_id, {"frequency": frequency})
+    storage.batch_put(storage.queries_table, items)
+
+
+def active_queries(table):
+    kwargs = {"ProjectionExpression": "query_id, frequency, schedule_bucket, #s",
+              "FilterExpression": "attribute_exists(#s)", "ExpressionAttributeNames": {"#s": "status"}}
+    while True:
+        resp = table.scan(**kwargs)
+        yield from resp.get("Items", [])
+        if "LastEvaluatedKey" not in resp:
+            return
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def migrate(dynamodb, scheduler_client, settings, dry_run):
+    storage = Storage(dynamodb, settings)
+    scheduler = Scheduler(scheduler_client, settings)
+
+    if dry_run:
+        print("indexes: (dry run) would add any missing GSI")
+    else:
+        print(f"indexes added: {add_missing_indexes(dynamodb, settings) or 'none'}")
+
+    sizes = collections.Counter()
+    assigned = 0
+    for q in active_queries(storage.queries_table):
+        bucket = q.get("schedule_bucket") or bucket_for(q["query_id"], q.get("frequency", ""),
+                                                         settings.schedule_bucket_slots)
+        sizes[bucket] += 1
+        if not q.get("schedule_bucket"):
+            assigned += 1 if dry_run else storage.assign_bucket(q["query_id"], bucket)
+    print(f"active queries: {sum(sizes.values())}, newly assigned: {assigned}")
+    print(f"bucket sizes: {dict(sorted(sizes.items()))}")
+
+    if dry_run:
+        print(f"bucket schedules: (dry run) {len(sizes)} buckets in use")
+    else:
+        print(f"bucket schedules created: {len(scheduler.ensure_bucket_schedules())}")
+
+    old = scheduler.list_query_schedules()
+    if not dry_run:
+        for name in old:
+            scheduler.delete_schedule_named(name)
+    print(f"per-query schedules {'to delete' if dry_run else 'deleted'}: {len(old)}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--moto", action="store_true", help="run against moto with --seed old-style queries")
+    ap.add_argument("--seed", type=int, default=200)
+    args = ap.parse_args()
+
+    settings = dataclasses.replace(Settings(), schedule_mode="bucket")
+    if not args.moto:
+        migrate(boto3.resource("dynamodb", region_name=settings.aws_region),
+                boto3.client("scheduler", region_name=settings.aws_region), settings, args.dry_run)
+        return
+
+    try:
+        from moto import mock_aws
+    except ImportError:
+        raise SystemExit("moto is not installed: pip install -r requirements-dev.txt")
+    settings = dataclasses.replace(settings, aws_region="us-east-1",
+                                   scraper_lambda_arn="arn:aws:lambda:us-east-1:123456789012:function:car-scraper",
+                                   scheduler_role_arn="arn:aws:iam::123456789012:role/scheduler")
+    with mock_aws():
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+        client = boto3.client("scheduler", region_name="us-east-1")
+        create_tables(dynamodb, settings)
+        seed_per_query(Storage(dynamodb, settings), Scheduler(client, settings), args.seed)
+        migrate(dynamodb, client, settings, args.dry_run)
+        if not args.dry_run:
+            names = [s["Name"] for s in client.list_schedules()["Schedules"]]
+            print(f"schedules now: {len(names)} ({', '.join(sorted(names)[:3])}, ...)")
+
+
+if __name__ == "__main__":
+    main()
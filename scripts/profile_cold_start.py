@@ -0,0 +1,173 @@
+"""Cold-start cost of each lambda_handler path, each measured in a fresh interpreter.
+
+For every path a child process imports car_agent.lambda_handler and then
+handles one event. The report gives interpreter start to handler import, the
+first call (lazy init plus the work itself), a second warm call, modules loaded,
+and which heavy packages the path pulled in. It is checked against BUDGET_MS.
+--importtime N reruns each path under `python -X importtime` and lists the N
+packages with the largest cumulative import time.
+
+No network is used. The LLM runs in fake mode. Scraping goes to the replay
+server. AWS calls go to a local stub that answers every request with an error,
+and the agent catches and logs those errors the same way as real failures. The
+measurement includes the client setup plus one round trip per call.
+
+    PYTHONPATH=src python scripts/profile_cold_start.py --repeat 5 --importtime 8
+"""
+import argparse
+import http.server
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+
+from replay_server import Corpus, ReplayServer
+
+CRITERIA = {"make": "Mazda", "model": "CX-5", "location": "VIC"}
+PATHS = {
+    "turn: criteria (rules)": {"user_id": "u1", "message": "Mazda CX-5 under $30,000 in VIC", "session_data": {}},
+    "turn: menu choice 2": {"user_id": "u1", "message": "2",
+                            "session_data": {"state": "ASK_UPDATE_TYPE", "criteria": CRITERIA}},
+    "turn: criteria (LLM)": {"user_id": "u1", "message": "something zippy and cheap to run, not too old",
+                             "session_data": {}},
+    "turn: schedule": {"user_id": "u1", "message": "daily to me@example.com",
+                       "session_data": {"state": "ASK_SCHEDULE", "criteria": CRITERIA}},
+    "turn: one-time search": {"user_id": "u1", "message": "1",
+                              "session_data": {"state": "ASK_UPDATE_TYPE", "criteria": CRITERIA}},
+    "turn: start search job": {"user_id": "u1", "message": "1",
+                               "session_data": {"state": "ASK_UPDATE_TYPE", "criteria": CRITERIA}},
+    "search job: poll": {"user_id": "u1", "action": "poll_search", "job_id": "profile", "since": 0},
+    "recurring: bucket": {"bucket": "1d-0000"},
+}
+# Paths measured with search jobs on (as deployed); the rest scrape inside the turn
+JOB_ENV = {"SEARCH_JOB_MODE": "lambda", "SEARCH_JOB_FUNCTION": "car-scraper", "CAR_SEARCH_JOBS_TABLE": "CarSearchJobs"}
+PATH_ENV = {"turn: start search job": JOB_ENV, "search job: poll": JOB_ENV}
+# Import + first call, ms, on a laptop-class CPU; Lambda at 1769 MB (one vCPU) is in the same range
+BUDGET_MS = {
+    "turn: criteria (rules)": 150,
+    "turn: menu choice 2": 150,
+    "turn: criteria (LLM)": 1200,
+    "turn: schedule": 600,
+    "turn: one-time search": 2500,
+    "turn: start search job": 600,
+    "search job: poll": 600,
+    "recurring: bucket": 2500,
+}
+HEAVY = ["langchain_core", "langchain_openai", "openai", "boto3", "botocore", "requests", "bs4", "lxml",
+         "pydantic", "zstandard"]
+
+CHILD = r"""
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+import car_agent.lambda_handler as handler
+imported = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    handler.lambda_handler(json.loads(sys.argv[1]), None)
+    first = time.perf_counter()
+    handler.lambda_handler(json.loads(sys.argv[1]), None)
+    warm = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_call_ms": (first - imported) * 1000,
+                  "warm_call_ms": (warm - first) * 1000, "modules": len(sys.modules),
+                  "heavy": [m for m in json.loads(sys.argv[2]) if m in sys.modules]}))
+"""
+
+
+class _AWSStub(http.server.BaseHTTPRequestHandler):
+    """Every AWS API call fails fast with a client error."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        body = json.dumps({"__type": "ValidationException", "message": "profile stub"}).encode()
+        self.send_response(400)
+        self.send_header("Content-Type", "application/x-amz-json-1.0")
+        self.send_header("x-amzn-ErrorType", "ValidationException")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_PUT = do_DELETE = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+def child_env(aws_url, drive_url):
+    env = dict(os.environ)
+    env.update({"PYTHONPATH": os.pathsep.join(filter(None, ["src", env.get("PYTHONPATH", "")])),
+                "LLM_MODE": "fake", "DRIVE_BASE_URL": drive_url, "AWS_ENDPOINT_URL": aws_url,
+                "AWS_ACCESS_KEY_ID": "profile", "AWS_SECRET_ACCESS_KEY": "profile", "AWS_MAX_ATTEMPTS": "1",
+                "AWS_EC2_METADATA_DISABLED": "true", "HTTP_CACHE_DIR": "", "HTML_ARCHIVE_DIR": "",
+                "CAR_LLM_CACHE_TABLE": "", "LLM_CACHE_SQLITE": "", "SEARCH_JOB_MODE": "inline"})
+    return env
+
+
+def run_path(event, env, importtime=False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD, json.dumps(event),
+                                                                          json.dumps(HEAVY)]
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True, timeout=300)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr[-2000:])
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def top_packages(importtime_log, n, exclude=("car_agent", "site", "encodings")):
+    """Cumulative import time (ms) per package, from -X importtime output.
+
+    A package's time is the cumulative time of its outermost imports, whichever
+    module (often a lazy import in car_agent) triggered them.
+    """
+    totals = {}
+    stack = []  # (depth, package) of the enclosing imports; the log lists children before parents
+    for line in reversed(importtime_log.splitlines()):
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)", line)
+        if not m:
+            continue
+        depth, package = len(m.group(2)), m.group(3).split(".")[0]
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        if package not in exclude and all(p != package for _, p in stack):
+            totals[package] = totals.get(package, 0) + int(m.group(1)) / 1000
+        stack.append((depth, package))
+    return sorted(totals.items(), key=lambda kv: -kv[1])[:n]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3, help="fresh processes per path (median reported)")
+    ap.add_argument("--importtime", type=int, default=0, metavar="N", help="also list the N costliest packages")
+    ap.add_argument("--paths", default="", help="comma-separated subset of path names")
+    args = ap.parse_args()
+
+    stub = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _AWSStub)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    server = ReplayServer(Corpus(), latency_ms=0, seed=1).start()
+    env = child_env(f"http://127.0.0.1:{stub.server_address[1]}", server.base_url)
+    selected = [p for p in PATHS if not args.paths or p in args.paths.split(",")]
+
+    over = []
+    print(f"{'path':<24} {'import':>8} {'1st call':>9} {'cold':>8} {'budget':>7} {'warm':>7} {'modules':>8}  heavy")
+    for name in selected:
+        path_env = {**env, **PATH_ENV.get(name, {})}
+        runs = [run_path(PATHS[name], path_env)[0] for _ in range(args.repeat)]
+        med = {k: statistics.median(r[k] for r in runs) for k in ("import_ms", "first_call_ms", "warm_call_ms")}
+        cold = med["import_ms"] + med["first_call_ms"]
+        flag = "" if cold <= BUDGET_MS[name] else "  OVER"
+        if flag:
+            over.append(name)
+        print(f"{name:<24} {med['import_ms']:>6.0f}ms {med['first_call_ms']:>7.0f}ms {cold:>6.0f}ms "
+              f"{BUDGET_MS[name]:>5}ms {med['warm_call_ms']:>5.0f}ms {runs[-1]['modules']:>8}  "
+              f"{','.join(runs[-1]['heavy']) or '-'}{flag}")
+        if args.importtime:
+            _, log = run_path(PATHS[name], path_env, importtime=True)
+            print("    " + "  ".join(f"{pkg} {ms:.0f}ms" for pkg, ms in top_packages(log, args.importtime)))
+    server.stop()
+    stub.shutdown()
+    if over:
+        sys.exit(f"over budget: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main()
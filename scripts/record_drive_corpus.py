@@ -0,0 +1,67 @@
+"""Record live Drive search + detail pages into the replay corpus.
+
+    python scripts/record_drive_corpus.py --make Mazda --model CX-3 --location vic --pages 2
+
+Pages go to scripts/fixtures/drive/recorded/<sha1>.html and manifest.json maps
+each request path to its file; replay_server.py serves them ahead of the
+rendered corpus.
+"""
+import argparse
+import hashlib
+import json
+import os
+from urllib.parse import urlsplit
+
+from car_agent.scraping.drive_scraper import parse_search_cards
+from car_agent.scraping.drive_url import build_drive_url
+from car_agent.scraping.http import get_transport
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUT = os.path.join(HERE, "fixtures", "drive", "recorded")
+
+
+def _request_path(url):
+    parts = urlsplit(url)
+    return parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--make", default="Mazda")
+    ap.add_argument("--model", default="CX-3")
+    ap.add_argument("--location", default="vic")
+    ap.add_argument("--listing-type", default="used")
+    ap.add_argument("--pages", type=int, default=1)
+    ap.add_argument("--max-details", type=int, default=30)
+    ap.add_argument("--out", default=DEFAULT_OUT)
+    args = ap.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    manifest_path = os.path.join(args.out, "manifest.json")
+    manifest = json.load(open(manifest_path)) if os.path.exists(manifest_path) else {}
+    transport = get_transport()
+    criteria = {"make": args.make, "model": args.model, "location": args.location, "listing_type": args.listing_type}
+
+    def save(url, body):
+        name = hashlib.sha1(body).hexdigest() + ".html"
+        with open(os.path.join(args.out, name), "wb") as f:
+            f.write(body)
+        manifest[_request_path(url)] = name
+
+    detail_urls = []
+    for page in range(1, args.pages + 1):
+        url = build_drive_url(criteria, page=page)
+        resp = transport.get(url)
+        save(url, resp.content)
+        detail_urls += [c["url"] for c in parse_search_cards(resp.text)]
+
+    for url in list(dict.fromkeys(detail_urls))[:args.max_details]:
+        save(url, transport.get(url).content)
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    print(f"recorded {len(manifest)} pages into {args.out}; HTTP {transport.stats.as_dict()}")
+
+
+if __name__ == "__main__":
+    main()
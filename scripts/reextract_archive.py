@@ -0,0 +1,87 @@
+"""Re-run the current extractors over the raw-HTML archive, offline.
+
+Reads the latest archived copy of every page (HTML_ARCHIVE_DIR or
+HTML_ARCHIVE_BUCKET, or --archive-dir), parses them across a process pool and
+writes refreshed records as JSON lines. No network access.
+
+    PYTHONPATH=src python scripts/reextract_archive.py --archive-dir .cache/archive --out records.jsonl
+
+--build-sample N fills --archive-dir with N copies of the replay corpus first,
+and --scaling reruns with 1, 2, 4 ... workers to report per-core scaling:
+
+    PYTHONPATH=src python scripts/reextract_archive.py --archive-dir /tmp/archive --build-sample 20 --scaling
+"""
+import argparse
+import contextlib
+import dataclasses
+import json
+import os
+import sys
+
+from car_agent.config import Settings
+from car_agent.scraping.archive import build_page_archive
+from car_agent.scraping.reextract import reextract_archive
+
+
+def build_sample(settings, copies):
+    from replay_server import Corpus, render_detail, render_search, PAGE_SIZE
+
+    corpus = Corpus()
+    archive = build_page_archive(settings)
+    base = "https://www.drive.com.au"
+    for i in range(copies):
+        marker = f"<!-- snapshot {i} -->".encode("utf-8")
+        for car in corpus.listings:
+            archive.put(f"{base}/cars-for-sale/car/{car['id']}/?copy={i}",
+                        render_detail(car).encode("utf-8") + marker, "detail")
+        for page in range(1, len(corpus.listings) // PAGE_SIZE + 2):
+            archive.put(f"{base}/cars-for-sale/search/all/vic/?page={page}&copy={i}",
+                        render_search(corpus.listings, page).encode("utf-8") + marker, "search")
+    archive.flush()
+    print(f"archived sample: {archive.stats.as_dict()}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--archive-dir", default=None)
+    ap.add_argument("--bucket", default=None)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--kinds", default="detail,search")
+    ap.add_argument("--out", default=None, help="JSON lines output (default: discard)")
+    ap.add_argument("--build-sample", type=int, default=0, metavar="COPIES")
+    ap.add_argument("--scaling", action="store_true")
+    args = ap.parse_args()
+
+    settings = Settings()
+    if args.archive_dir or args.bucket:
+        settings = dataclasses.replace(settings, html_archive_dir=args.archive_dir or "",
+                                       html_archive_bucket=args.bucket or "")
+    if args.build_sample:
+        build_sample(settings, args.build_sample)
+
+    kinds = tuple(k.strip() for k in args.kinds.split(",") if k.strip())
+    cpus = os.cpu_count() or 1
+    if args.scaling:
+        counts = sorted({1, cpus} | {n for n in (2, 4, 8, 16, 32, 64) if n < cpus})
+    else:
+        counts = [args.workers or cpus]
+
+    baseline = None
+    for n in counts:
+        out = open(args.out, "w") if args.out and n == counts[-1] else None
+        with out or contextlib.nullcontext():
+            sink = (lambda r: out.write(json.dumps(r) + "\n")) if out else (lambda r: None)
+            report = reextract_archive(settings, sink, workers=n, kinds=kinds)
+        baseline = baseline or report.pages_per_s
+        efficiency = report.pages_per_s / (baseline * n) if baseline else 0.0
+        print(f"workers {n:>3}: {report.pages_per_s:>8.1f} pages/s  "
+              f"speedup {report.pages_per_s / baseline if baseline else 0:>5.2f}x  "
+              f"efficiency {efficiency:>5.0%}  {report.as_dict()}")
+        if report.missing or report.failed:
+            print(f"  {report.missing} missing bodies, {report.failed} extractor failures", file=sys.stderr)
+    if args.out:
+        print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Local stand-in for drive.com.au that replays a page corpus.
+
+Serves search and detail pages from scripts/fixtures/drive:
+  - recorded/manifest.json (written by record_drive_corpus.py) maps request paths
+    to captured HTML files and always wins;
+  - otherwise pages are rendered from listings.json, using the same card and
+    detail-page layouts (JSON-LD, __NEXT_DATA__, DOM-only) the extractors handle.
+
+Latency and failures are configurable so the scraper's concurrency, retries and
+circuit breaker can be exercised offline.
+
+    python scripts/replay_server.py --port 8765 --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+    DRIVE_BASE_URL=http://127.0.0.1:8765 python scripts/test_scrape_drive.py
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(HERE, "fixtures", "drive")
+PAGE_SIZE = 12
+
+_SEARCH_RE = re.compile(r"^/cars-for-sale/search/([^/]+)/([^/]+)/(?:all/([^/]+)/(?:([^/]+)/)?)?$")
+_DETAIL_RE = re.compile(r"^/cars-for-sale/car/([^/]+)/?$")
+
+
+def _boilerplate(n_nav=60, n_specs=120, n_related=30, n_footer=40):
+    nav = "".join(f'<li class="nav-item"><a class="nav-link" href="/news/{i}">Section {i}</a></li>' for i in range(n_nav))
+    specs = "".join(f'<tr class="spec-row"><td class="spec-label">Spec {i}</td><td class="spec-value">Value {i * 7}</td></tr>'
+                    for i in range(n_specs))
+    related = "".join(f'<div class="related-card"><a href="/news/related-{i}/"><h4>Related story {i}</h4></a></div>'
+                      for i in range(n_related))
+    footer = "".join(f'<p class="footer-text">Footer paragraph {i}.</p>' for i in range(n_footer))
+    return nav, specs, related, footer
+
+
+_NAV, _SPECS, _RELATED, _FOOTER = _boilerplate()
+
+
+def _title(car):
+    return f"{car['year']} {car['make']} {car['model']} {car['variant']}"
+
+
+def _page(title, body, head_extra="", body_extra=""):
+    return (f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>{html.escape(title)} | Drive</title>'
+            f'<style>.nav-item{{display:inline}}</style>{head_extra}</head><body>'
+            f'<header class="site-header"><ul class="nav">{_NAV}</ul></header>'
+            f'<main>{body}<table class="spec-table">{_SPECS}</table><section class="related">{_RELATED}</section>'
+            f'{body_extra}</main><footer>{_FOOTER}</footer></body></html>')
+
+
+def render_detail(car):
+    title = _title(car)
+    h1 = f'<h1 class="listing-title">{html.escape(title)}</h1>'
+    if car["style"] == "jsonld":
+        ld = {"@context": "https://schema.org", "@type": "Car", "name": title,
+              "brand": {"@type": "Brand", "name": car["make"]}, "model": car["model"],
+              "vehicleModelDate": str(car["year"]), "vehicleTransmission": car["transmission"],
+              "mileageFromOdometer": {"@type": "QuantitativeValue", "value": car["mileage"], "unitCode": "KMT"},
+              "offers": {"@type": "Offer", "price": car["price"], "priceCurrency": "AUD",
+                         "availableAtOrFrom": {"@type": "Place", "address": {"addressRegion": car["state"]}}}}
+        body = h1 + f'<div class="price-panel"><span class="price">${car["price"]:,}</span></div>'
+        return _page(title, body, head_extra=f'<script type="application/ld+json">{json.dumps(ld)}</script>')
+    if car["style"] == "state":
+        state = {"props": {"pageProps": {"listing": {
+            "id": car["id"], "title": title, "priceDriveAway": car["price"], "year": car["year"],
+            "odometer": car["mileage"], "make": car["make"], "model": car["model"], "state": car["state"],
+            "transmission": car["transmission"]}}}}
+        body = h1 + f'<div class="price-panel"><span class="listing-price">${car["price"]:,}</span></div>'
+        return _page(title, body, body_extra=f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(state)}</script>')
+    body = (h1 + f'<div data-testid="price">${car["price"]:,}</div>'
+            f'<div data-testid="mileage">{car["mileage"]:,} km</div>'
+            f'<div data-testid="location">{car["state"]}</div>')
+    return _page(title, body)
+
+
+def render_card(car):
+    km = f'<span class="card-odometer">{car["mileage"]:,} km</span>' if car["card_shows_km"] else ""
+    return (f'<div class="listing-card marketplace-listing-card"><a href="/cars-for-sale/car/{car["id"]}/?src=search">'
+            f'<h3>{html.escape(_title(car))}</h3></a><span class="card-price">${car["price"]:,}</span>{km}'
+            f'<span class="card-location">{car["state"]}</span></div>')
+
+
+def render_search(cars, page):
+    chunk = cars[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+    body = f'<h1>Cars for sale</h1><div class="results">{"".join(render_card(c) for c in chunk)}</div>'
+    return _page("Cars for sale", body)
+
+
+def _slug(s):
+    return (s or "").lower().replace(" ", "-")
+
+
+def _range(value):
+    """'[a,b]' -> (a, b) with 0 meaning open."""
+    m = re.match(r"^\[(\d*),(\d*)\]$", value or "")
+    if not m:
+        return None
+    return int(m.group(1) or 0), int(m.group(2) or 0)
+
+
+def _in_range(v, rng):
+    lo, hi = rng
+    return (not lo or v >= lo) and (not hi or v <= hi)
+
+
+def apply_search_filters(cars, params):
+    """Server-side filters the site applies when they arrive as query parameters."""
+    for name, field in (("year", "year"), ("price", "price"), ("kms", "mileage")):
+        rng = _range(params.get(name, [""])[0])
+        if rng:
+            cars = [c for c in cars if _in_range(c[field], rng)]
+    trans = params.get("transmission", [""])[0]
+    if trans:
+        want = "automatic" if trans.startswith("auto") else "manual"
+        cars = [c for c in cars if c["transmission"] == want]
+    return cars
+
+
+class Corpus:
+    def __init__(self, root=DEFAULT_CORPUS):
+        with open(os.path.join(root, "listings.json"), encoding="utf-8") as f:
+            self.listings = json.load(f)
+        self.by_id = {c["id"]: c for c in self.listings}
+        self.recorded = {}
+        manifest = os.path.join(root, "recorded", "manifest.json")
+        if os.path.exists(manifest):
+            with open(manifest, encoding="utf-8") as f:
+                for path, name in json.load(f).items():
+                    self.recorded[path] = os.path.join(root, "recorded", name)
+
+    def search(self, listing_type, state, make, model, params):
+        cars = [c for c in self.listings
+                if (listing_type in ("all", c["listing_type"]))
+                and c["state"].lower() == state
+                and (not make or _slug(c["make"]) == make)
+                and (not model or _slug(c["model"]) == model)]
+        return apply_search_filters(cars, params)
+
+
+class ReplayServer:
+    def __init__(self, corpus=None, host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0,
+                 error_rate=0.0, error_status=503, seed=None):
+        self.corpus = corpus or Corpus()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.counts = {"search": 0, "detail": 0, "errors": 0, "not_modified": 0, "not_found": 0}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def _handler(server):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b"", headers=None):
+                self.send_response(status)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                delay = server.latency_ms + server.rng.uniform(-server.jitter_ms, server.jitter_ms)
+                if delay > 0:
+                    time.sleep(delay / 1000.0)
+                if server.error_rate and server.rng.random() < server.error_rate:
+                    server._count("errors")
+                    return self._send(server.error_status, headers={"Retry-After": "0"})
+
+                parts = urlsplit(self.path)
+                recorded = server.corpus.recorded.get(self.path) or server.corpus.recorded.get(parts.path)
+                if recorded:
+                    with open(recorded, "rb") as f:
+                        body = f.read()
+                    server._count("detail" if "/car/" in parts.path else "search")
+                    return self._send(200, body, {"Content-Type": "text/html; charset=utf-8"})
+
+                m = _SEARCH_RE.match(parts.path)
+                if m:
+                    params = parse_qs(parts.query)
+                    page = int(params.get("page", ["1"])[0] or 1)
+                    cars = server.corpus.search(m.group(1), m.group(2), m.group(3), m.group(4), params)
+                    server._count("search")
+                    return self._send(200, render_search(cars, page).encode("utf-8"),
+                                      {"Content-Type": "text/html; charset=utf-8"})
+
+                m = _DETAIL_RE.match(parts.path)
+                car = server.corpus.by_id.get(m.group(1)) if m else None
+                if car:
+                    body = render_detail(car).encode("utf-8")
+                    etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+                    if self.headers.get("If-None-Match") == etag:
+                        server._count("not_modified")
+                        return self._send(304, headers={"ETag": etag})
+                    server._count("detail")
+                    return self._send(200, body, {"Content-Type": "text/html; charset=utf-8", "ETag": etag})
+
+                server._count("not_found")
+                self._send(404)
+
+        return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--corpus", default=DEFAULT_CORPUS)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--error-status", type=int, default=503)
+    args = ap.parse_args()
+
+    server = ReplayServer(Corpus(args.corpus), port=args.port, latency_ms=args.latency_ms,
+                          jitter_ms=args.jitter_ms, error_rate=args.error_rate, error_status=args.error_status)
+    print(f"Replaying {len(server.corpus.listings)} listings "
+          f"({len(server.corpus.recorded)} recorded pages) on {server.base_url}")
+    server.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
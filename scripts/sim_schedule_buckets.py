@@ -0,0 +1,98 @@
+"""Lambda invocations for per-query schedules vs schedule buckets (no AWS, no network).
+
+Simulates --days of firings for --queries recurring queries created at random
+times over the first day, with a mix of frequencies. Per-query mode fires each
+query's own rate schedule. Bucket mode fires the bucket schedules from
+aws/scheduler.py and runs the members that are due, using the runner's early
+window. A firing with more due members than --per-invocation (queries one
+invocation finishes before its deadline) continues in further invocations.
+
+    PYTHONPATH=src python scripts/sim_schedule_buckets.py --queries 10000 --days 7 --slots 4
+"""
+import argparse
+import collections
+import math
+import random
+
+from car_agent.aws.scheduler import all_buckets, bucket_for, parse_bucket, schedule_interval_s
+from car_agent.runner import RUNNER_EARLY_S
+
+FREQUENCIES = [("rate(1 hour)", 0.02), ("rate(6 hours)", 0.05), ("rate(12 hours)", 0.05),
+               ("rate(1 day)", 0.60), ("rate(2 days)", 0.08), ("rate(7 days)", 0.20)]
+
+
+def make_queries(n, seed=3):
+    rng = random.Random(seed)
+    names, weights = zip(*FREQUENCIES)
+    return [(f"user{rng.randrange(n // 3 or 1)}_{1700000000 + i}", rng.choices(names, weights)[0],
+             rng.uniform(0, 86400)) for i in range(n)]
+
+
+def per_query(queries, horizon):
+    invocations = 0
+    per_minute = collections.Counter()
+    for _, frequency, created in queries:
+        interval = schedule_interval_s(frequency) or 86400
+        t = created + interval  # a rate schedule first fires one interval after creation
+        while t < horizon:
+            invocations += 1
+            per_minute[int(t // 60)] += 1
+            t += interval
+    return {"schedules": len(queries), "invocations": invocations, "query_runs": invocations,
+            "peak_invocations_per_min": max(per_minute.values(), default=0), "mean_lag_min": 0.0}
+
+
+def bucketed(queries, horizon, slots, per_invocation):
+    members = collections.defaultdict(list)
+    for query_id, frequency, created in queries:
+        members[bucket_for(query_id, frequency, slots)].append([schedule_interval_s(frequency) or 86400, created])
+    firings = []
+    for bucket in all_buckets(slots):
+        interval_s, offset = parse_bucket(bucket)
+        t = offset * 60
+        while t < horizon:
+            firings.append((t, bucket))
+            t += interval_s
+
+    invocations = runs = empty = 0
+    lag = 0.0
+    per_minute = collections.Counter()
+    sizes = []
+    for t, bucket in sorted(firings):
+        due = [m for m in members.get(bucket, []) if m[1] <= t + RUNNER_EARLY_S]
+        n_invocations = max(1, math.ceil(len(due) / per_invocation))
+        invocations += n_invocations
+        per_minute[int(t // 60)] += n_invocations
+        empty += not due
+        sizes.append(len(due))
+        for m in due:
+            lag += max(0.0, t - m[1])
+            m[1] = t + m[0]
+        runs += len(due)
+    return {"schedules": len(all_buckets(slots)), "invocations": invocations, "query_runs": runs,
+            "empty_firings": empty, "max_queries_per_firing": max(sizes, default=0),
+            "peak_invocations_per_min": max(per_minute.values(), default=0),
+            "mean_lag_min": round(lag / runs / 60, 1) if runs else 0.0}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=10000)
+    ap.add_argument("--days", type=float, default=7.0)
+    ap.add_argument("--slots", type=int, default=4)
+    ap.add_argument("--per-invocation", type=int, default=3000,
+                    help="queries one invocation runs before its deadline (see bench_runner.py)")
+    args = ap.parse_args()
+
+    queries = make_queries(args.queries)
+    horizon = args.days * 86400
+    print(f"{args.queries} queries over {args.days:g} days, {args.slots} slots per bucket interval")
+    for label, stats in (("per query", per_query(queries, horizon)),
+                         ("bucketed", bucketed(queries, horizon, args.slots, args.per_invocation))):
+        print(f"{label:<10} schedules {stats['schedules']:>6}  invocations {stats['invocations']:>7}  "
+              f"({stats['invocations'] / args.days:>8.0f}/day)  query runs {stats['query_runs']:>7}  "
+              f"peak {stats['peak_invocations_per_min']:>4}/min  {stats}")
+
+
+if __name__ == "__main__":
+    main()
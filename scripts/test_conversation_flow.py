@@ -1,3 +1,5 @@
+import time
+
 from car_agent.agent import CarScraperAgent
 
 def main():
@@ -16,5 +18,16 @@ def main():
     print("\n--- R2 ---")
     print(r2["response"])
 
+    # The search runs as a background job (SEARCH_JOB_MODE=thread); poll it like the web client
+    since = 0
+    while r2.get("job_id"):
+        time.sleep(1)
+        poll = agent.poll_search(user_id, r2["job_id"], since)
+        print(agent.format_results(poll["listings"]) if poll["listings"] else f"... {poll['status']}")
+        since = poll["next"]
+        if poll["done"]:
+            print(poll["response"])
+            break
+
 if __name__ == "__main__":
     main()
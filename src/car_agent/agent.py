@@ -1,48 +1,219 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
 
-from car_agent.aws.clients import build_dynamodb, build_scheduler, build_ses
-from car_agent.aws.emailer import Emailer
-from car_agent.aws.scheduler import Scheduler
-from car_agent.aws.storage import Storage
 from car_agent.config import Settings
-from car_agent.llm.client import build_llm
-from car_agent.llm.extractors import extract_car_criteria, extract_schedule_details
-from car_agent.scraping.drive_scraper import scrape_drive
+from car_agent.llm.context import llm_context
+from car_agent.llm.rules import (
+    TurnStats,
+    menu_choice,
+    normalize_input,
+    parse_criteria,
+    parse_schedule,
+    route_extraction,
+)
+
+if TYPE_CHECKING:
+    from langchain_core.language_models.chat_models import BaseChatModel
+
+    from car_agent.aws.emailer import Emailer
+    from car_agent.aws.scheduler import Scheduler
+    from car_agent.aws.storage import Storage
+    from car_agent.jobs import SearchJobs
+    from car_agent.sessions import SessionStore
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    if not results:
+        return "No listings found matching your criteria."
+
+    out = [f"Found {len(results)} listings:\n"]
+    for i, car in enumerate(results[:10], 1):
+        price = car.get("price")
+        price_str = f"${price:,}" if isinstance(price, int) else "N/A"
+        mileage = car.get("mileage")
+        mileage_str = f"{mileage:,} km" if isinstance(mileage, int) else "N/A"
+        out.append(
+            f"{i}. {car.get('name') or 'N/A'}\n"
+            f"   Price: {price_str}\n"
+            f"   Mileage: {mileage_str}\n"
+            f"   Year: {car.get('year') or 'N/A'}\n"
+            f"   Location: {car.get('location') or 'N/A'}\n"
+            f"   URL: {car.get('url','N/A')}\n"
+        )
+    if len(results) > 10:
+        out.append(f"... and {len(results)-10} more listings")
+    return "\n".join(out)
+
+
+def _llm_car_criteria(llm, text: str) -> Dict[str, Any]:
+    from car_agent.llm.extractors import extract_car_criteria
+
+    return extract_car_criteria(llm, text)
+
+
+def _llm_schedule_details(llm, text: str) -> Dict[str, Any]:
+    from car_agent.llm.extractors import extract_schedule_details
+
+    return extract_schedule_details(llm, text)
 
 
 class CarScraperAgent:
+    """Conversation flow over rules, LLM extraction, scraping and AWS storage.
+
+    The LLM, the AWS clients and the scraper are built (and their modules
+    imported) on first use, then reused, so a turn the rules answer loads
+    neither langchain, boto3 nor the scraper. Any of them can be assigned
+    directly, e.g. `agent.llm = stub`.
+    """
+
     def __init__(self, settings: Settings | None = None, enable_aws: bool = True):
         self.settings = settings or Settings()
+        self.enable_aws = enable_aws
+        self.turn_stats = TurnStats()
 
-        # LLM
-        self.llm = build_llm(self.settings)
+    @cached_property
+    def llm(self) -> BaseChatModel:
+        from car_agent.llm.client import build_llm
 
-        # AWS
-        if enable_aws:
-            dynamodb = build_dynamodb(self.settings)
-            ses = build_ses(self.settings)
-            scheduler_client = build_scheduler(self.settings)
+        return build_llm(self.settings)
 
-            self.storage = Storage(dynamodb, self.settings)
-            self.emailer = Emailer(ses, self.settings)
-            self.scheduler = Scheduler(scheduler_client, self.settings)
-        else:
-            self.storage = None
-            self.emailer = None
-            self.scheduler = None
+    @cached_property
+    def dynamodb(self):
+        from car_agent.aws.clients import build_dynamodb
+
+        return build_dynamodb(self.settings) if self.enable_aws else None
+
+    @cached_property
+    def storage(self) -> Optional[Storage]:
+        if not self.enable_aws:
+            return None
+        from car_agent.aws.storage import Storage
+
+        return Storage(self.dynamodb, self.settings)
+
+    @cached_property
+    def emailer(self) -> Optional[Emailer]:
+        if not self.enable_aws:
+            return None
+        from car_agent.aws.clients import build_ses
+        from car_agent.aws.emailer import Emailer
+
+        return Emailer(build_ses(self.settings), self.settings)
+
+    @cached_property
+    def scheduler(self) -> Optional[Scheduler]:
+        if not self.enable_aws:
+            return None
+        from car_agent.aws.clients import build_scheduler
+        from car_agent.aws.scheduler import Scheduler
+
+        return Scheduler(build_scheduler(self.settings), self.settings)
+
+    @cached_property
+    def sessions(self) -> SessionStore:
+        from car_agent.sessions import build_session_store
 
-    def extract_car_details(self, user_input: str) -> Dict[str, Any]:
-        return extract_car_criteria(self.llm, user_input)
+        return build_session_store(self.settings, self.dynamodb if self.settings.sessions_table_name else None)
 
-    def extract_schedule_details(self, user_input: str) -> Dict[str, Any]:
-        return extract_schedule_details(self.llm, user_input)
+    @cached_property
+    def search_jobs(self) -> Optional[SearchJobs]:
+        """Background one-time searches; None when SEARCH_JOB_MODE runs them inside the turn."""
+        from car_agent.jobs import build_search_jobs
+
+        return build_search_jobs(self.settings, self.run_search_job,
+                                 self.dynamodb if self.settings.search_jobs_table_name else None)
+
+    def extract_car_details(self, user_input: str, memo: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._extract("criteria", parse_criteria, lambda text: _llm_car_criteria(self.llm, text),
+                             user_input, memo)
+
+    def extract_schedule_details(self, user_input: str, memo: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._extract("schedule", parse_schedule, lambda text: _llm_schedule_details(self.llm, text),
+                             user_input, memo)
+
+    def _extract(self, kind: str, parse, llm_extract, user_input: str,
+                 memo: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Rules, then the LLM; `memo` (a session's extractions) answers messages this session already parsed."""
+        key = f"{kind}:{normalize_input(user_input)}"
+        if memo is not None and key in memo:
+            self.turn_stats.incr("session_reuses")
+            return dict(memo[key])
+        if self.settings.rules_fast_path:
+            result = route_extraction(parse, llm_extract, user_input, self.turn_stats)
+        else:
+            self.turn_stats.incr("llm_calls")
+            result = llm_extract(user_input)
+        if memo is not None:
+            memo[key] = dict(result)
+        return result
 
     def scrape_cars(self, criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
         # You can add other sources later; keep this method stable.
-        results = scrape_drive(criteria, llm=self.llm, max_results=3, max_page=1)
+        # The streaming crawler only requests as many pages as the match rate needs.
+        from car_agent.scraping.drive_scraper import scrape_drive
+
+        results = scrape_drive(criteria, llm=self.llm, max_results=10, max_page=None)
         return results
+
+    def scrape_cars_iter(self, criteria: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """scrape_cars, yielding each listing as soon as it is complete (search jobs)."""
+        from car_agent.scraping.drive_scraper import scrape_drive_iter
+
+        return scrape_drive_iter(criteria, max_results=10, max_page=None, llm=self.llm)
+
+    def run_search_job(self, job_id: str, run: str) -> None:
+        """Worker side of a search job: publish listings as they are found, then store the search."""
+        from car_agent.jobs import DONE, FAILED
+
+        jobs = self.search_jobs
+        job = jobs.claim(job_id, run)
+        if job is None:
+            print(f"[JOBS] {job_id} run {run} already started or replaced; skipping")
+            return
+        results = []
+        try:
+            with llm_context(user_id=job["user_id"], state="SEARCH_JOB"):
+                listings = self.scrape_cars_iter(job["criteria"])
+                for listing in listings:
+                    results.append(listing)
+                    if not jobs.append(job_id, run, listing):
+                        listings.close()  # cancels the rest of the crawl
+                        print(f"[JOBS] {job_id} run {run} replaced by a newer run; stopping")
+                        return
+        except Exception as e:
+            print(f"[JOBS] ❌ {job_id} failed: {e}")
+            jobs.finish(job_id, run, FAILED, error=str(e)[:500])
+            return
+        search_id = None
+        try:
+            if self.storage:
+                search_id = self.storage.store_search(job["user_id"], job["criteria"], results, "one-time")
+        except Exception as e:
+            print(f"[JOBS] ❌ {job_id} could not store the search: {e}")
+            jobs.finish(job_id, run, FAILED, error=str(e)[:500])
+            return
+        jobs.finish(job_id, run, DONE, search_id=search_id or "")
+        print(f"[JOBS] {job_id} done: {len(results)} listings {jobs.stats.as_dict()}")
+
+    def poll_search(self, user_id: str, job_id: str, since: int = 0) -> Dict[str, Any]:
+        """Listings a search job has found after the first `since`; poll again with `next` until `done`."""
+        from car_agent.jobs import DONE, FAILED
+
+        job = self.search_jobs.get(job_id, user_id) if self.search_jobs else None
+        if job is None:
+            return {"job_id": job_id, "status": "unknown", "listings": [], "next": since, "done": True,
+                    "response": "I couldn't find that search. What car are you looking for?"}
+        listings = job["listings"][since:]
+        response = ""
+        if job["status"] == DONE:
+            found = len(job["listings"])
+            response = f"Search finished: {found} listings." if found else format_results([])
+        elif job["status"] == FAILED:
+            response = "Sorry, the search failed. Please try again."
+        return {"job_id": job_id, "status": job["status"], "listings": listings, "next": since + len(listings),
+                "done": job["status"] in (DONE, FAILED), "response": response}
     # ----- Conversation flow (mostly unchanged, just cleaned) -----
 
     def ask_update_preference(self) -> str:
@@ -79,34 +250,76 @@ class CarScraperAgent:
         return " ".join(parts)
 
     def format_results(self, results: List[Dict[str, Any]]) -> str:
-        if not results:
-            return "No listings found matching your criteria."
-
-        out = [f"Found {len(results)} listings:\n"]
-        for i, car in enumerate(results[:10], 1):
-            price = car.get("price")
-            price_str = f"${price:,}" if isinstance(price, int) else "N/A"
-            out.append(
-                f"{i}. {car.get('name','N/A')}\n"
-                f"   Price: {price_str}\n"
-                f"   Mileage: {car.get('mileage','N/A')} km\n"
-                f"   Year: {car.get('year','N/A')}\n"
-                f"   Location: {car.get('location','N/A')}\n"
-                f"   URL: {car.get('url','N/A')}\n"
-            )
-        if len(results) > 10:
-            out.append(f"... and {len(results)-10} more listings")
-        return "\n".join(out)
-
-    def process_conversation(self, user_id: str, message: str, session_data: Dict[str, Any]) -> Dict[str, Any]:
+        return format_results(results)
+
+    def converse(self, user_id: str, message: str, session_token: Optional[str] = None,
+                 turn_id: Optional[str] = None) -> Dict[str, Any]:
+        """One turn against the server-side session for `session_token`.
+
+        Returns {"response", "action", "session_token"}; the client sends the new
+        token with its next turn. A turn repeating the previous turn_id (a client
+        retry) gets the stored result back without being run again.
+
+        The turn runs once. If the session moved on in the shared store while it
+        ran, its outcome is written onto the fresh copy instead of running the
+        turn (and its searches, schedules and jobs) again; if that save fails too,
+        an error is returned rather than a result that was never saved.
+        """
+        from car_agent.sessions import SessionConflict
+
+        session = self.sessions.load(session_token, user_id, turn_id=turn_id)
+        if turn_id and session.last_turn.get("turn_id") == turn_id:
+            print(f"[SESSION] replaying turn {turn_id}")
+            return {**session.last_turn["result"], "session_token": session.token}
+
+        result = self.process_conversation(user_id, message, session.data, session.extractions)
+        data = result.pop("session_data", {}) or {}
+        for attempt in range(2):
+            if attempt:
+                print(f"[SESSION] {session.session_id} changed since this container cached it; merging")
+                fresh = self.sessions.load(session.token, user_id, fresh=True)
+                if turn_id and fresh.last_turn.get("turn_id") == turn_id:
+                    return {**fresh.last_turn["result"], "session_token": fresh.token}
+                fresh.extractions.update(session.extractions)
+                session = fresh
+            session.data = data
+            session.trim()
+            if turn_id:
+                session.last_turn = {"turn_id": turn_id, "result": result}
+            try:
+                return {**result, "session_token": self.sessions.save(session)}
+            except SessionConflict:
+                continue
+        return {"response": "Sorry, this conversation changed somewhere else while I was answering. "
+                            "Please send your message again.",
+                "action": "error", "session_token": session.token}
+
+    def process_conversation(self, user_id: str, message: str, session_data: Dict[str, Any],
+                             extractions: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        llm_calls_before = self.turn_stats.llm_calls
+        with llm_context(user_id=user_id, state=session_data.get("state", "INITIAL")):
+            result = self._process_turn(user_id, message, session_data, extractions)
+        self.turn_stats.incr("turns")
+        if self.turn_stats.llm_calls == llm_calls_before:
+            self.turn_stats.incr("turns_without_llm")
+        print(f"[TURN] {self.turn_stats.as_dict()}")
+        return result
+
+    def _process_turn(self, user_id: str, message: str, session_data: Dict[str, Any],
+                      extractions: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
 
         print(f"[DEBUG] Input - user: {user_id}, msg: '{message}', session keys: {list(session_data.keys())}")
 
         state = session_data.get("state", "INITIAL")
         criteria = session_data.get("criteria", {})
 
-        # === ALWAYS RE-PARSE MESSAGE for potential criteria updates ===
-        fresh_criteria = self.extract_car_details(message)
+        # === RE-PARSE MESSAGE for potential criteria updates ===
+        # (a bare "1"/"2" answering the menu cannot carry criteria)
+        if state == "ASK_UPDATE_TYPE" and self.settings.rules_fast_path and menu_choice(message):
+            self.turn_stats.incr("menu_skips")
+            fresh_criteria = {}
+        else:
+            fresh_criteria = self.extract_car_details(message, extractions)
         if fresh_criteria:
             print(f"[DEBUG] Fresh criteria from LLM: {fresh_criteria}")
             # MERGE: fresh overrides stale session criteria
@@ -135,16 +348,27 @@ class CarScraperAgent:
                 }
 
         if state == "ASK_UPDATE_TYPE":
-            msg = (message or "").lower().strip()
+            choice = menu_choice(message)
+
+            if choice == "1":
+                if self.search_jobs is not None:
+                    # Answer now; the client polls the job for listings (poll_search)
+                    job = self.search_jobs.submit(user_id, session_data["criteria"])
+                    return {
+                        "response": f"Searching for {self.format_criteria(session_data['criteria'])}. "
+                                    f"Listings will appear here as they're found.",
+                        "job_id": job["job_id"],
+                        "session_data": {},
+                        "action": "search_started",
+                    }
 
-            if msg in ("1", "one", "one time", "one-time"):
                 results = self.scrape_cars(session_data["criteria"])
 
                 if self.storage:
                     self.storage.store_search(user_id, session_data["criteria"], results, "one-time")
                 return {"response": f"Here are the results:\n\n{self.format_results(results)}", "session_data": {}, "action": "complete"}
 
-            if msg in ("2", "regular", "updates", "regular updates"):
+            if choice == "2":
                 session_data["state"] = "ASK_SCHEDULE"
                 return {
                     "response": (
@@ -161,7 +385,7 @@ class CarScraperAgent:
             return {"response": "Please choose 1 (one-time) or 2 (regular updates).", "session_data": session_data, "action": "continue"}
 
         if state == "ASK_SCHEDULE":
-            sched = self.extract_schedule_details(message)
+            sched = self.extract_schedule_details(message, extractions)
             if not (sched.get("email") and sched.get("frequency")):
                 return {"response": "I need both your email and frequency (e.g., daily/weekly).", "session_data": session_data, "action": "continue"}
             
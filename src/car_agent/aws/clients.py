@@ -15,3 +15,11 @@ def build_ses(settings: Settings):
 
 def build_scheduler(settings: Settings):
     return boto3.client("scheduler", region_name=settings.aws_region)
+
+
+def build_s3(settings: Settings):
+    return boto3.client("s3", region_name=settings.aws_region)
+
+
+def build_lambda(settings: Settings):
+    return boto3.client("lambda", region_name=settings.aws_region)
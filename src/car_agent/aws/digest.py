@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import html
+import threading
+from dataclasses import dataclass, field
+from string import Template
+from typing import Any, Dict, List, Tuple
+
+DIGEST_MAX_LISTINGS = 10   # per search, as in format_results
+
+# SES template (Handlebars), uploaded once by DigestMailer.ensure_template().
+# render_digest() below produces the same output locally.
+SES_TEMPLATE_SUBJECT = "{{subject}}"
+SES_TEMPLATE_TEXT = (
+    "{{#each searches}}{{title}}\n"
+    "{{#each listings}}- {{name}}\n  Price: {{price}} | Mileage: {{mileage}} | Year: {{year}} | "
+    "Location: {{location}}\n  {{url}}\n{{/each}}"
+    "{{#if more}}... and {{more}} more listings\n{{/if}}\n{{/each}}"
+)
+SES_TEMPLATE_HTML = (
+    "{{#each searches}}<h3>{{title}}</h3><ul>"
+    "{{#each listings}}<li><a href=\"{{url}}\">{{name}}</a><br>"
+    "Price: {{price}} | Mileage: {{mileage}} | Year: {{year}} | Location: {{location}}</li>{{/each}}"
+    "</ul>{{#if more}}<p>... and {{more}} more listings</p>{{/if}}{{/each}}"
+)
+
+# Local renderer: compiled once at import
+_ROW_TEXT = Template("- $name\n  Price: $price | Mileage: $mileage | Year: $year | Location: $location\n  $url\n")
+_MORE_TEXT = Template("... and $more more listings\n")
+_ROW_HTML = Template('<li><a href="$url">$name</a><br>'
+                     "Price: $price | Mileage: $mileage | Year: $year | Location: $location</li>")
+_MORE_HTML = Template("<p>... and $more more listings</p>")
+_SECTION_HTML = Template("<h3>$title</h3><ul>$rows</ul>$more")
+
+
+@dataclass
+class Digest:
+    """Everything one recipient should hear about from one run: a section per query."""
+    email: str
+    sections: List[Dict[str, Any]] = field(default_factory=list)
+    query_ids: List[str] = field(default_factory=list)
+
+    @property
+    def listing_count(self) -> int:
+        return sum(s["total"] for s in self.sections)
+
+
+class DigestCollector:
+    """Thread-safe: queries add their new listings, recipients get one digest each."""
+
+    def __init__(self):
+        self._digests: Dict[str, Digest] = {}
+        self._lock = threading.Lock()
+
+    def add(self, email: str, query_id: str, criteria: Dict[str, Any], listings: List[Dict[str, Any]]) -> None:
+        section = {"title": search_title(criteria), "total": len(listings), "listings": listings[:DIGEST_MAX_LISTINGS]}
+        with self._lock:
+            digest = self._digests.setdefault(email.lower(), Digest(email=email))
+            digest.sections.append(section)
+            digest.query_ids.append(query_id)
+
+    def digests(self) -> List[Digest]:
+        with self._lock:
+            return list(self._digests.values())
+
+
+def search_title(criteria: Dict[str, Any]) -> str:
+    what = " ".join(str(criteria[k]) for k in ("make", "model") if criteria.get(k)) or "Your search"
+    where = f" in {criteria['location']}" if criteria.get("location") else ""
+    return f"{what}{where}"
+
+
+def _fmt(listing: Dict[str, Any]) -> Dict[str, str]:
+    price, mileage = listing.get("price"), listing.get("mileage")
+    return {
+        "name": str(listing.get("name") or "N/A"),
+        "price": f"${price:,}" if isinstance(price, int) else "N/A",
+        "mileage": f"{mileage:,} km" if isinstance(mileage, int) else "N/A",
+        "year": str(listing.get("year") or "N/A"),
+        "location": str(listing.get("location") or "N/A"),
+        "url": str(listing.get("url") or ""),
+    }
+
+
+def digest_data(digest: Digest) -> Dict[str, Any]:
+    """Template data for one recipient (SES ReplacementTemplateData / render_digest input)."""
+    n = digest.listing_count
+    return {
+        "subject": f"{n} new car listing{'s' if n != 1 else ''}",
+        "searches": [{"title": s["title"], "listings": [_fmt(l) for l in s["listings"]],
+                      "more": max(0, s["total"] - len(s["listings"]))} for s in digest.sections],
+    }
+
+
+def render_digest(data: Dict[str, Any]) -> Tuple[str, str, str]:
+    """(subject, text, html) for digest_data() output, matching the SES template."""
+    text_parts: List[str] = []
+    html_parts: List[str] = []
+    for search in data["searches"]:
+        text_parts.append(search["title"] + "\n")
+        text_parts.extend(_ROW_TEXT.substitute(row) for row in search["listings"])
+        more = search.get("more") or 0
+        if more:
+            text_parts.append(_MORE_TEXT.substitute(more=more))
+        text_parts.append("\n")
+        rows = "".join(_ROW_HTML.substitute({k: html.escape(v) for k, v in row.items()})
+                       for row in search["listings"])
+        html_parts.append(_SECTION_HTML.substitute(title=html.escape(search["title"]), rows=rows,
+                                                   more=_MORE_HTML.substitute(more=more) if more else ""))
+    return data["subject"], "".join(text_parts), "".join(html_parts)
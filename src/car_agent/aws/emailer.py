@@ -1,8 +1,40 @@
 from __future__ import annotations
 
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
 from botocore.exceptions import ClientError
 
+from car_agent.aws.digest import (
+    SES_TEMPLATE_HTML,
+    SES_TEMPLATE_SUBJECT,
+    SES_TEMPLATE_TEXT,
+    Digest,
+    digest_data,
+)
 from car_agent.config import Settings
+from car_agent.scraping.rate_limit import TokenBucket
+
+SES_BULK_MAX_DESTINATIONS = 50     # SendBulkTemplatedEmail limit
+SES_SEND_CONCURRENCY = 4
+SES_SEND_ATTEMPTS = 4
+SES_BACKOFF_S = 0.5
+SES_BACKOFF_MAX_S = 8.0
+SES_DEFAULT_MAX_SEND_RATE = 1.0    # sandbox quota, used when GetSendQuota fails
+SES_RATE_HEADROOM = 0.9            # pace below MaxSendRate so timing jitter doesn't trip throttling
+DEAD_LETTER_TTL_S = 30 * 24 * 3600
+
+# Per-destination statuses and API error codes worth another attempt
+_RETRY_STATUSES = {"AccountThrottled", "TransientFailure", "Failed"}
+_RETRY_ERRORS = {"Throttling", "ThrottlingException", "ServiceUnavailable", "InternalFailure", "RequestTimeout"}
 
 
 class Emailer:
@@ -22,3 +54,211 @@ class Emailer:
             )
         except ClientError as e:
             print(f"Error sending email: {e}")
+
+
+# ----- dead letters -----
+
+class FileDeadLetterStore:
+    """Undeliverable digests as JSON lines (local runs)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def put(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+
+class DynamoDeadLetterStore:
+    """Undeliverable digests in DynamoDB: HASH dead_letter_id, TTL attribute expires_at."""
+
+    def __init__(self, table):
+        self._table = table
+
+    def put(self, record: Dict[str, Any]) -> None:
+        try:
+            self._table.put_item(Item={"dead_letter_id": record["dead_letter_id"],
+                                       "email": record["email"], "reason": record["reason"],
+                                       "record": json.dumps(record, default=str),
+                                       "expires_at": int(time.time()) + DEAD_LETTER_TTL_S})
+        except ClientError as e:
+            print(f"Error writing email dead letter: {e}; record: {json.dumps(record, default=str)}")
+
+
+def build_dead_letter_store(settings: Settings, dynamodb_resource=None):
+    if settings.email_dead_letter_table_name and dynamodb_resource is not None:
+        return DynamoDeadLetterStore(dynamodb_resource.Table(settings.email_dead_letter_table_name))
+    return FileDeadLetterStore(settings.email_dead_letter_path)
+
+
+# ----- digest delivery -----
+
+@dataclass
+class DeliveryReport:
+    digests: int = 0
+    sent: int = 0
+    retried: int = 0
+    dead_lettered: int = 0
+    api_calls: int = 0
+    throttle_wait_s: float = 0.0
+    wall_s: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def incr(self, name: str, n=1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    @property
+    def emails_per_s(self) -> float:
+        return self.sent / self.wall_s if self.wall_s else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        out = {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+        out["throttle_wait_s"] = round(self.throttle_wait_s, 2)
+        out["wall_s"] = round(self.wall_s, 2)
+        out["emails_per_s"] = round(self.emails_per_s, 1)
+        return out
+
+
+class DigestMailer:
+    """Sends one templated digest per recipient through SendBulkTemplatedEmail.
+
+    Destinations go out up to 50 per call, gated by a token bucket sized to the
+    account's MaxSendRate (GetSendQuota, or SES_MAX_SEND_RATE) less 10% headroom.
+    Destinations that fail with a throttling or transient status are retried with
+    backoff. Whatever still fails, or would exceed the remaining 24-hour quota,
+    is written to the dead-letter store.
+    """
+
+    def __init__(self, ses_client, settings: Settings, dead_letters=None,
+                 concurrency: int = SES_SEND_CONCURRENCY):
+        self._ses = ses_client
+        self._settings = settings
+        self.dead_letters = dead_letters if dead_letters is not None else FileDeadLetterStore(
+            settings.email_dead_letter_path)
+        self.concurrency = concurrency
+        self.report = DeliveryReport()
+        self.template = settings.ses_template_name
+        self._template_ready = False
+        self._bucket: Optional[TokenBucket] = None
+        self._remaining_today: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def ensure_template(self) -> None:
+        """Create or update the SES template once per process."""
+        with self._lock:
+            if self._template_ready:
+                return
+            template = {"TemplateName": self.template, "SubjectPart": SES_TEMPLATE_SUBJECT,
+                        "TextPart": SES_TEMPLATE_TEXT, "HtmlPart": SES_TEMPLATE_HTML}
+            try:
+                self._ses.update_template(Template=template)
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "TemplateDoesNotExist":
+                    raise
+                self._ses.create_template(Template=template)
+            self._template_ready = True
+
+    def _quota(self) -> TokenBucket:
+        with self._lock:
+            if self._bucket is None:
+                rate = self._settings.ses_max_send_rate
+                try:
+                    quota = self._ses.get_send_quota()
+                    rate = rate or float(quota["MaxSendRate"])
+                    self._remaining_today = int(float(quota["Max24HourSend"]) - float(quota["SentLast24Hours"]))
+                except (ClientError, KeyError) as e:
+                    print(f"Error reading SES send quota: {e}")
+                rate = (rate or SES_DEFAULT_MAX_SEND_RATE) * SES_RATE_HEADROOM
+                # burst = one full call, so a bulk send never waits on a bucket it can't fill
+                self._bucket = TokenBucket(rate, burst=max(1, min(SES_BULK_MAX_DESTINATIONS, int(rate))))
+            return self._bucket
+
+    def send_digests(self, digests: List[Digest]) -> Set[str]:
+        """Send every digest; returns the (lower-cased) addresses that were delivered."""
+        start = time.perf_counter()
+        self.report = report = DeliveryReport(digests=len(digests))
+        delivered: Set[str] = set()
+        if not digests:
+            return delivered
+        bucket = self._quota()
+        self.ensure_template()
+
+        with self._lock:
+            allowed = len(digests) if self._remaining_today is None else max(0, self._remaining_today)
+            if self._remaining_today is not None:
+                self._remaining_today -= min(allowed, len(digests))
+        for d in digests[allowed:]:
+            self._dead_letter(d, "Max24HourSend reached", report)
+        digests = digests[:allowed]
+
+        size = bucket.burst
+        chunks = [digests[i:i + size] for i in range(0, len(digests), size)]
+        lock = threading.Lock()
+
+        def send(chunk: List[Digest]) -> None:
+            for email in self._send_chunk(chunk, bucket, report):
+                with lock:
+                    delivered.add(email)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(chunks)))) as pool:
+            list(pool.map(send, chunks))
+        report.wall_s = time.perf_counter() - start
+        print(f"[EMAIL] {report.as_dict()}")
+        return delivered
+
+    def _send_chunk(self, chunk: List[Digest], bucket: TokenBucket, report: DeliveryReport) -> List[str]:
+        pending = list(chunk)
+        delivered: List[str] = []
+        last_error = ""
+        for attempt in range(SES_SEND_ATTEMPTS):
+            if not pending:
+                break
+            if attempt:
+                report.incr("retried", len(pending))
+                time.sleep(random.uniform(0, min(SES_BACKOFF_MAX_S, SES_BACKOFF_S * 2 ** attempt)))
+            report.incr("throttle_wait_s", bucket.acquire(len(pending)))
+            report.incr("api_calls")
+            try:
+                resp = self._ses.send_bulk_templated_email(
+                    Source=self._settings.from_email,
+                    Template=self.template,
+                    DefaultTemplateData=json.dumps({"subject": "New car listings", "searches": []}),
+                    Destinations=[{"Destination": {"ToAddresses": [d.email]},
+                                   "ReplacementTemplateData": json.dumps(digest_data(d))} for d in pending],
+                )
+            except ClientError as e:
+                last_error = e.response["Error"]["Code"]
+                if last_error in _RETRY_ERRORS:
+                    continue
+                break
+            retry = []
+            for d, status in zip(pending, resp.get("Status", [])):
+                code = status.get("Status")
+                if code == "Success":
+                    delivered.append(d.email.lower())
+                    report.incr("sent")
+                elif code in _RETRY_STATUSES:
+                    retry.append(d)
+                    last_error = code
+                else:
+                    self._dead_letter(d, f"{code}: {status.get('Error', '')}", report)
+            pending = retry
+        for d in pending:
+            self._dead_letter(d, last_error or "unknown", report)
+        return delivered
+
+    def _dead_letter(self, digest: Digest, reason: str, report: DeliveryReport) -> None:
+        report.incr("dead_lettered")
+        self.dead_letters.put({
+            "dead_letter_id": uuid.uuid4().hex,
+            "email": digest.email,
+            "reason": reason,
+            "query_ids": digest.query_ids,
+            "template": self.template,
+            "template_data": digest_data(digest),
+            "failed_at": datetime.utcnow().isoformat(),
+        })
@@ -1,19 +1,78 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
 
 from botocore.exceptions import ClientError
 
 from car_agent.config import Settings
 
 
+_RATE_RE = re.compile(r"^rate\(\s*(\d+)\s+(minute|hour|day)s?\s*\)$")
+_UNIT_S = {"minute": 60, "hour": 3600, "day": 86400}
+
+SCHEDULE_PREFIX = "car-scraper-"
+BUCKET_SCHEDULE_PREFIX = "car-scraper-bucket-"
+
+# Bucket mode: every query belongs to one (interval, slot) bucket and each bucket
+# has one schedule. Queries go in the longest interval not longer than their own;
+# their next_run_at skips firings they aren't due for (rate(2 days) runs on every
+# other daily firing). Slots spread each interval's queries over offsets in it.
+BUCKET_INTERVALS = {"1h": 3600, "6h": 6 * 3600, "1d": 86400, "7d": 7 * 86400}
+
+
+def schedule_interval_s(expression: str) -> Optional[int]:
+    """Seconds between runs for a rate(...) expression; None for cron/at expressions."""
+    m = _RATE_RE.match((expression or "").strip())
+    return int(m.group(1)) * _UNIT_S[m.group(2)] if m else None
+
+
+def bucket_for(query_id: str, frequency: str, slots: int) -> str:
+    """Bucket id "<interval>-<offset minutes>", e.g. "1d-0360"; the slot is a stable hash of query_id."""
+    interval = schedule_interval_s(frequency) or 86400
+    label, bucket_s = "1h", 3600
+    for name, seconds in BUCKET_INTERVALS.items():
+        if seconds <= interval:
+            label, bucket_s = name, seconds
+    slot = zlib.crc32(query_id.encode("utf-8")) % max(1, slots)
+    return f"{label}-{slot * (bucket_s // 60) // max(1, slots):04d}"
+
+
+def parse_bucket(bucket: str) -> Tuple[int, int]:
+    """(interval seconds, offset minutes) of a bucket id."""
+    label, offset = bucket.split("-")
+    return BUCKET_INTERVALS[label], int(offset)
+
+
+def all_buckets(slots: int) -> List[str]:
+    return sorted({f"{label}-{slot * (seconds // 60) // max(1, slots):04d}"
+                   for label, seconds in BUCKET_INTERVALS.items() for slot in range(max(1, slots))})
+
+
+def bucket_expression(bucket: str) -> str:
+    """UTC cron expression firing once per interval at the bucket's offset."""
+    interval_s, offset = parse_bucket(bucket)
+    minute, hour = offset % 60, offset // 60 % 24
+    if interval_s == 3600:
+        return f"cron({offset} * * * ? *)"
+    if interval_s < 86400:
+        step = interval_s // 3600
+        return f"cron({minute} {','.join(str(h) for h in range(hour % step, 24, step))} * * ? *)"
+    if interval_s == 86400:
+        return f"cron({minute} {hour} * * ? *)"
+    return f"cron({minute} {hour} ? * {offset // 1440 + 1} *)"
+
+
 class Scheduler:
     def __init__(self, scheduler_client, settings: Settings):
         self._client = scheduler_client
         self._settings = settings
 
     def create_schedule(self, query_id: str, schedule_details: Dict[str, Any]) -> None:
+        if self._settings.schedule_mode == "bucket":
+            return  # membership is the query's schedule_bucket attribute (Storage.store_recurring_query)
         schedule_name = f"car-scraper-{query_id}"
         frequency = schedule_details["frequency"]
 
@@ -31,3 +90,50 @@ class Scheduler:
             )
         except ClientError as e:
             print(f"Error creating schedule: {e}")
+
+    def delete_schedule(self, query_id: str) -> None:
+        if self._settings.schedule_mode == "bucket":
+            return  # Storage.deactivate_query drops the bucket membership
+        self.delete_schedule_named(f"{SCHEDULE_PREFIX}{query_id}")
+
+    def delete_schedule_named(self, name: str) -> None:
+        try:
+            self._client.delete_schedule(Name=name)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ResourceNotFoundException":
+                print(f"Error deleting schedule: {e}")
+
+    def ensure_bucket_schedules(self) -> List[str]:
+        """Create the schedule of every bucket that doesn't have one yet; returns the names created."""
+        created = []
+        for bucket in all_buckets(self._settings.schedule_bucket_slots):
+            name = f"{BUCKET_SCHEDULE_PREFIX}{bucket}"
+            try:
+                self._client.create_schedule(
+                    Name=name,
+                    ScheduleExpression=bucket_expression(bucket),
+                    Target={
+                        "Arn": self._settings.scraper_lambda_arn,
+                        "RoleArn": self._settings.scheduler_role_arn,
+                        "Input": json.dumps({"bucket": bucket}),
+                    },
+                    FlexibleTimeWindow={"Mode": "OFF"},
+                    State="ENABLED",
+                )
+                created.append(name)
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConflictException":
+                    print(f"Error creating bucket schedule: {e}")
+        return created
+
+    def list_query_schedules(self) -> List[str]:
+        """Names of the per-query schedules (car-scraper-<query_id>), for migrating to buckets."""
+        names = []
+        kwargs: Dict[str, Any] = {"NamePrefix": SCHEDULE_PREFIX}
+        while True:
+            resp = self._client.list_schedules(**kwargs)
+            names.extend(s["Name"] for s in resp.get("Schedules", [])
+                         if not s["Name"].startswith(BUCKET_SCHEDULE_PREFIX))
+            if not resp.get("NextToken"):
+                return names
+            kwargs["NextToken"] = resp["NextToken"]
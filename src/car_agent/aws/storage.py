@@ -1,33 +1,223 @@
 from __future__ import annotations
 
+import base64
 import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+import zstandard
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import Binary
 from botocore.exceptions import ClientError
 
+from car_agent.aws.scheduler import bucket_for, schedule_interval_s
+from car_agent.aws.tables import ACTIVE_NEXT_RUN_INDEX, SCHEDULE_BUCKET_INDEX, USER_TIMESTAMP_INDEX
 from car_agent.config import Settings
 
+# Results table: HASH search_id, RANGE item_key. One "#search" header item per
+# search plus one "listing#<rank>" item per result.
+RESULT_HEADER_KEY = "#search"
+RESULT_COMPRESS_MIN_BYTES = 1024   # string fields at least this long are stored zstd-compressed
+BATCH_WRITE_MAX_ITEMS = 25         # DynamoDB BatchWriteItem limit
+BATCH_WRITE_CONCURRENCY = 4
+BATCH_WRITE_MAX_ATTEMPTS = 8
+BATCH_WRITE_BACKOFF_S = 0.05
+BATCH_WRITE_BACKOFF_MAX_S = 2.0
+
+
+@dataclass
+class StorageStats:
+    items_written: int = 0
+    batch_requests: int = 0
+    unprocessed_retries: int = 0   # items DynamoDB handed back and we re-sent
+    failed_items: int = 0          # still unprocessed after BATCH_WRITE_MAX_ATTEMPTS
+    compressed_fields: int = 0
+    compressed_bytes_saved: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+
+
+def to_dynamo(value: Any) -> Any:
+    """Python value -> DynamoDB-safe value: floats become Decimal, None entries are dropped."""
+    if isinstance(value, float):
+        return Decimal(str(value)) if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: v for k, v in ((k, to_dynamo(v)) for k, v in value.items()) if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [to_dynamo(v) for v in value if v is not None]
+    return value
+
+
+def from_dynamo(value: Any) -> Any:
+    """Inverse of to_dynamo: Decimal back to int/float, Binary to bytes."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, Binary):
+        return bytes(value)
+    if isinstance(value, dict):
+        return {k: from_dynamo(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [from_dynamo(v) for v in value]
+    return value
+
+
+def listing_item(search_id: str, rank: int, record: Dict[str, Any],
+                 cctx: zstandard.ZstdCompressor, stats: Optional[StorageStats] = None) -> Dict[str, Any]:
+    """One result record as its own item; numbers stay native, long text is compressed."""
+    item: Dict[str, Any] = {"search_id": search_id, "item_key": f"listing#{rank:05d}", "rank": rank}
+    compressed = []
+    for k, v in record.items():
+        if v is None or k in item:
+            continue
+        if isinstance(v, str) and len(v) >= RESULT_COMPRESS_MIN_BYTES:
+            raw = v.encode("utf-8")
+            item[k] = cctx.compress(raw)
+            compressed.append(k)
+            if stats is not None:
+                stats.incr("compressed_fields")
+                stats.incr("compressed_bytes_saved", len(raw) - len(item[k]))
+        else:
+            item[k] = to_dynamo(v)
+    if compressed:
+        item["zfields"] = set(compressed)
+    return item
+
+
+@dataclass
+class Page:
+    """One page of a paginated read; pass `cursor` back to get the next page (None = done)."""
+    items: List[Dict[str, Any]]
+    cursor: Optional[str] = None
+
+
+def encode_cursor(last_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not last_key:
+        return None
+    raw = json.dumps(from_dynamo(last_key), separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not cursor:
+        return None
+    try:
+        return to_dynamo(json.loads(base64.urlsafe_b64decode(cursor.encode("ascii"))))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"invalid cursor: {e}") from None
+
+
+def _projection(attributes: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """ProjectionExpression kwargs with every name aliased (timestamp, status ... are reserved)."""
+    if not attributes:
+        return {}
+    names = {f"#p{i}": a for i, a in enumerate(attributes)}
+    return {"ProjectionExpression": ", ".join(names), "ExpressionAttributeNames": names}
+
+
+def _decode_row(item: Dict[str, Any]) -> Dict[str, Any]:
+    out = from_dynamo(item)
+    if isinstance(out.get("criteria"), str):
+        out["criteria"] = json.loads(out["criteria"])
+    return out
+
+
+def decode_listing(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Result record back from a listing item (decompresses the fields named in zfields)."""
+    zfields = item.get("zfields") or set()
+    dctx = zstandard.ZstdDecompressor() if zfields else None
+    out: Dict[str, Any] = {}
+    for k, v in item.items():
+        if k in ("search_id", "item_key", "rank", "zfields"):
+            continue
+        out[k] = dctx.decompress(bytes(v)).decode("utf-8") if k in zfields else from_dynamo(v)
+    return out
+
 
 class Storage:
     def __init__(self, dynamodb_resource, settings: Settings):
         self._settings = settings
         self.queries_table = dynamodb_resource.Table(settings.queries_table_name)
         self.results_table = dynamodb_resource.Table(settings.results_table_name)
+        self.seen_table = dynamodb_resource.Table(settings.seen_table_name)
+        self.stats = StorageStats()
 
-    def store_search(self, user_id: str, criteria: Dict[str, Any], results: List[Dict[str, Any]], query_type: str) -> None:
-        timestamp = datetime.utcnow().isoformat()
+    def store_search(self, user_id: str, criteria: Dict[str, Any], results: List[Dict[str, Any]],
+                     query_type: str, query_id: Optional[str] = None,
+                     timestamp: Optional[str] = None) -> Optional[str]:
+        """Write one item per listing, then the search header; returns the search_id.
+
+        The header goes last so a reader that finds it also finds the listings.
+        `timestamp` (default now) keeps an old search's id when it is migrated.
+        """
+        timestamp = timestamp or datetime.utcnow().isoformat()
+        search_id = f"{user_id}#{timestamp}"
+        cctx = zstandard.ZstdCompressor(level=6)
+        items = [listing_item(search_id, rank, record, cctx, self.stats) for rank, record in enumerate(results)]
+        header = {
+            "search_id": search_id,
+            "item_key": RESULT_HEADER_KEY,
+            "user_id": user_id,
+            "timestamp": timestamp,
+            "criteria": json.dumps(criteria),
+            "query_type": query_type,
+        }
+        if query_id:
+            header["query_id"] = query_id
         try:
-            self.results_table.put_item(Item={
-                "user_id": user_id,
-                "timestamp": timestamp,
-                "criteria": json.dumps(criteria),
-                "results": json.dumps(results),
-                "query_type": query_type,
-                "result_count": len(results),
-            })
+            written = self.batch_put(self.results_table, items)
+            header["result_count"] = written
+            self.results_table.put_item(Item=header)
         except ClientError as e:
             print(f"Error storing search: {e}")
+            return None
+        if written < len(items):
+            print(f"Error storing search: {len(items) - written} of {len(items)} listings were not written")
+        return search_id
+
+    def batch_put(self, table, items: List[Dict[str, Any]], concurrency: int = BATCH_WRITE_CONCURRENCY) -> int:
+        """BatchWriteItem in chunks of 25, `concurrency` chunks in flight; returns items written.
+
+        Unprocessed items are re-sent with jittered exponential backoff, up to
+        BATCH_WRITE_MAX_ATTEMPTS per chunk (boto3's batch_writer re-queues them
+        forever without backing off).
+        """
+        chunks = [items[i:i + BATCH_WRITE_MAX_ITEMS] for i in range(0, len(items), BATCH_WRITE_MAX_ITEMS)]
+        if not chunks:
+            return 0
+        client = table.meta.client  # resource-level client: accepts plain Python values
+
+        def write(chunk: List[Dict[str, Any]]) -> int:
+            requests = [{"PutRequest": {"Item": item}} for item in chunk]
+            for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+                if attempt:
+                    self.stats.incr("unprocessed_retries", len(requests))
+                    time.sleep(random.uniform(0, min(BATCH_WRITE_BACKOFF_MAX_S, BATCH_WRITE_BACKOFF_S * 2 ** attempt)))
+                self.stats.incr("batch_requests")
+                resp = client.batch_write_item(RequestItems={table.name: requests})
+                requests = (resp.get("UnprocessedItems") or {}).get(table.name) or []
+                if not requests:
+                    break
+            self.stats.incr("failed_items", len(requests))
+            self.stats.incr("items_written", len(chunk) - len(requests))
+            return len(chunk) - len(requests)
+
+        if len(chunks) == 1 or concurrency <= 1:
+            return sum(write(c) for c in chunks)
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(chunks))) as pool:
+            return sum(pool.map(write, chunks))
 
     def store_recurring_query(self, user_id: str, criteria: Dict[str, Any], schedule_details: Dict[str, Any]) -> Optional[str]:
         query_id = f"{user_id}_{int(datetime.utcnow().timestamp())}"
@@ -43,8 +233,167 @@ class Storage:
                 "frequency": schedule_details["frequency"],
                 "end_date": schedule_details.get("end_date", ""),
                 "active": True,
+                # Sparse GSI key: only active queries are in the status/next_run_at index
+                "status": "active",
+                "next_run_at": int(time.time()),
+                # Bucket membership (SCHEDULE_MODE=bucket); written in both modes so switching needs no backfill
+                "schedule_bucket": bucket_for(query_id, schedule_details["frequency"],
+                                              self._settings.schedule_bucket_slots),
             })
             return query_id
         except ClientError as e:
             print(f"Error storing recurring query: {e}")
             return None
+
+    # ----- reads -----
+
+    def _query(self, table, key_condition, limit: int, cursor: Optional[str], index: Optional[str] = None,
+               projection: Optional[Sequence[str]] = None, consistent: bool = False,
+               newest_first: bool = False) -> Page:
+        if consistent and index:
+            raise ValueError("global secondary indexes only support eventually consistent reads")
+        kwargs: Dict[str, Any] = {"KeyConditionExpression": key_condition, "Limit": limit,
+                                  "ScanIndexForward": not newest_first, **_projection(projection)}
+        if index:
+            kwargs["IndexName"] = index
+        if consistent:
+            kwargs["ConsistentRead"] = True
+        start_key = decode_cursor(cursor)
+        if start_key:
+            kwargs["ExclusiveStartKey"] = start_key
+        resp = table.query(**kwargs)
+        return Page([_decode_row(i) for i in resp.get("Items", [])], encode_cursor(resp.get("LastEvaluatedKey")))
+
+    def list_searches(self, user_id: str, limit: int = 20, cursor: Optional[str] = None,
+                      projection: Optional[Sequence[str]] = None) -> Page:
+        """A user's search headers, newest first (user_id/timestamp GSI)."""
+        try:
+            return self._query(self.results_table, Key("user_id").eq(user_id), limit, cursor,
+                               index=USER_TIMESTAMP_INDEX, projection=projection, newest_first=True)
+        except ClientError as e:
+            print(f"Error listing searches: {e}")
+            return Page([])
+
+    def get_search(self, search_id: str, limit: int = 100, cursor: Optional[str] = None,
+                   consistent: bool = False) -> Tuple[Optional[Dict[str, Any]], Page]:
+        """(header, page of decoded listings) for one stored search; header only on the first page."""
+        try:
+            page = self._query(self.results_table, Key("search_id").eq(search_id), limit, cursor,
+                               consistent=consistent)
+        except ClientError as e:
+            print(f"Error reading search: {e}")
+            return None, Page([])
+        header = None
+        listings = []
+        for item in page.items:
+            if item.get("item_key") == RESULT_HEADER_KEY:
+                header = item
+            else:
+                listings.append(decode_listing(item))
+        return header, Page(listings, page.cursor)
+
+    def list_user_queries(self, user_id: str, limit: int = 20, cursor: Optional[str] = None,
+                          projection: Optional[Sequence[str]] = None) -> Page:
+        """A user's recurring queries, newest first (user_id/timestamp GSI)."""
+        try:
+            return self._query(self.queries_table, Key("user_id").eq(user_id), limit, cursor,
+                               index=USER_TIMESTAMP_INDEX, projection=projection, newest_first=True)
+        except ClientError as e:
+            print(f"Error listing queries: {e}")
+            return Page([])
+
+    def list_due_queries(self, now: Optional[float] = None, limit: int = 100, cursor: Optional[str] = None,
+                         projection: Optional[Sequence[str]] = None) -> Page:
+        """Active queries whose next_run_at has passed, oldest first (sparse status GSI)."""
+        now = int(now if now is not None else time.time())
+        try:
+            return self._query(self.queries_table, Key("status").eq("active") & Key("next_run_at").lte(now),
+                               limit, cursor, index=ACTIVE_NEXT_RUN_INDEX, projection=projection)
+        except ClientError as e:
+            print(f"Error listing due queries: {e}")
+            return Page([])
+
+    def list_bucket_queries(self, bucket: str, now: Optional[float] = None, limit: int = 100,
+                            cursor: Optional[str] = None, projection: Optional[Sequence[str]] = None) -> Page:
+        """Due members of a schedule bucket, oldest first (sparse schedule_bucket GSI)."""
+        now = int(now if now is not None else time.time())
+        try:
+            return self._query(self.queries_table, Key("schedule_bucket").eq(bucket) & Key("next_run_at").lte(now),
+                               limit, cursor, index=SCHEDULE_BUCKET_INDEX, projection=projection)
+        except ClientError as e:
+            print(f"Error listing bucket queries: {e}")
+            return Page([])
+
+    def assign_bucket(self, query_id: str, bucket: str) -> bool:
+        """Put an active query into a schedule bucket; False if it's gone or inactive."""
+        try:
+            self.queries_table.update_item(
+                Key={"query_id": query_id},
+                UpdateExpression="SET schedule_bucket = :b",
+                ConditionExpression="attribute_exists(#s)",
+                ExpressionAttributeNames={"#s": "status"},
+                ExpressionAttributeValues={":b": bucket},
+            )
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                print(f"Error assigning schedule bucket: {e}")
+            return False
+
+    def get_query(self, query_id: str, consistent: bool = False,
+                  projection: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        try:
+            item = self.queries_table.get_item(Key={"query_id": query_id}, ConsistentRead=consistent,
+                                               **_projection(projection)).get("Item")
+        except ClientError as e:
+            print(f"Error reading query: {e}")
+            return None
+        return _decode_row(item) if item else None
+
+    def reschedule_query(self, query_id: str, frequency: str, ran_at: Optional[float] = None) -> int:
+        """Record a run and move next_run_at one interval on (a day for non-rate expressions)."""
+        ran_at = int(ran_at if ran_at is not None else time.time())
+        next_run_at = ran_at + (schedule_interval_s(frequency) or 86400)
+        try:
+            self.queries_table.update_item(
+                Key={"query_id": query_id},
+                UpdateExpression="SET last_run_at = :r, next_run_at = :n",
+                ExpressionAttributeValues={":r": ran_at, ":n": next_run_at},
+            )
+        except ClientError as e:
+            print(f"Error rescheduling query: {e}")
+        return next_run_at
+
+    def deactivate_query(self, query_id: str) -> None:
+        """Drop a query out of the due index and its schedule bucket (its item and history stay)."""
+        try:
+            self.queries_table.update_item(
+                Key={"query_id": query_id},
+                UpdateExpression="SET active = :f REMOVE #s, schedule_bucket",
+                ExpressionAttributeNames={"#s": "status"},
+                ExpressionAttributeValues={":f": False},
+            )
+        except ClientError as e:
+            print(f"Error deactivating query: {e}")
+
+    def load_seen_index(self, query_id: str) -> Optional[bytes]:
+        """The stored index blob, or None if the query has none yet.
+
+        Read errors propagate: treated as an empty index they would email every
+        listing as new and then overwrite the query's history.
+        """
+        item = self.seen_table.get_item(Key={"query_id": query_id}).get("Item")
+        return bytes(item["index"]) if item else None
+
+    def save_seen_index(self, query_id: str, blob: bytes) -> None:
+        # expires_at is the table's TTL attribute: abandoned queries clean themselves up
+        expires_at = int(time.time()) + self._settings.seen_index_ttl_days * 86400
+        try:
+            self.seen_table.put_item(Item={
+                "query_id": query_id,
+                "index": blob,
+                "updated_at": datetime.utcnow().isoformat(),
+                "expires_at": expires_at,
+            })
+        except ClientError as e:
+            print(f"Error saving seen index: {e}")
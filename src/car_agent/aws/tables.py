@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from botocore.exceptions import ClientError
+
+from car_agent.config import Settings
+
+# Global secondary indexes read by Storage
+USER_TIMESTAMP_INDEX = "user_id-timestamp-index"   # queries and results (search headers only)
+ACTIVE_NEXT_RUN_INDEX = "status-next_run_at-index"  # sparse: only active queries carry `status`
+SCHEDULE_BUCKET_INDEX = "schedule_bucket-next_run_at-index"  # sparse: bucket membership of active queries
+
+
+def _key(hash_key: str, range_key: str = "") -> List[Dict[str, str]]:
+    schema = [{"AttributeName": hash_key, "KeyType": "HASH"}]
+    if range_key:
+        schema.append({"AttributeName": range_key, "KeyType": "RANGE"})
+    return schema
+
+
+def _attrs(**types: str) -> List[Dict[str, str]]:
+    return [{"AttributeName": name, "AttributeType": t} for name, t in types.items()]
+
+
+def _gsi(name: str, hash_key: str, range_key: str) -> Dict[str, Any]:
+    return {"IndexName": name, "KeySchema": _key(hash_key, range_key), "Projection": {"ProjectionType": "ALL"}}
+
+
+def table_definitions(settings: Settings) -> List[Dict[str, Any]]:
+    """create_table arguments for every table the agent uses (on-demand billing).
+
+    `ttl` is the table's TTL attribute, applied separately after creation.
+    """
+    return [
+        {
+            "TableName": settings.queries_table_name,
+            "KeySchema": _key("query_id"),
+            "AttributeDefinitions": _attrs(query_id="S", user_id="S", timestamp="S", status="S", next_run_at="N",
+                                           schedule_bucket="S"),
+            "GlobalSecondaryIndexes": [
+                _gsi(USER_TIMESTAMP_INDEX, "user_id", "timestamp"),
+                _gsi(ACTIVE_NEXT_RUN_INDEX, "status", "next_run_at"),
+                _gsi(SCHEDULE_BUCKET_INDEX, "schedule_bucket", "next_run_at"),
+            ],
+        },
+        {
+            "TableName": settings.results_table_name,
+            "KeySchema": _key("search_id", "item_key"),
+            "AttributeDefinitions": _attrs(search_id="S", item_key="S", user_id="S", timestamp="S"),
+            "GlobalSecondaryIndexes": [_gsi(USER_TIMESTAMP_INDEX, "user_id", "timestamp")],
+        },
+        {
+            "TableName": settings.seen_table_name,
+            "KeySchema": _key("query_id"),
+            "AttributeDefinitions": _attrs(query_id="S"),
+            "ttl": "expires_at",
+        },
+        {
+            "TableName": settings.crawl_leases_table_name,
+            "KeySchema": _key("path_key", "spec_key"),
+            "AttributeDefinitions": _attrs(path_key="S", spec_key="S"),
+            "ttl": "expires_at",
+        },
+        {
+            "TableName": settings.llm_cache_table_name or "CarLlmCache",
+            "KeySchema": _key("cache_key"),
+            "AttributeDefinitions": _attrs(cache_key="S"),
+            "ttl": "expires_at",
+        },
+        {
+            "TableName": settings.sessions_table_name or "CarSessions",
+            "KeySchema": _key("session_id"),
+            "AttributeDefinitions": _attrs(session_id="S"),
+            "ttl": "expires_at",
+        },
+        {
+            "TableName": settings.search_jobs_table_name or "CarSearchJobs",
+            "KeySchema": _key("job_id", "item_key"),
+            "AttributeDefinitions": _attrs(job_id="S", item_key="S"),
+            "ttl": "expires_at",
+        },
+        {
+            "TableName": settings.email_dead_letter_table_name or "CarEmailDeadLetters",
+            "KeySchema": _key("dead_letter_id"),
+            "AttributeDefinitions": _attrs(dead_letter_id="S"),
+            "ttl": "expires_at",
+        },
+    ]
+
+
+def create_tables(dynamodb_resource, settings: Settings) -> List[str]:
+    """Create any missing tables with their indexes and TTL; returns the names created."""
+    created = []
+    for definition in table_definitions(settings):
+        definition = dict(definition)
+        ttl = definition.pop("ttl", None)
+        try:
+            table = dynamodb_resource.create_table(BillingMode="PAY_PER_REQUEST", **definition)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ResourceInUseException":
+                raise
+            continue
+        table.wait_until_exists()
+        if ttl:
+            try:
+                table.meta.client.update_time_to_live(
+                    TableName=table.name, TimeToLiveSpecification={"Enabled": True, "AttributeName": ttl})
+            except ClientError as e:
+                print(f"Error enabling TTL on {table.name}: {e}")
+        created.append(table.name)
+    return created
+
+
+def add_missing_indexes(dynamodb_resource, settings: Settings) -> List[str]:
+    """Add GSIs defined here but missing from existing tables (one per UpdateTable call); returns their names.
+
+    DynamoDB backfills a new index in the background; it is queryable once ACTIVE.
+    """
+    added = []
+    for definition in table_definitions(settings):
+        table = dynamodb_resource.Table(definition["TableName"])
+        try:
+            existing = {i["IndexName"] for i in table.global_secondary_indexes or []}
+        except ClientError as e:
+            print(f"Error describing {table.name}: {e}")
+            continue
+        attrs = {a["AttributeName"]: a for a in definition["AttributeDefinitions"]}
+        for gsi in definition.get("GlobalSecondaryIndexes", []):
+            if gsi["IndexName"] in existing:
+                continue
+            table.meta.client.update_table(
+                TableName=table.name,
+                AttributeDefinitions=[attrs[k["AttributeName"]] for k in gsi["KeySchema"]],
+                GlobalSecondaryIndexUpdates=[{"Create": gsi}],
+            )
+            added.append(gsi["IndexName"])
+    return added
@@ -15,10 +15,71 @@ class Settings:
     from_email: str = os.environ.get("FROM_EMAIL", "")
     scraper_lambda_arn: str = os.environ.get("SCRAPER_LAMBDA_ARN", "")
     scheduler_role_arn: str = os.environ.get("SCHEDULER_ROLE_ARN", "")
+    # query: one EventBridge schedule per recurring query; bucket: a fixed set of
+    # shared schedules, with membership kept on the query item (aws/scheduler.py)
+    schedule_mode: str = os.environ.get("SCHEDULE_MODE", "query")
+    schedule_bucket_slots: int = int(os.environ.get("SCHEDULE_BUCKET_SLOTS", "4"))
 
     # Prefer env var for deployment. (Avoid userdata in production.)
     openai_api_key: str = os.environ.get("OPENAI_API_KEY", "")
 
     # DynamoDB tables
     queries_table_name: str = os.environ.get("CAR_QUERIES_TABLE", "CarQueries")
-    results_table_name: str = os.environ.get("CAR_RESULTS_TABLE", "CarSearchResults")
+    # Per-listing schema (HASH search_id, RANGE item_key); the old CarSearchResults
+    # table (HASH user_id, RANGE timestamp) cannot hold it, see scripts/migrate_results.py
+    results_table_name: str = os.environ.get("CAR_RESULTS_TABLE", "CarSearchResultsV2")
+    seen_table_name: str = os.environ.get("CAR_SEEN_TABLE", "CarSeenIndex")
+    crawl_leases_table_name: str = os.environ.get("CAR_CRAWL_LEASES_TABLE", "CarCrawlLeases")
+    seen_index_ttl_days: int = int(os.environ.get("SEEN_INDEX_TTL_DAYS", "120"))
+
+    # Detail-page HTTP cache (both empty = disabled; the bucket wins if set)
+    http_cache_dir: str = os.environ.get("HTTP_CACHE_DIR", "")
+    http_cache_bucket: str = os.environ.get("HTTP_CACHE_BUCKET", "")
+    http_cache_max_mb: int = int(os.environ.get("HTTP_CACHE_MAX_MB", "256"))
+    http_cache_ttl_s: int = int(os.environ.get("HTTP_CACHE_TTL_S", str(7 * 24 * 3600)))
+    http_cache_fresh_s: int = int(os.environ.get("HTTP_CACHE_FRESH_S", "3600"))
+
+    # Raw-HTML archive of every fetched page (both empty = disabled; the bucket wins if set)
+    html_archive_dir: str = os.environ.get("HTML_ARCHIVE_DIR", "")
+    html_archive_bucket: str = os.environ.get("HTML_ARCHIVE_BUCKET", "")
+
+    # LLM extraction cache: in-process LRU, plus a shared tier when a table
+    # (DynamoDB) or a SQLite path is set (the table wins if both are)
+    llm_cache_table_name: str = os.environ.get("CAR_LLM_CACHE_TABLE", "")
+    llm_cache_sqlite_path: str = os.environ.get("LLM_CACHE_SQLITE", "")
+    llm_cache_max_entries: int = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "2048"))
+    llm_cache_ttl_s: int = int(os.environ.get("LLM_CACHE_TTL_S", str(30 * 24 * 3600)))
+
+    # CloudWatch EMF namespace for LLM call metrics (llm/instrumentation.py)
+    metrics_namespace: str = os.environ.get("METRICS_NAMESPACE", "CarScraperAgent/LLM")
+
+    # Rule-based criteria/schedule parsing ahead of the LLM (0 = always use the LLM)
+    rules_fast_path: bool = os.environ.get("RULES_FAST_PATH", "1") not in ("0", "false", "False")
+
+    # LLM backend: openai (live), record (live + capture to LLM_RECORDINGS),
+    # replay (serve LLM_RECORDINGS, no network) or fake (schema-valid stub replies)
+    llm_mode: str = os.environ.get("LLM_MODE", "openai")
+    llm_recordings_path: str = os.environ.get("LLM_RECORDINGS", "scripts/fixtures/llm/recordings.jsonl")
+    llm_offline_latency_ms: float = float(os.environ.get("LLM_OFFLINE_LATENCY_MS", "0"))
+    llm_offline_jitter_ms: float = float(os.environ.get("LLM_OFFLINE_JITTER_MS", "0"))
+
+    # Conversation sessions (sessions.py): DynamoDB table, else SQLite, else in-process only
+    sessions_table_name: str = os.environ.get("CAR_SESSIONS_TABLE", "")
+    session_sqlite_path: str = os.environ.get("SESSION_SQLITE", "")
+    session_ttl_s: int = int(os.environ.get("SESSION_TTL_S", "86400"))
+
+    # One-time searches as background jobs (jobs.py): thread (in-process pool), lambda
+    # (asynchronous self-invocation; needs the jobs table) or inline (scrape inside the turn)
+    search_job_mode: str = os.environ.get("SEARCH_JOB_MODE",
+                                          "lambda" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else "thread")
+    search_job_function: str = os.environ.get("SEARCH_JOB_FUNCTION", os.environ.get("AWS_LAMBDA_FUNCTION_NAME", ""))
+    search_jobs_table_name: str = os.environ.get("CAR_SEARCH_JOBS_TABLE", "")
+    search_job_sqlite_path: str = os.environ.get("SEARCH_JOB_SQLITE", "")  # empty = in-memory
+    search_job_workers: int = int(os.environ.get("SEARCH_JOB_WORKERS", "2"))
+    search_job_dedupe_s: int = int(os.environ.get("SEARCH_JOB_DEDUPE_S", "600"))
+
+    # Digest email delivery (aws/emailer.py::DigestMailer)
+    ses_template_name: str = os.environ.get("SES_TEMPLATE_NAME", "CarScraperDigest")
+    ses_max_send_rate: float = float(os.environ.get("SES_MAX_SEND_RATE", "0"))  # 0 = GetSendQuota
+    email_dead_letter_table_name: str = os.environ.get("CAR_EMAIL_DEAD_LETTER_TABLE", "")
+    email_dead_letter_path: str = os.environ.get("EMAIL_DEAD_LETTER_PATH", ".cache/email_dead_letters.jsonl")
@@ -0,0 +1,374 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from car_agent.config import Settings
+
+# Job status; a job moves queued -> running -> done | failed
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SEARCH_JOB_STALL_S = 900       # Lambda's maximum timeout: a job silent this long has lost its worker
+SEARCH_JOB_TTL_S = 24 * 3600   # job records (and their listings) expire after a day
+JOB_HEADER_KEY = "#job"        # DynamoJobStore: item_key of the job record; listings are "<run>#<seq>"
+
+
+def job_id_for(user_id: str, criteria: Dict[str, Any]) -> str:
+    """Same user + same criteria -> same job id, which is what deduplicates resubmissions."""
+    canonical = {k: v.strip().lower() if isinstance(v, str) else v
+                 for k, v in criteria.items() if v not in (None, "", [], {})}
+    digest = hashlib.sha256(f"{user_id}\x00{json.dumps(canonical, sort_keys=True)}".encode("utf-8")).digest()
+    return base64.urlsafe_b64encode(digest[:12]).decode("ascii")
+
+
+def _replaceable(existing: Dict[str, Any], now: float, dedupe_s: float) -> bool:
+    """Whether a resubmission starts a new run rather than joining `existing` (see DynamoJobStore.start)."""
+    if existing["status"] == FAILED:
+        return True
+    if existing["status"] == DONE:
+        return existing["updated_at"] < now - dedupe_s
+    return existing["updated_at"] < now - SEARCH_JOB_STALL_S
+
+
+class SqliteJobStore:
+    """Local stand-in for the search jobs table (":memory:" for a single process)."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_jobs "
+                "(job_id TEXT PRIMARY KEY, record TEXT NOT NULL, expires_at INTEGER NOT NULL)"
+            )
+
+    def _read(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT record FROM search_jobs WHERE job_id = ? AND expires_at > ?",
+                                 (job_id, int(time.time()))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO search_jobs (job_id, record, expires_at) VALUES (?, ?, ?)",
+                           (record["job_id"], json.dumps(record), int(record["updated_at"] + SEARCH_JOB_TTL_S)))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._read(job_id)
+
+    def start(self, record: Dict[str, Any], dedupe_s: float) -> Tuple[Optional[Dict[str, Any]], bool]:
+        with self._lock, self._conn:
+            existing = self._read(record["job_id"])
+            if existing and not _replaceable(existing, record["updated_at"], dedupe_s):
+                return existing, False
+            self._write(record)
+            return record, True
+
+    def _update(self, job_id: str, run: str, statuses: Tuple[str, ...], **changes: Any) -> Optional[Dict[str, Any]]:
+        with self._lock, self._conn:
+            record = self._read(job_id)
+            if not record or record["run"] != run or record["status"] not in statuses:
+                return None
+            listing = changes.pop("listing", None)
+            if listing is not None:
+                record["listings"].append(listing)
+            record.update(changes)
+            self._write(record)
+            return record
+
+    def claim(self, job_id: str, run: str, now: float) -> Optional[Dict[str, Any]]:
+        return self._update(job_id, run, (QUEUED,), status=RUNNING, updated_at=now)
+
+    def append(self, job_id: str, run: str, listing: Dict[str, Any], now: float) -> bool:
+        return self._update(job_id, run, (RUNNING,), listing=listing, updated_at=now) is not None
+
+    def finish(self, job_id: str, run: str, status: str, now: float, **extra: Any) -> bool:
+        return self._update(job_id, run, (QUEUED, RUNNING), status=status, updated_at=now, **extra) is not None
+
+
+class DynamoJobStore:
+    """Search jobs in DynamoDB: HASH job_id, RANGE item_key, TTL attribute expires_at.
+
+    The job record is the JOB_HEADER_KEY item; each listing the crawl finds is
+    its own "<run>#<seq>" item, so a job never approaches the 400 KB item limit.
+    Every write after `start` is conditional on the job's `run`, so the worker
+    of a superseded run stops at its next write; listings of older runs are
+    ignored by `get` and expire with their TTL.
+    """
+
+    def __init__(self, table):
+        self._table = table
+        self._next_seq: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _decode(item: Dict[str, Any], listings: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "job_id": item["job_id"], "user_id": item["user_id"], "run": item["run"], "status": item["status"],
+            "criteria": json.loads(item["criteria"]), "listings": listings,
+            "created_at": float(item["created_at"]), "updated_at": float(item["updated_at"]),
+            "error": item.get("error", ""), "search_id": item.get("search_id", ""),
+        }
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        from boto3.dynamodb.conditions import Key
+        from botocore.exceptions import ClientError
+
+        items = []
+        kwargs = {"KeyConditionExpression": Key("job_id").eq(job_id), "ConsistentRead": True}
+        try:
+            while True:
+                resp = self._table.query(**kwargs)
+                items.extend(resp.get("Items", []))
+                if "LastEvaluatedKey" not in resp:
+                    break
+                kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+        except ClientError as e:
+            print(f"Error reading search job: {e}")
+            return None
+        header = next((item for item in items if item["item_key"] == JOB_HEADER_KEY), None)
+        # TTL deletion can lag by hours, so check expiry ourselves
+        if not header or int(header.get("expires_at", 0)) <= time.time():
+            return None
+        prefix = f"{header['run']}#"
+        listings = [json.loads(item["listing"]) for item in items if item["item_key"].startswith(prefix)]
+        return self._decode(header, listings)
+
+    def start(self, record: Dict[str, Any], dedupe_s: float) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Put a new run unless an equivalent job is in flight or finished within `dedupe_s`."""
+        from botocore.exceptions import ClientError
+
+        now = record["updated_at"]
+        item = {**record, "item_key": JOB_HEADER_KEY, "criteria": json.dumps(record["criteria"]),
+                "created_at": int(now), "updated_at": int(now), "expires_at": int(now + SEARCH_JOB_TTL_S)}
+        item.pop("listings", None)
+        try:
+            self._table.put_item(
+                Item=item,
+                ConditionExpression=("attribute_not_exists(job_id) OR #s = :failed"
+                                     " OR (#s = :done AND updated_at < :reuse) OR updated_at < :stall"),
+                ExpressionAttributeNames={"#s": "status"},
+                ExpressionAttributeValues={":failed": FAILED, ":done": DONE, ":reuse": int(now - dedupe_s),
+                                           ":stall": int(now - SEARCH_JOB_STALL_S)},
+            )
+            return record, True
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                print(f"Error starting search job: {e}")
+                return None, False
+        return self.get(record["job_id"]), False
+
+    def _update(self, job_id: str, run: str, statuses: Tuple[str, ...], expression: str,
+                values: Dict[str, Any], names: Optional[Dict[str, str]] = None, return_record: bool = False):
+        from botocore.exceptions import ClientError
+
+        allowed = {f":allowed{i}": s for i, s in enumerate(statuses)}
+        try:
+            resp = self._table.update_item(
+                Key={"job_id": job_id, "item_key": JOB_HEADER_KEY},
+                UpdateExpression=expression,
+                ConditionExpression=f"run = :run AND #s IN ({', '.join(allowed)})",
+                ExpressionAttributeNames={"#s": "status", **(names or {})},
+                ExpressionAttributeValues={":run": run, **allowed, **values},
+                ReturnValues="ALL_NEW" if return_record else "NONE",
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                print(f"Error updating search job: {e}")
+            return None
+        return self._decode(resp["Attributes"], []) if return_record else True
+
+    def claim(self, job_id: str, run: str, now: float) -> Optional[Dict[str, Any]]:
+        return self._update(job_id, run, (QUEUED,), "SET #s = :running, updated_at = :now",
+                            {":running": RUNNING, ":now": int(now)}, return_record=True)
+
+    def append(self, job_id: str, run: str, listing: Dict[str, Any], now: float) -> bool:
+        """Put the listing item and touch the job record in one transaction, conditional on the run.
+
+        One worker owns a run, so the sequence number is counted here rather than read back.
+        """
+        from botocore.exceptions import ClientError
+
+        with self._lock:
+            seq = self._next_seq.get((job_id, run), 0)
+            self._next_seq[(job_id, run)] = seq + 1
+        client = self._table.meta.client
+        try:
+            client.transact_write_items(TransactItems=[
+                {"Update": {
+                    "TableName": self._table.name,
+                    "Key": {"job_id": job_id, "item_key": JOB_HEADER_KEY},
+                    "UpdateExpression": "SET updated_at = :now",
+                    "ConditionExpression": "run = :run AND #s = :running",
+                    "ExpressionAttributeNames": {"#s": "status"},
+                    "ExpressionAttributeValues": {":now": int(now), ":run": run, ":running": RUNNING},
+                }},
+                {"Put": {
+                    "TableName": self._table.name,
+                    "Item": {"job_id": job_id, "item_key": f"{run}#{seq:06d}", "listing": json.dumps(listing),
+                             "expires_at": int(now + SEARCH_JOB_TTL_S)},
+                }},
+            ])
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "TransactionCanceledException":
+                print(f"Error appending to search job: {e}")
+            return False
+        return True
+
+    def finish(self, job_id: str, run: str, status: str, now: float, **extra: Any) -> bool:
+        sets = "".join(f", #{k} = :{k}" for k in extra)
+        return bool(self._update(job_id, run, (QUEUED, RUNNING), f"SET #s = :status, updated_at = :now{sets}",
+                                 {":status": status, ":now": int(now), **{f":{k}": v for k, v in extra.items()}},
+                                 names={f"#{k}": k for k in extra}))
+
+
+class ThreadDispatcher:
+    """Local stand-in for self-invocation: runs jobs on a small in-process thread pool."""
+
+    def __init__(self, run_job: Callable[[str, str], Any], workers: int = 2):
+        self._run_job = run_job
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="search-job")
+
+    def __call__(self, job_id: str, run: str) -> bool:
+        self._pool.submit(self._run_job, job_id, run)
+        return True
+
+
+class LambdaDispatcher:
+    """Starts each job as an asynchronous invocation of `function` ({"action": "run_search_job", ...})."""
+
+    def __init__(self, lambda_client, function: str):
+        self._client = lambda_client
+        self._function = function
+
+    def __call__(self, job_id: str, run: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self._client.invoke(FunctionName=self._function, InvocationType="Event",
+                                Payload=json.dumps({"action": "run_search_job", "job_id": job_id, "run": run}))
+            return True
+        except ClientError as e:
+            print(f"Error starting search job {job_id}: {e}")
+            return False
+
+
+@dataclass
+class JobStats:
+    submitted: int = 0
+    deduplicated: int = 0      # resubmissions answered with a job already in flight or just finished
+    started: int = 0
+    duplicate_starts: int = 0  # a delivery for a run that was already claimed or superseded
+    listings: int = 0
+    completed: int = 0
+    failed: int = 0
+    superseded: int = 0        # runs that stopped because a newer run of the same job took over
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+
+
+class SearchJobs:
+    """One-time searches that run outside the chat turn and are polled for listings.
+
+    `submit` returns at once with the job record; `dispatch` gets the job to a
+    worker (a thread here, or another Lambda invocation), which calls `claim`,
+    then `append` for each listing as it is found and `finish` at the end.
+    Pollers read the same record with `get`. A job's id is derived from the
+    user and the criteria, so resubmitting joins the job in flight (or one that
+    finished within `dedupe_s`) instead of starting another crawl.
+    """
+
+    def __init__(self, store, dispatch: Callable[[str, str], bool], dedupe_s: float = 600):
+        self._store = store
+        self._dispatch = dispatch
+        self.dedupe_s = dedupe_s
+        self.stats = JobStats()
+
+    def submit(self, user_id: str, criteria: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.time()
+        record = {"job_id": job_id_for(user_id, criteria), "user_id": user_id, "run": secrets.token_hex(4),
+                  "status": QUEUED, "criteria": criteria, "listings": [], "created_at": now, "updated_at": now,
+                  "error": "", "search_id": ""}
+        self.stats.incr("submitted")
+        job, created = self._store.start(record, self.dedupe_s)
+        if job is None:
+            self.stats.incr("failed")
+            return {**record, "status": FAILED, "error": "could not save the search"}
+        if not created:
+            self.stats.incr("deduplicated")
+            print(f"[JOBS] {job['job_id']} already {job['status']}; not starting another")
+            return job
+        if not self._dispatch(job["job_id"], job["run"]):
+            self.finish(job["job_id"], job["run"], FAILED, error="could not start the search")
+            job = {**job, "status": FAILED}
+        return job
+
+    def get(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """The job, or None if it is unknown, expired or another user's; a stalled job reads as failed."""
+        job = self._store.get(job_id)
+        if job is None or job["user_id"] != user_id:
+            return None
+        if job["status"] in (QUEUED, RUNNING) and job["updated_at"] < time.time() - SEARCH_JOB_STALL_S:
+            job = {**job, "status": FAILED, "error": "the search stopped responding"}
+        return job
+
+    def claim(self, job_id: str, run: str) -> Optional[Dict[str, Any]]:
+        """Mark the run started; None if it already was (a repeated delivery) or has been replaced."""
+        job = self._store.claim(job_id, run, time.time())
+        self.stats.incr("started" if job else "duplicate_starts")
+        return job
+
+    def append(self, job_id: str, run: str, listing: Dict[str, Any]) -> bool:
+        """Publish one listing; False means a newer run owns the job and this one should stop."""
+        if self._store.append(job_id, run, listing, time.time()):
+            self.stats.incr("listings")
+            return True
+        self.stats.incr("superseded")
+        return False
+
+    def finish(self, job_id: str, run: str, status: str, **extra: Any) -> bool:
+        self.stats.incr("completed" if status == DONE else "failed")
+        return self._store.finish(job_id, run, status, time.time(), **extra)
+
+
+def build_search_jobs(settings: Settings, run_job: Callable[[str, str], Any],
+                      dynamodb_resource=None) -> Optional[SearchJobs]:
+    """SearchJobs for SEARCH_JOB_MODE, or None when one-time searches run inside the turn."""
+    if settings.search_job_mode == "inline":
+        return None
+    if settings.search_job_mode == "lambda":
+        if not (settings.search_jobs_table_name and settings.search_job_function):
+            print("[JOBS] SEARCH_JOB_MODE=lambda needs CAR_SEARCH_JOBS_TABLE and a function to invoke; "
+                  "running one-time searches inline")
+            return None
+        from car_agent.aws.clients import build_lambda
+
+        dispatch = LambdaDispatcher(build_lambda(settings), settings.search_job_function)
+    else:
+        dispatch = ThreadDispatcher(run_job, settings.search_job_workers)
+
+    if settings.search_jobs_table_name:
+        if dynamodb_resource is None:
+            from car_agent.aws.clients import build_dynamodb
+
+            dynamodb_resource = build_dynamodb(settings)
+        store = DynamoJobStore(dynamodb_resource.Table(settings.search_jobs_table_name))
+    else:
+        store = SqliteJobStore(settings.search_job_sqlite_path or ":memory:")
+    return SearchJobs(store, dispatch, dedupe_s=settings.search_job_dedupe_s)
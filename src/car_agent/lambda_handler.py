@@ -1,15 +1,97 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict
+import sys
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
 from car_agent.agent import CarScraperAgent
 
+if TYPE_CHECKING:
+    from car_agent.runner import RecurringRunner
+
+BUCKET_MAX_CONTINUATIONS = 8  # re-invocations of one bucket firing that ran out of time
+
+# Cheap to build: the LLM, AWS clients and scraper are created on first use.
+# scripts/profile_cold_start.py measures what each handler path loads.
 agent = CarScraperAgent(enable_aws=True)
+_runner: Optional[RecurringRunner] = None
+
+
+def get_runner() -> RecurringRunner:
+    """Recurring-query runner sharing the agent's clients, built on the first scheduled event."""
+    global _runner
+    if _runner is None:
+        from car_agent.aws.clients import build_ses
+        from car_agent.aws.emailer import DigestMailer, build_dead_letter_store
+        from car_agent.runner import RecurringRunner
+        from car_agent.scraping.coalesce import build_lease_store
+
+        settings = agent.settings
+        mailer = DigestMailer(build_ses(settings), settings, build_dead_letter_store(settings, agent.dynamodb))
+        _runner = RecurringRunner(settings, agent.storage, mailer, llm=agent.llm, scheduler=agent.scheduler,
+                                  lease_store=build_lease_store(settings, agent.dynamodb))
+    return _runner
+
+
+def emit_llm_metrics() -> None:
+    """Flush this invocation's LLM metrics; instrumentation is only imported once a chain has run."""
+    instrumentation = sys.modules.get("car_agent.llm.instrumentation")
+    if instrumentation is not None:
+        instrumentation.get_llm_metrics().emit()
+
+
+def continue_bucket(event: Dict[str, Any], context) -> bool:
+    """Hand a bucket's remaining due members to a fresh invocation of this function (async)."""
+    from botocore.exceptions import ClientError
+
+    from car_agent.aws.clients import build_lambda
+
+    hop = int(event.get("continuation", 0)) + 1
+    function_arn = getattr(context, "invoked_function_arn", "")
+    if hop > BUCKET_MAX_CONTINUATIONS or not function_arn:
+        return False
+    try:
+        build_lambda(agent.settings).invoke(FunctionName=function_arn, InvocationType="Event",
+                                            Payload=json.dumps({"bucket": event["bucket"], "continuation": hop}))
+        return True
+    except ClientError as e:
+        print(f"Error continuing bucket {event['bucket']}: {e}")
+        return False
+
+
+def run_recurring(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """{"bucket": ...} or {"query_id": ...} from a schedule, {"query_ids": [...]} for a batch,
+    {"action": "run_due"} to sweep."""
+    from car_agent.runner import deadline_from_context
+
+    query_ids = event.get("query_ids") or ([event["query_id"]] if event.get("query_id") else None)
+    try:
+        report = get_runner().run(query_ids=query_ids, deadline=deadline_from_context(context),
+                                  bucket=event.get("bucket"))
+    finally:
+        emit_llm_metrics()
+    # Skipped members stay due in the bucket, so the next invocation picks up exactly those
+    if event.get("bucket") and report.skipped_for_time:
+        print(f"[RUNNER] bucket {event['bucket']}: {report.skipped_for_time} left, "
+              f"continued={continue_bucket(event, context)}")
+    return {"statusCode": 200, "body": json.dumps(report.as_dict())}
 
 
 def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     print(f"Raw event: {json.dumps(event, indent=2)}")  # DEBUG
+
+    # Scheduled and batch runs of recurring queries (not chat turns)
+    if "body" not in event and (event.get("bucket") or event.get("query_id") or event.get("query_ids")
+                                or event.get("action") == "run_due"):
+        return run_recurring(event, context)
+
+    # A one-time search started by a chat turn (jobs.LambdaDispatcher)
+    if "body" not in event and event.get("action") == "run_search_job":
+        try:
+            agent.run_search_job(event["job_id"], event["run"])
+        finally:
+            emit_llm_metrics()
+        return {"statusCode": 200, "body": json.dumps({"job_id": event["job_id"]})}
     
     # Handle both direct test events AND API Gateway
     if "body" in event:
@@ -28,11 +110,23 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
 
     user_id = payload.get("user_id", "anonymous")
     message = payload.get("message", "").strip()  # STRIP whitespace
-    session_data = payload.get("session_data", {}) or {}
-    
-    print(f"Final inputs - user_id: {user_id}, message: '{message}', session_data keys: {list(session_data.keys())}")  # DEBUG
-    
-    result = agent.process_conversation(user_id=user_id, message=message, session_data=session_data)
+    session_token = payload.get("session_token")
+
+    print(f"Final inputs - user_id: {user_id}, message: '{message}', session_token: {session_token}")  # DEBUG
+
+    try:
+        if payload.get("action") == "poll_search":
+            result = agent.poll_search(user_id=user_id, job_id=payload.get("job_id", ""),
+                                       since=int(payload.get("since") or 0))
+        elif "session_data" in payload and not session_token:
+            # Older clients round-trip the whole session themselves
+            result = agent.process_conversation(user_id=user_id, message=message,
+                                                session_data=payload.get("session_data") or {})
+        else:
+            result = agent.converse(user_id=user_id, message=message, session_token=session_token,
+                                    turn_id=payload.get("turn_id"))
+    finally:
+        emit_llm_metrics()  # EMF lines for this invocation's LLM calls
     
     return {
         "statusCode": 200,
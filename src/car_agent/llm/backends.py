@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from car_agent.llm.rules import parse_criteria, parse_schedule
+from car_agent.schemas import CarCriteria, ListingsBatch, ScheduleDetails
+
+LLM_MODES = ("openai", "record", "replay", "fake")
+
+_ITEM_RE = re.compile(r"^\[(\d+)\]\s*(.*?)(?=^\[\d+\]|\Z)", re.M | re.S)
+_YEAR_RE = re.compile(r"\b(19[5-9]\d|20[0-4]\d)\b")
+_PRICE_RE = re.compile(r"\$\s?(\d[\d,]{2,})|\bprice\s+(\d[\d,]{2,})", re.I)
+_KM_RE = re.compile(r"(\d[\d,]*)\s?kms?\b", re.I)
+
+
+def prompt_key(messages: List[BaseMessage]) -> str:
+    """Stable hash of the rendered prompt (message roles and text), used to key recordings."""
+    payload = json.dumps([[m.type, m.content] for m in messages], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class ReplayMiss(LookupError):
+    """Replay mode was asked for a prompt that was never recorded."""
+
+
+class RecordingStore:
+    """Recorded responses as JSON lines: {"key", "model", "content", "usage", "latency_ms"}.
+
+    Loaded once into memory; record mode appends as calls complete. The last
+    line for a key wins, so re-recording a prompt just appends.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        rec = json.loads(line)
+                        self._records[rec["key"]] = rec
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._records.get(key)
+
+    def put(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._records[record["key"]] = record
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class _OfflineChatModel(BaseChatModel):
+    """Chat model answered locally, after `latency_ms` (± `jitter_ms`) of simulated round trip.
+
+    It is a real BaseChatModel, so `prompt | llm`, run_config() callbacks and
+    model_id() behave exactly as they do with ChatOpenAI.
+    """
+
+    model_name: str = "gpt-4o-mini"
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+
+    def _reply(self, messages: List[BaseMessage]) -> Tuple[str, Dict[str, int]]:
+        raise NotImplementedError
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        content, usage = self._reply(messages)
+        delay = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        if run_manager:
+            run_manager.on_llm_new_token(content)
+        message = AIMessage(content=content, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)],
+                          llm_output={"model_name": self.model_name})
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
+
+
+class ReplayChatModel(_OfflineChatModel):
+    """Serves responses captured in record mode; raises ReplayMiss for unknown prompts."""
+
+    store: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _reply(self, messages):
+        key = prompt_key(messages)
+        rec = self.store.get(key)
+        if rec is None:
+            raise ReplayMiss(f"no recording for prompt {key[:16]} in {self.store.path}; "
+                             f"re-run with LLM_MODE=record to capture it")
+        return rec["content"], rec["usage"]
+
+
+class FakeChatModel(_OfflineChatModel):
+    """Deterministic schema-valid replies built from the prompt with the rule-based parser.
+
+    CarCriteria and ScheduleDetails prompts are answered from the human message;
+    ListingsBatch prompts get one record per "[i]" listing with year, price and
+    kms picked out by regex.
+    """
+
+    model_name: str = "fake"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _reply(self, messages):
+        system = " ".join(str(m.content) for m in messages if m.type == "system")
+        human = " ".join(str(m.content) for m in messages if m.type != "system")
+        if '"listings"' in system:
+            listings = []
+            for idx, text in _ITEM_RE.findall(human):
+                info: Dict[str, Any] = {"index": int(idx)}
+                info.update({k: v for k, v in parse_criteria(text).fields.items()
+                             if k in ("make", "model", "location")})
+                if m := _YEAR_RE.search(text):
+                    info["year"] = int(m.group(1))
+                if m := _PRICE_RE.search(text):
+                    info["price"] = int((m.group(1) or m.group(2)).replace(",", ""))
+                if m := _KM_RE.search(text):
+                    info["mileage"] = int(m.group(1).replace(",", ""))
+                listings.append(info)
+            result = ListingsBatch.model_validate({"listings": listings}).model_dump(exclude_none=True)
+        elif '"frequency"' in system:
+            result = ScheduleDetails.model_validate(parse_schedule(human).fields).model_dump(exclude_none=True)
+        else:
+            result = CarCriteria.model_validate(parse_criteria(human).fields).model_dump(exclude_none=True)
+        content = json.dumps(result)
+        prompt_tokens = sum(_estimate_tokens(str(m.content)) for m in messages)
+        completion_tokens = _estimate_tokens(content)
+        return content, {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                         "total_tokens": prompt_tokens + completion_tokens}
+
+
+class RecordingChatModel(BaseChatModel):
+    """Wraps the real model and appends every response to a RecordingStore."""
+
+    inner: Any = None
+    store: Any = None
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.inner, "model_name", "unknown")
+
+    @property
+    def _llm_type(self) -> str:
+        return "record"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        start = time.perf_counter()
+        result = self.inner._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        message = result.generations[0].message
+        usage = dict(getattr(message, "usage_metadata", None) or {})
+        self.store.put({
+            "key": prompt_key(messages), "model": self.model_name, "content": message.content,
+            "usage": {k: int(usage.get(k) or 0) for k in ("input_tokens", "output_tokens", "total_tokens")},
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+        return result
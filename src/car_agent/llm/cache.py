@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from car_agent.config import Settings
+from car_agent.llm.rules import normalize_input
+
+
+def cache_key(kind: str, prompt_hash: str, model: str, text: str) -> str:
+    raw = "\x00".join((kind, prompt_hash, model, normalize_input(text)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class LLMCacheStats:
+    memory_hits: int = 0
+    persistent_hits: int = 0
+    misses: int = 0
+    saved_latency_s: float = 0.0   # model latency the hits would have cost
+    saved_tokens: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def incr(self, name: str, n=1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.memory_hits + self.persistent_hits + self.misses
+        return (self.memory_hits + self.persistent_hits) / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        out = {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+        out["saved_latency_s"] = round(self.saved_latency_s, 3)
+        out["hit_rate"] = round(self.hit_rate, 3)
+        return out
+
+
+class SqliteLLMCacheStore:
+    """Local stand-in for the shared tier: one table, expiry checked on read."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(cache_key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at INTEGER NOT NULL)"
+            )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE cache_key = ? AND expires_at > ?", (key, int(time.time()))
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, value: Dict[str, Any], ttl_s: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (cache_key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), int(time.time() + ttl_s)),
+            )
+
+
+class DynamoLLMCacheStore:
+    """Shared tier in DynamoDB: HASH cache_key, TTL attribute expires_at."""
+
+    def __init__(self, table):
+        self._table = table
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = self._table.get_item(Key={"cache_key": key}).get("Item")
+        except ClientError as e:
+            print(f"Error reading LLM cache: {e}")
+            return None
+        # TTL deletion can lag by hours, so check expiry ourselves
+        if not item or int(item.get("expires_at", 0)) <= time.time():
+            return None
+        return json.loads(item["value"])
+
+    def put(self, key: str, value: Dict[str, Any], ttl_s: float) -> None:
+        try:
+            self._table.put_item(Item={"cache_key": key, "value": json.dumps(value),
+                                       "expires_at": int(time.time() + ttl_s)})
+        except ClientError as e:
+            print(f"Error writing LLM cache: {e}")
+
+
+class LLMCache:
+    """Memoizes extraction results: bounded in-process LRU in front of an optional shared store.
+
+    Entries keep the latency and token count of the call that produced them, so
+    hits can report what they saved.
+    """
+
+    def __init__(self, store=None, max_entries: int = 2048, ttl_s: float = 30 * 24 * 3600):
+        self._store = store
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.stats = LLMCacheStats()
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry["expires_at"] > time.time():
+                    self._memory.move_to_end(key)
+                else:
+                    del self._memory[key]
+                    entry = None
+        if entry is not None:
+            self._record_hit("memory_hits", entry)
+            return entry["result"]
+
+        if self._store is None:
+            self.stats.incr("misses")
+            return None
+        entry = self._store.get(key)
+        if entry is None:
+            self.stats.incr("misses")
+            return None
+        self._remember(key, entry)
+        self._record_hit("persistent_hits", entry)
+        return entry["result"]
+
+    def put(self, key: str, result: Dict[str, Any], latency_s: float, tokens: int) -> None:
+        entry = {"result": result, "latency_s": latency_s, "tokens": tokens}
+        if self._store is not None:
+            self._store.put(key, entry, self.ttl_s)
+        self._remember(key, entry)
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        entry = {**entry, "expires_at": time.time() + self.ttl_s}
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _record_hit(self, name: str, entry: Dict[str, Any]) -> None:
+        self.stats.incr(name)
+        self.stats.incr("saved_latency_s", float(entry.get("latency_s") or 0.0))
+        self.stats.incr("saved_tokens", int(entry.get("tokens") or 0))
+
+
+def build_llm_cache(settings: Settings) -> LLMCache:
+    if settings.llm_cache_table_name:
+        from car_agent.aws.clients import build_dynamodb
+
+        store = DynamoLLMCacheStore(build_dynamodb(settings).Table(settings.llm_cache_table_name))
+    elif settings.llm_cache_sqlite_path:
+        store = SqliteLLMCacheStore(settings.llm_cache_sqlite_path)
+    else:
+        store = None
+    return LLMCache(store, max_entries=settings.llm_cache_max_entries, ttl_s=settings.llm_cache_ttl_s)
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Process-wide cache built from Settings on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = build_llm_cache(Settings())
+        return _cache
+
+
+def set_llm_cache(cache: Optional[LLMCache]) -> None:
+    """Swap the process-wide cache (None rebuilds it from Settings on next use)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
@@ -1,13 +1,46 @@
 from __future__ import annotations
 
-from langchain_openai import ChatOpenAI
+from typing import TYPE_CHECKING
 
 from car_agent.config import Settings
 
+if TYPE_CHECKING:
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_openai import ChatOpenAI
+
+MODEL = "gpt-4o-mini"
+
+
+def build_openai(settings: Settings) -> ChatOpenAI:
+    from langchain_openai import ChatOpenAI  # ~300 ms of imports; replay/fake modes never pay it
 
-def build_llm(settings: Settings) -> ChatOpenAI:
     return ChatOpenAI(
-        model="gpt-4o-mini",
+        model=MODEL,
         temperature=0.3,
         api_key=settings.openai_api_key,
-    )
\ No newline at end of file
+        # Streamed so instrumentation sees time-to-first-token; invoke() still
+        # returns one message, with usage attached by stream_usage.
+        streaming=True,
+        stream_usage=True,
+    )
+
+
+def build_llm(settings: Settings) -> BaseChatModel:
+    """Chat model for settings.llm_mode; only "openai" and "record" need an API key."""
+    from car_agent.llm.backends import LLM_MODES, FakeChatModel, RecordingChatModel, RecordingStore, ReplayChatModel
+
+    mode = settings.llm_mode
+    if mode not in LLM_MODES:
+        raise ValueError(f"LLM_MODE must be one of {LLM_MODES}, got {mode!r}")
+    if mode == "openai":
+        return build_openai(settings)
+    if mode == "record":
+        store = RecordingStore(settings.llm_recordings_path)
+        print(f"[LLM] recording responses to {store.path} ({len(store)} already recorded)")
+        return RecordingChatModel(inner=build_openai(settings), store=store)
+    latency = {"latency_ms": settings.llm_offline_latency_ms, "jitter_ms": settings.llm_offline_jitter_ms}
+    if mode == "replay":
+        store = RecordingStore(settings.llm_recordings_path)
+        print(f"[LLM] replaying {len(store)} recorded responses from {store.path}")
+        return ReplayChatModel(store=store, model_name=MODEL, **latency)
+    return FakeChatModel(**latency)
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
+from typing import Any, Dict, Iterator
+
+# Kept apart from instrumentation so tagging a turn doesn't import langchain
+_tags: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("llm_tags", default={})
+
+
+@contextlib.contextmanager
+def llm_context(**tags: Any) -> Iterator[None]:
+    """Tag every LLM call made inside the block (e.g. user_id, state)."""
+    token = _tags.set({**_tags.get(), **{k: str(v) for k, v in tags.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def current_tags() -> Dict[str, str]:
+    return _tags.get()
@@ -1,32 +1,68 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
 
 from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import ChatPromptTemplate
 
+from car_agent.llm.cache import cache_key, get_llm_cache
+from car_agent.llm.instrumentation import run_config
 from car_agent.llm.prompts import car_criteria_prompt, schedule_prompt
 from car_agent.schemas import CarCriteria, ScheduleDetails
 
 
-def extract_car_criteria(llm, user_input: str) -> Dict[str, Any]:
-    parser = JsonOutputParser(pydantic_object=CarCriteria)
-    chain = car_criteria_prompt() | llm | parser
+def model_id(llm) -> str:
+    return str(getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__)
 
-    result = chain.invoke({
-        "input": user_input,
-        "format_instructions": parser.get_format_instructions(),
-    })
 
-    return {k: v for k, v in result.items() if v is not None}
+class _Extractor:
+    """Prompt + parser built once per process; model chains built once per LLM instance."""
 
+    def __init__(self, kind: str, prompt_fn: Callable[[], ChatPromptTemplate], schema):
+        self.kind = kind
+        self.parser = JsonOutputParser(pydantic_object=schema)
+        self.prompt = prompt_fn().partial(format_instructions=self.parser.get_format_instructions())
+        self.prompt_hash = hashlib.sha256(self.prompt.format(input="{input}").encode("utf-8")).hexdigest()[:16]
+        self._chains: Dict[int, Tuple[Any, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _chain(self, llm):
+        with self._lock:
+            entry = self._chains.get(id(llm))
+            if entry is None or entry[0] is not llm:
+                entry = (llm, self.prompt | llm)
+                self._chains[id(llm)] = entry
+            return entry[1]
+
+    def __call__(self, llm, user_input: str) -> Dict[str, Any]:
+        cache = get_llm_cache()
+        key = cache_key(self.kind, self.prompt_hash, model_id(llm), user_input)
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"[LLM-CACHE] {self.kind} hit; {cache.stats.as_dict()}")
+            return dict(cached)
+
+        start = time.perf_counter()
+        message = self._chain(llm).invoke({"input": user_input}, config=run_config(self.kind))
+        latency = time.perf_counter() - start
+        result = self.parser.invoke(message)
+        usage = getattr(message, "usage_metadata", None) or {}
+
+        clean = {k: v for k, v in result.items() if v is not None}
+        cache.put(key, clean, latency, int(usage.get("total_tokens") or 0))
+        return clean
 
-def extract_schedule_details(llm, user_input: str) -> Dict[str, Any]:
-    parser = JsonOutputParser(pydantic_object=ScheduleDetails)
-    chain = schedule_prompt() | llm | parser
 
-    result = chain.invoke({
-        "input": user_input,
-        "format_instructions": parser.get_format_instructions(),
-    })
+_criteria = _Extractor("car_criteria", car_criteria_prompt, CarCriteria)
+_schedule = _Extractor("schedule", schedule_prompt, ScheduleDetails)
 
-    return {k: v for k, v in result.items() if v is not None}
+
+def extract_car_criteria(llm, user_input: str) -> Dict[str, Any]:
+    return _criteria(llm, user_input)
+
+
+def extract_schedule_details(llm, user_input: str) -> Dict[str, Any]:
+    return _schedule(llm, user_input)
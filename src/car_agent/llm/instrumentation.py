@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import bisect
+import collections
+import json
+import threading
+import time
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from car_agent.config import Settings
+from car_agent.llm.context import current_tags, llm_context  # noqa: F401  (llm_context re-exported)
+
+# USD per 1M tokens (input, output); unknown models are costed as gpt-4o-mini
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+LATENCY_BUCKETS_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 8000, 13000, 20000, 30000, 60000)
+EMF_MAX_VALUES = 100  # CloudWatch accepts at most 100 values per metric per document
+CALL_BUFFER_MAX = 1000  # calls kept for emit(); older ones drop if it is never called
+
+def run_config(chain: str) -> Dict[str, Any]:
+    """Invoke config that instruments a chain: metrics callback, chain name, current tags.
+
+    Build it in the calling thread: the metadata travels with the run, so calls
+    made from worker threads keep the caller's user_id/state.
+    """
+    return {"run_name": chain, "callbacks": [get_llm_metrics()],
+            "metadata": {**current_tags(), "chain": chain}}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prices = next((p for name, p in sorted(MODEL_PRICES.items(), key=lambda kv: -len(kv[0]))
+                   if model and model.startswith(name)), MODEL_PRICES["gpt-4o-mini"])
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+class Histogram:
+    """Fixed-bucket histogram (upper bounds in ms) with count/sum/min/max."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Upper bound of the bucket holding the p-th percentile, capped at the observed max."""
+        if not self.count:
+            return None
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(float(self.bounds[i]), self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 1) if self.count else None,
+            "min": self.min, "max": self.max,
+            "p50": self.percentile(50), "p95": self.percentile(95), "p99": self.percentile(99),
+        }
+
+
+class LLMMetrics(BaseCallbackHandler):
+    """Callback handler that times every chat-model call.
+
+    Per (chain, state) it keeps process-lifetime histograms of latency and
+    time-to-first-token plus token, cost and error totals. Each call is also
+    buffered until `emit()`, which prints CloudWatch EMF documents for the
+    current invocation and clears the buffer; the buffer keeps the newest
+    CALL_BUFFER_MAX calls for processes that never emit.
+
+    Retries are not counted: the OpenAI SDK retries inside one call, so they
+    show up only as latency, and a call that still fails counts as an error.
+    """
+
+    def __init__(self, namespace: str = "CarScraperAgent/LLM"):
+        self.namespace = namespace
+        self._runs: Dict[Any, Dict[str, Any]] = {}
+        self._calls: Deque[Dict[str, Any]] = collections.deque(maxlen=CALL_BUFFER_MAX)
+        self._series: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    # ----- callbacks -----
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs) -> None:
+        metadata = metadata or {}
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or (serialized or {}).get("name") or "unknown"
+        with self._lock:
+            self._runs[run_id] = {
+                "chain": metadata.get("chain") or kwargs.get("name") or "unnamed",
+                "state": metadata.get("state", "none"),
+                "user_id": metadata.get("user_id"),
+                "model": model,
+                "start": time.perf_counter(),
+                "first_token": None,
+            }
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs) -> None:
+        self.on_chat_model_start(serialized, prompts, run_id=run_id, metadata=metadata, **kwargs)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run and run["first_token"] is None:
+                run["first_token"] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        prompt_tokens = completion_tokens = 0
+        model = None
+        output = getattr(response, "llm_output", None) or {}
+        usage = output.get("token_usage") or {}
+        if usage:
+            prompt_tokens = int(usage.get("prompt_tokens") or 0)
+            completion_tokens = int(usage.get("completion_tokens") or 0)
+        else:
+            for gens in getattr(response, "generations", None) or []:
+                for gen in gens:
+                    meta = getattr(getattr(gen, "message", None), "usage_metadata", None) or {}
+                    prompt_tokens += int(meta.get("input_tokens") or 0)
+                    completion_tokens += int(meta.get("output_tokens") or 0)
+        model = output.get("model_name")
+        self._finish(run_id, prompt_tokens, completion_tokens, model=model, error=False)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._finish(run_id, 0, 0, model=None, error=True)
+
+    # ----- aggregation -----
+
+    def _finish(self, run_id, prompt_tokens: int, completion_tokens: int, model: Optional[str], error: bool) -> None:
+        end = time.perf_counter()
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            if run is None:
+                return
+            model = model or run["model"]
+            latency_ms = (end - run["start"]) * 1000
+            ttft_ms = (run["first_token"] - run["start"]) * 1000 if run["first_token"] else latency_ms
+            cost = estimate_cost(model, prompt_tokens, completion_tokens)
+            call = {
+                "chain": run["chain"], "state": run["state"], "user_id": run["user_id"], "model": model,
+                "latency_ms": latency_ms, "ttft_ms": ttft_ms, "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens, "cost_usd": cost, "error": error,
+            }
+            self._calls.append(call)
+            series = self._series.setdefault((run["chain"], run["state"]), {
+                "latency_ms": Histogram(), "ttft_ms": Histogram(), "calls": 0, "errors": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+            })
+            series["latency_ms"].observe(latency_ms)
+            series["ttft_ms"].observe(ttft_ms)
+            for k in ("prompt_tokens", "completion_tokens", "cost_usd"):
+                series[k] += call[k]
+            series["calls"] += 1
+            series["errors"] += int(error)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Process-lifetime totals and histograms per "chain/state"."""
+        with self._lock:
+            return {
+                f"{chain}/{state}": {
+                    **{k: (round(v, 6) if isinstance(v, float) else v) for k, v in s.items()
+                       if not isinstance(v, Histogram)},
+                    "latency_ms": s["latency_ms"].as_dict(),
+                    "ttft_ms": s["ttft_ms"].as_dict(),
+                }
+                for (chain, state), s in self._series.items()
+            }
+
+    def emf_documents(self, calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for call in calls:
+            groups.setdefault((call["chain"], call["state"]), []).append(call)
+        docs = []
+        now_ms = int(time.time() * 1000)
+        for (chain, state), group in groups.items():
+            group = group[-EMF_MAX_VALUES:]
+            docs.append({
+                "_aws": {"Timestamp": now_ms, "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [["chain", "state"], ["chain"]],
+                    "Metrics": [
+                        {"Name": "LatencyMs", "Unit": "Milliseconds"},
+                        {"Name": "TimeToFirstTokenMs", "Unit": "Milliseconds"},
+                        {"Name": "PromptTokens", "Unit": "Count"},
+                        {"Name": "CompletionTokens", "Unit": "Count"},
+                        {"Name": "CostUSD", "Unit": "None"},
+                        {"Name": "Errors", "Unit": "Count"},
+                    ],
+                }]},
+                "chain": chain,
+                "state": state,
+                "LatencyMs": [round(c["latency_ms"], 1) for c in group],
+                "TimeToFirstTokenMs": [round(c["ttft_ms"], 1) for c in group],
+                "PromptTokens": sum(c["prompt_tokens"] for c in group),
+                "CompletionTokens": sum(c["completion_tokens"] for c in group),
+                "CostUSD": round(sum(c["cost_usd"] for c in group), 6),
+                "Errors": sum(int(c["error"]) for c in group),
+                "user_ids": sorted({c["user_id"] for c in group if c["user_id"]}),
+                "models": sorted({c["model"] for c in group}),
+            })
+        return docs
+
+    def emit(self) -> List[Dict[str, Any]]:
+        """Print this invocation's calls as EMF (one JSON line per chain/state) and reset the buffer."""
+        with self._lock:
+            calls, self._calls = list(self._calls), collections.deque(maxlen=CALL_BUFFER_MAX)
+        docs = self.emf_documents(calls)
+        for doc in docs:
+            print(json.dumps(doc, separators=(",", ":")))
+        return docs
+
+
+_metrics: Optional[LLMMetrics] = None
+_metrics_lock = threading.Lock()
+
+
+def get_llm_metrics() -> LLMMetrics:
+    """Process-wide handler passed to every instrumented chain via run_config()."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = LLMMetrics(namespace=Settings().metrics_namespace)
+        return _metrics
+
+
+def set_llm_metrics(metrics: Optional[LLMMetrics]) -> None:
+    global _metrics
+    with _metrics_lock:
+        _metrics = metrics
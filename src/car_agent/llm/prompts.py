@@ -55,6 +55,7 @@ For each listing, extract:
 - location
 
 Rules:
+- Return one record per listing and set "index" to the number in its [brackets].
 - Only fill a field if explicitly present or strongly implied.
 - Use integers for year/price/mileage.
 - mileage is in km.
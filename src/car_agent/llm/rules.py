@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+
+from car_agent.scraping.constants import STATE_MAP
+
+# Below this share of recognised words the message goes to the LLM. 1.0 means
+# any word we cannot account for (an unknown model, "cheap", "low kms") is
+# enough to fall back, so the fast path never silently drops intent.
+RULES_MIN_CONFIDENCE = 1.0
+
+MAKE_MODELS: Dict[str, Tuple[str, ...]] = {
+    "Toyota": ("Camry", "Corolla", "RAV4", "HiLux", "Kluger", "LandCruiser", "Prado", "Yaris", "C-HR"),
+    "Mazda": ("CX-3", "CX-30", "CX-5", "CX-8", "CX-9", "BT-50", "MX-5"),
+    "Hyundai": ("i30", "i20", "Tucson", "Kona", "Santa Fe", "Venue"),
+    "Kia": ("Cerato", "Sportage", "Seltos", "Sorento", "Picanto", "Carnival", "Stonic"),
+    "Ford": ("Ranger", "Everest", "Focus", "Fiesta", "Mustang", "Escape"),
+    "Volkswagen": ("Golf", "Polo", "Tiguan", "Passat", "Amarok", "T-Roc"),
+    "Honda": ("Civic", "CR-V", "HR-V", "Jazz", "Accord"),
+    "Nissan": ("X-Trail", "Qashqai", "Navara", "Patrol", "Pathfinder", "Juke"),
+    "Mitsubishi": ("Outlander", "ASX", "Triton", "Pajero", "Eclipse Cross"),
+    "Subaru": ("Forester", "Outback", "XV", "Impreza", "WRX", "BRZ"),
+    "Tesla": ("Model 3", "Model Y"),
+    "Isuzu": ("D-Max", "MU-X"),
+    "Suzuki": ("Swift", "Vitara", "Jimny"),
+    "Holden": ("Commodore", "Colorado", "Cruze", "Captiva"),
+    "Volvo": ("XC40", "XC60", "XC90"),
+    "BMW": (),
+    "Mercedes-Benz": (),
+    "Audi": (),
+    "Lexus": (),
+    "MG": (),
+}
+MAKE_ALIASES = {"vw": "Volkswagen", "merc": "Mercedes-Benz", "mercedes": "Mercedes-Benz", "benz": "Mercedes-Benz"}
+
+CITY_STATE = {
+    "sydney": "nsw", "newcastle": "nsw", "wollongong": "nsw",
+    "melbourne": "vic", "geelong": "vic", "ballarat": "vic", "bendigo": "vic",
+    "brisbane": "qld", "gold coast": "qld", "sunshine coast": "qld", "cairns": "qld", "townsville": "qld",
+    "adelaide": "sa", "perth": "wa", "hobart": "tas", "launceston": "tas",
+    "canberra": "act", "darwin": "nt",
+}
+
+FREQUENCIES = {"daily": 1, "nightly": 1, "weekly": 7, "fortnightly": 14, "monthly": 30}
+
+# Menu replies accepted in ASK_UPDATE_TYPE (kept in step with the agent's prompt)
+MENU_CHOICES = {
+    "1": "1", "one": "1", "one time": "1", "one-time": "1",
+    "2": "2", "regular": "2", "updates": "2", "regular updates": "2",
+}
+
+# Words that carry no criteria or schedule information on their own
+FILLER = frozenset("""
+a an the i i'm im me my we our you your it is are be can could would like want wanting need needs
+looking look find finding search searching show get buy buying for with and or in at on of to from
+car cars vehicle vehicles something any some please thanks thank hi hello hey also just around about
+send sending email emails me updates update notify notifications regular one time alerts alert
+stop after until end ending by every day days week weeks year years model make price km kms
+""".split())
+
+_YEAR = r"(19[5-9]\d|20[0-4]\d)"
+_NUM = r"(\d[\d,]*(?:\.\d+)?)"
+_YEAR_RE = re.compile(_YEAR)
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_MENU_STRIP_RE = re.compile(r"^[\s(]*|[\s.)!]*$")
+_WS_RE = re.compile(r"\s+")
+
+
+def _amount(num: str, k: Optional[str]) -> int:
+    value = float(num.replace(",", ""))
+    return int(round(value * 1000 if k else value))
+
+
+def _model_pattern(name: str) -> str:
+    # "CX-5" also matches "cx5" / "cx 5"
+    return r"[\s-]?".join(re.escape(p) for p in re.split(r"[\s-]+", name.lower()))
+
+
+def _alternation(names) -> str:
+    return "|".join(sorted(names, key=len, reverse=True))
+
+
+_MODEL_LOOKUP: Dict[str, Tuple[str, str]] = {}
+for _make, _models in MAKE_MODELS.items():
+    for _model in _models:
+        _MODEL_LOOKUP[re.sub(r"[\s-]", "", _model.lower())] = (_make, _model)
+_MAKE_LOOKUP = {m.lower(): m for m in MAKE_MODELS}
+_MAKE_LOOKUP.update(MAKE_ALIASES)
+
+_LONG_STATES = [k for k in STATE_MAP if len(k) > 3] + ["vic", "nsw", "qld", "tas"] + list(CITY_STATE)
+
+# (name, pattern) pairs applied in order; each consumes the text it matches so
+# later rules cannot reuse it (dates before years, kms before prices, ...).
+# A bare year ("2018 Toyota Camry") has no rule: exact year or "from", the LLM decides.
+_RULES: List[Tuple[str, Pattern]] = [
+    ("email", re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+", re.I)),
+    ("end_date", re.compile(r"(?:(?:stop|end|ending|until|till|up to|through)\s+(?:after|on|by)?\s*)?(\d{4}-\d{2}-\d{2})", re.I)),
+    ("every_n", re.compile(r"\bevery\s+(\d+|other)\s+(day|days|week|weeks)\b", re.I)),
+    ("every", re.compile(r"\bevery\s+(day|week|fortnight|month)\b", re.I)),
+    ("frequency", re.compile(rf"\b({_alternation(FREQUENCIES)})\b", re.I)),
+    ("kms", re.compile(rf"(?:\b(?:under|below|less than|max(?:imum)?|up to|no more than)\s*|<\s*)?{_NUM}\s*(k)?\s*(?:km|kms|klms|kilomet(?:er|re)s?)\b", re.I)),
+    ("price", re.compile(rf"(?:\b(?:under|below|less than|max(?:imum)?|up to|no more than|budget(?: of)?)\s*|<\s*)?\$\s?{_NUM}\s*(k)?\b", re.I)),
+    ("price_bare", re.compile(rf"\b(?:under|below|less than|up to|no more than|budget(?: of)?)\s+{_NUM}\s*(k)?\b", re.I)),
+    ("year_range", re.compile(rf"\b(?:between\s+)?{_YEAR}\s*(?:-|–|to|and)\s*{_YEAR}\b", re.I)),
+    ("year_min", re.compile(rf"\b(?:(?:from|after|since|newer than)\s+{_YEAR}(?:\s*(?:on(?:wards?)?|or (?:newer|later|above)|\+))?|{_YEAR}\s*(?:\+|or (?:newer|later|above)|on(?:wards?)?\b|and (?:newer|up|above)))", re.I)),
+    ("year_max", re.compile(rf"\b(before|up to|until|older than|no newer than)\s+{_YEAR}\b", re.I)),
+    ("transmission", re.compile(r"\b(automatic|auto|manual)\b", re.I)),
+    ("location", re.compile(rf"\b({_alternation(_LONG_STATES)})\b", re.I)),
+    ("location_code", re.compile(r"\b(?:in\s+(sa|wa|act|nt)|(SA|WA|ACT|NT))\b", re.I)),
+    ("listing_type", re.compile(r"\b(brand new|new|used|second[\s-]hand|pre[\s-]?owned)\b", re.I)),
+    ("model", re.compile(rf"\b({_alternation(_model_pattern(m) for ms in MAKE_MODELS.values() for m in ms)})\b", re.I)),
+    ("make", re.compile(rf"\b({_alternation(re.escape(m) for m in _MAKE_LOOKUP)})\b", re.I)),
+]
+
+
+def _on_match(name: str, m: "re.Match", out: Dict[str, Any]) -> bool:
+    """Fold one match into `out`; False leaves the text unconsumed."""
+    g = m.groups()
+    if name == "email":
+        out["email"] = m.group(0)
+    elif name == "end_date":
+        out["end_date"] = g[0]
+    elif name == "every_n":
+        n = 2 if g[0].lower() == "other" else int(g[0])
+        days = n * 7 if g[1].lower().startswith("week") else n
+        out["frequency"] = f"rate({days} day{'s' if days != 1 else ''})"
+    elif name == "every":
+        days = {"day": 1, "week": 7, "fortnight": 14, "month": 30}[g[0].lower()]
+        out["frequency"] = f"rate({days} day{'s' if days != 1 else ''})"
+    elif name == "frequency":
+        days = FREQUENCIES[g[0].lower()]
+        out["frequency"] = f"rate({days} day{'s' if days != 1 else ''})"
+    elif name == "kms":
+        out["mileage_max"] = _amount(g[0], g[1])
+    elif name in ("price", "price_bare"):
+        value = _amount(g[0], g[1])
+        if name == "price_bare" and (value < 1000 or (not g[1] and _YEAR_RE.fullmatch(g[0]))):
+            return False  # "under 5" is not a price, "up to 2020" is a year
+        if out.get("price_max", value) != value:
+            out["conflict"] = True  # two different budgets: let the LLM decide
+        out["price_max"] = value
+    elif name == "year_range":
+        lo, hi = sorted((int(g[0]), int(g[1])))
+        out["year_min"], out["year_max"] = lo, hi
+    elif name == "year_min":
+        out["year_min"] = int(g[0] or g[1])
+    elif name == "year_max":
+        year = int(g[1])
+        out["year_max"] = year - 1 if g[0].lower() in ("before", "older than") else year
+    elif name == "transmission":
+        out["transmission"] = "manual" if g[0].lower() == "manual" else "automatic"
+    elif name in ("location", "location_code"):
+        key = next(x for x in g if x).lower()
+        out["location"] = (STATE_MAP.get(key) or CITY_STATE[key]).upper()
+    elif name == "listing_type":
+        out["listing_type"] = "new" if "new" in g[0].lower() else "used"
+    elif name == "model":
+        make, model = _MODEL_LOOKUP[re.sub(r"[\s-]", "", g[0].lower())]
+        out["model"] = model
+        out.setdefault("make", make)
+    elif name == "make":
+        out["make"] = _MAKE_LOOKUP[g[0].lower()]
+    return True
+
+
+@dataclass
+class RuleParse:
+    fields: Dict[str, Any]
+    confidence: float        # share of meaningful words the rules accounted for (0 on conflicting matches)
+    unparsed: List[str]
+
+    @property
+    def confident(self) -> bool:
+        return self.confidence >= RULES_MIN_CONFIDENCE
+
+
+CRITERIA_FIELDS = ("make", "model", "year_min", "year_max", "mileage_max", "price_max",
+                   "location", "transmission", "listing_type")
+SCHEDULE_FIELDS = ("email", "frequency", "end_date")
+
+
+def _scan(text: str) -> Tuple[Dict[str, Any], List[str], int]:
+    residual = text or ""
+    out: Dict[str, Any] = {}
+    for name, pattern in _RULES:
+        for m in list(pattern.finditer(residual)):
+            if _on_match(name, m, out):
+                s, e = m.span()
+                residual = residual[:s] + " " * (e - s) + residual[e:]
+    words = _WORD_RE.findall(residual.lower())
+    unparsed = [w for w in words if w not in FILLER]
+    consumed = len(_WORD_RE.findall((text or "").lower())) - len(words)
+    return out, unparsed, consumed
+
+
+def _parse(text: str, keep: Tuple[str, ...]) -> RuleParse:
+    out, unparsed, consumed = _scan(text)
+    known = consumed + 1  # never divide by zero; an empty message is trivially covered
+    confidence = 0.0 if out.get("conflict") else known / (known + len(unparsed))
+    return RuleParse(fields={k: out[k] for k in keep if k in out},
+                     confidence=confidence, unparsed=unparsed)
+
+
+def parse_criteria(text: str) -> RuleParse:
+    """Rule-based CarCriteria extraction (schedule phrases count as understood, not as criteria)."""
+    return _parse(text, CRITERIA_FIELDS)
+
+
+def parse_schedule(text: str) -> RuleParse:
+    """Rule-based ScheduleDetails extraction; confident only with both email and frequency."""
+    parsed = _parse(text, SCHEDULE_FIELDS)
+    if not (parsed.fields.get("email") and parsed.fields.get("frequency")):
+        parsed.confidence = 0.0
+    return parsed
+
+
+def menu_choice(text: str) -> Optional[str]:
+    """'1' / '2' for a bare menu reply in ASK_UPDATE_TYPE, else None."""
+    msg = _WS_RE.sub(" ", _MENU_STRIP_RE.sub("", (text or "").lower()))
+    return MENU_CHOICES.get(msg)
+
+
+@dataclass
+class TurnStats:
+    turns: int = 0
+    menu_skips: int = 0      # extraction skipped entirely (menu replies)
+    rule_parses: int = 0     # extractions answered by the rules
+    llm_calls: int = 0       # extractions that fell back to the LLM
+    turns_without_llm: int = 0
+    session_reuses: int = 0  # extractions answered from the conversation session
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def as_dict(self) -> Dict[str, Any]:
+        out = {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+        out["no_llm_rate"] = round(self.turns_without_llm / self.turns, 3) if self.turns else 0.0
+        return out
+
+
+def normalize_input(text: str) -> str:
+    """Case- and whitespace-insensitive form of a user message."""
+    return _WS_RE.sub(" ", (text or "").strip()).casefold()
+
+
+def route_extraction(parse: Callable[[str], RuleParse], llm_extract: Callable[[str], Dict[str, Any]],
+                     text: str, stats: TurnStats) -> Dict[str, Any]:
+    """Rules first; the LLM only when they cannot account for the whole message."""
+    parsed = parse(text)
+    if parsed.confident:
+        stats.incr("rule_parses")
+        return parsed.fields
+    print(f"[RULES] falling back to LLM (confidence {parsed.confidence:.2f}, unparsed {parsed.unparsed[:5]})")
+    stats.incr("llm_calls")
+    return llm_extract(text)
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from car_agent.aws.digest import DigestCollector
+from car_agent.config import Settings
+from car_agent.llm.context import llm_context
+from car_agent.scraping.coalesce import CrawlCoalescer, scrape_drive_crawl
+from car_agent.scraping.seen_index import CHANGED, NEW, SEEN, content_hash, load_seen_index, save_seen_index
+
+RUNNER_CONCURRENCY = 4        # crawl groups and deliveries in flight
+RUNNER_MAX_RESULTS = 20       # listings per query per run
+RUNNER_TIME_MARGIN_S = 30.0   # stop starting crawls this long before the Lambda timeout
+RUNNER_EARLY_S = 300          # a schedule firing this early still counts as due
+
+
+@dataclass
+class RunnerReport:
+    queries_loaded: int = 0
+    queries_run: int = 0
+    not_due: int = 0             # inactive, or already run by an earlier sweep
+    expired: int = 0             # past end_date: deactivated and unscheduled
+    skipped_for_time: int = 0    # left due for the next invocation
+    failed: int = 0
+    crawls: int = 0
+    new_listings: int = 0
+    changed_listings: int = 0
+    emails_sent: int = 0         # digests delivered (one per recipient)
+    wall_s: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def incr(self, name: str, n=1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    @property
+    def queries_per_min(self) -> float:
+        return self.queries_run * 60.0 / self.wall_s if self.wall_s else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        out = {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+        out["wall_s"] = round(self.wall_s, 2)
+        out["queries_per_min"] = round(self.queries_per_min, 1)
+        return out
+
+
+def deadline_from_context(context, margin_s: float = RUNNER_TIME_MARGIN_S) -> Optional[float]:
+    """Wall-clock deadline for starting new work, from the Lambda context (None outside Lambda)."""
+    remaining_ms = getattr(context, "get_remaining_time_in_millis", None)
+    if remaining_ms is None:
+        return None
+    return time.time() + remaining_ms() / 1000.0 - margin_s
+
+
+def is_expired(query: Dict[str, Any], today: str) -> bool:
+    end_date = query.get("end_date") or ""
+    return bool(end_date) and end_date < today
+
+
+class RecurringRunner:
+    """Runs recurring queries: one shared crawl per group, then per-query diff, store and email.
+
+    Queries come from the sparse due index (a sweep), a schedule bucket's due
+    members (a bucket schedule firing) or by id (a per-query schedule firing).
+    Expired ones are deactivated and unscheduled. The rest are grouped by crawl
+    (CrawlCoalescer.fetch_many). Each crawl skips listings every member's seen
+    index already holds unchanged, so `max_results` counts only new or changed
+    listings. Each query's own filters are applied to its group's listings, and
+    listings its seen index has never seen go into one digest per recipient,
+    sent by `mailer` (DigestMailer) at the end of the run.
+    A query's seen index is saved only once its recipient's digest went out.
+    Crawls not started before `deadline` are skipped and stay due.
+    """
+
+    def __init__(self, settings: Settings, storage, mailer, llm=None, scheduler=None, lease_store=None,
+                 crawl_fn=None, concurrency: int = RUNNER_CONCURRENCY, max_results: int = RUNNER_MAX_RESULTS):
+        self.settings = settings
+        self.storage = storage
+        self.mailer = mailer
+        self.scheduler = scheduler
+        self.concurrency = concurrency
+        self.max_results = max_results
+        self.coalescer = CrawlCoalescer(crawl_fn or functools.partial(scrape_drive_crawl, llm=llm), lease_store)
+
+    def load(self, query_ids: Optional[Sequence[str]], now: float, bucket: Optional[str] = None) -> List[Dict[str, Any]]:
+        if query_ids:
+            queries = (self.storage.get_query(qid, consistent=True) for qid in query_ids)
+            return [q for q in queries if q]
+        out: List[Dict[str, Any]] = []
+        cursor = None
+        while True:
+            if bucket:
+                # A bucket fires at its slot; members last run one interval ago count as due
+                page = self.storage.list_bucket_queries(bucket, now=now + RUNNER_EARLY_S, limit=500, cursor=cursor)
+            else:
+                page = self.storage.list_due_queries(now=now, limit=500, cursor=cursor)
+            out.extend(page.items)
+            cursor = page.cursor
+            if not cursor:
+                return out
+
+    def run(self, query_ids: Optional[Sequence[str]] = None, deadline: Optional[float] = None,
+            now: Optional[float] = None, bucket: Optional[str] = None) -> RunnerReport:
+        start = time.perf_counter()
+        now = now if now is not None else time.time()
+        today = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d")
+        report = RunnerReport()
+
+        queries = self.load(query_ids, now, bucket)
+        report.queries_loaded = len(queries)
+        runnable: Dict[str, Dict[str, Any]] = {}
+        for q in queries:
+            if not q.get("active"):
+                report.incr("not_due")
+            elif is_expired(q, today):
+                self.storage.deactivate_query(q["query_id"])
+                if self.scheduler:
+                    self.scheduler.delete_schedule(q["query_id"])
+                report.incr("expired")
+            elif query_ids and q.get("next_run_at", 0) > now + RUNNER_EARLY_S:
+                report.incr("not_due")
+            else:
+                runnable[q["query_id"]] = q
+
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as pool:
+            indexes = dict(zip(runnable, pool.map(lambda qid: self._load_index(qid, report), runnable)))
+        runnable = {qid: q for qid, q in runnable.items() if indexes[qid] is not None}
+
+        with llm_context(state="RECURRING"):
+            listings = self.coalescer.fetch_many(
+                {qid: (q.get("criteria") or {}, self.max_results) for qid, q in runnable.items()},
+                concurrency=self.concurrency, deadline=deadline, seen={qid: indexes[qid] for qid in runnable})
+        report.skipped_for_time = len(runnable) - len(listings)
+        report.crawls = self.coalescer.report.crawls_run
+
+        digests = DigestCollector()
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as pool:
+            diffs = [d for d in pool.map(lambda qid: self._diff(runnable[qid], indexes[qid], listings[qid],
+                                                                digests, report),
+                                         listings) if d]
+            delivered = self.mailer.send_digests(digests.digests()) if self.mailer else set()
+            report.emails_sent = len(delivered)
+            list(pool.map(lambda d: self._finish(*d, delivered, now, report), diffs))
+
+        report.wall_s = time.perf_counter() - start
+        print(f"[RUNNER] {report.as_dict()}")
+        return report
+
+    def _load_index(self, qid: str, report: RunnerReport):
+        try:
+            return load_seen_index(self.storage, qid)
+        except Exception as e:
+            print(f"[RUNNER] ❌ query {qid}: {e}")
+            report.incr("failed")
+            return None
+
+    def _diff(self, query: Dict[str, Any], index, listings: List[Dict], digests: DigestCollector,
+              report: RunnerReport):
+        """Mark listings new/changed/seen, store the run and queue new ones for the digest."""
+        qid = query["query_id"]
+        try:
+            new = []
+            for listing in listings:
+                # The crawl checked the card's hash; a detail page can fill in more fields
+                chash = listing.pop("content_hash", None)
+                if chash is None:
+                    chash = content_hash(listing)
+                status = index.status(listing["url"], chash)
+                listing["seen_status"] = status
+                if status != SEEN:
+                    index.mark(listing["url"], chash)
+                if status == NEW:
+                    new.append(listing)
+                elif status == CHANGED:
+                    report.incr("changed_listings")
+            self.storage.store_search(query.get("user_id", ""), query.get("criteria") or {}, listings,
+                                      "recurring", query_id=qid)
+            if new and query.get("email"):
+                digests.add(query["email"], qid, query.get("criteria") or {}, new)
+            report.incr("new_listings", len(new))
+            return query, index, bool(new and query.get("email"))
+        except Exception as e:
+            print(f"[RUNNER] ❌ query {qid}: {e}")
+            report.incr("failed")
+            return None
+
+    def _finish(self, query: Dict[str, Any], index, emailed: bool, delivered, now: float,
+                report: RunnerReport) -> None:
+        qid = query["query_id"]
+        try:
+            # An undelivered digest leaves its listings new, so the next run sends them again
+            if not emailed or query["email"].lower() in delivered:
+                save_seen_index(self.storage, qid, index)
+            self.storage.reschedule_query(qid, query.get("frequency", ""), ran_at=now)
+            report.incr("queries_run")
+        except Exception as e:
+            print(f"[RUNNER] ❌ query {qid}: {e}")
+            report.incr("failed")
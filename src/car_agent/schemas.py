@@ -24,6 +24,7 @@ class ScheduleDetails(BaseModel):
 
 
 class ListingInfo(BaseModel):
+    index: Optional[int] = Field(None, description="The [index] of the listing this record describes")
     make: Optional[str] = Field(None, description="Car manufacturer/brand")
     model: Optional[str] = Field(None, description="Car model")
     year: Optional[int] = Field(None, description="Car year")
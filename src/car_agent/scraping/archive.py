@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Iterator, List, Optional
+
+import zstandard
+
+from car_agent.config import Settings
+from car_agent.scraping.blob_store import FileBlobStore, S3BlobStore
+
+ARCHIVE_ZSTD_LEVEL = 3
+
+
+@dataclass
+class ArchiveStats:
+    pages: int = 0
+    duplicates: int = 0       # body already archived (same sha256)
+    bytes_raw: int = 0
+    bytes_stored: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+
+
+class PageArchive:
+    """Content-addressed archive of raw fetched pages.
+
+    Bodies are stored once per sha256 under `objects/<aa>/<sha256>.zst`
+    (zstd). Each fetch appends a manifest entry (url, kind, sha256,
+    fetched_at); entries are buffered and written by `flush()` as one
+    `manifests/<yyyy-mm-dd>/<uuid>.jsonl.zst` segment, so concurrent writers
+    never contend on a shared object.
+    """
+
+    def __init__(self, store, level: int = ARCHIVE_ZSTD_LEVEL):
+        self._store = store
+        self.level = level
+        self.stats = ArchiveStats()
+        self._known: set = set()
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()  # zstd contexts are not thread-safe
+
+    def _compressor(self) -> zstandard.ZstdCompressor:
+        c = getattr(self._local, "cctx", None)
+        if c is None:
+            c = self._local.cctx = zstandard.ZstdCompressor(level=self.level)
+        return c
+
+    def _decompressor(self) -> zstandard.ZstdDecompressor:
+        d = getattr(self._local, "dctx", None)
+        if d is None:
+            d = self._local.dctx = zstandard.ZstdDecompressor()
+        return d
+
+    @staticmethod
+    def object_key(digest: str) -> str:
+        return f"objects/{digest[:2]}/{digest}.zst"
+
+    def put(self, url: str, body: bytes, kind: str) -> str:
+        """Archive one fetched page; returns its sha256."""
+        digest = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            seen = digest in self._known
+            self._known.add(digest)
+        self.stats.incr("pages")
+        self.stats.incr("bytes_raw", len(body))
+        if seen:
+            self.stats.incr("duplicates")
+        else:
+            blob = self._compressor().compress(body)
+            self._store.put(self.object_key(digest), blob)
+            self.stats.incr("bytes_stored", len(blob))
+        with self._lock:
+            self._pending.append({"url": url, "kind": kind, "sha256": digest,
+                                  "fetched_at": time.time(), "size": len(body)})
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        blob = self._store.get(self.object_key(digest))
+        return self._decompressor().decompress(blob) if blob is not None else None
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        lines = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in pending).encode("utf-8")
+        key = f"manifests/{time.strftime('%Y-%m-%d', time.gmtime())}/{uuid.uuid4().hex}.jsonl.zst"
+        self._store.put(key, self._compressor().compress(lines))
+
+    def manifest(self) -> Iterator[Dict[str, Any]]:
+        """Every archived fetch, segment by segment (oldest day first)."""
+        for key in self._store.keys("manifests/"):
+            blob = self._store.get(key)
+            if not blob:
+                continue
+            for line in self._decompressor().decompress(blob).decode("utf-8").splitlines():
+                if line:
+                    yield json.loads(line)
+
+    def latest(self, kind: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Most recent manifest entry per URL (optionally one kind only)."""
+        out: Dict[str, Dict[str, Any]] = {}
+        for entry in self.manifest():
+            if kind and entry["kind"] != kind:
+                continue
+            prev = out.get(entry["url"])
+            if prev is None or entry["fetched_at"] >= prev["fetched_at"]:
+                out[entry["url"]] = entry
+        return out
+
+
+def build_page_archive(settings: Settings) -> Optional[PageArchive]:
+    if settings.html_archive_bucket:
+        from car_agent.aws.clients import build_s3
+
+        store = S3BlobStore(build_s3(settings), settings.html_archive_bucket, prefix="html-archive")
+    elif settings.html_archive_dir:
+        store = FileBlobStore(settings.html_archive_dir)
+    else:
+        return None
+    return PageArchive(store)
+
+
+_archive: Optional[PageArchive] = None
+_archive_built = False
+_archive_lock = threading.Lock()
+
+
+def get_page_archive() -> Optional[PageArchive]:
+    """Process-wide archive built from Settings on first use (None when disabled)."""
+    global _archive, _archive_built
+    with _archive_lock:
+        if not _archive_built:
+            _archive = build_page_archive(Settings())
+            _archive_built = True
+        return _archive
+
+
+def set_page_archive(archive: Optional[PageArchive]) -> None:
+    global _archive, _archive_built
+    with _archive_lock:
+        _archive, _archive_built = archive, True
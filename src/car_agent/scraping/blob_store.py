@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+
+class FileBlobStore:
+    """Key/bytes store on the local filesystem (keys may contain '/').
+
+    Versions for put_if are content hashes, checked under a class-level lock:
+    put_if is atomic between threads of one process only. Processes sharing a
+    directory (several local runners) can lose an update; use S3BlobStore there.
+    """
+
+    _cas_lock = threading.Lock()
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique per call: threads writing the same key must not share a temp file
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)  # atomic, so readers never see half a blob
+
+    def get_versioned(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        data = self.get(key)
+        return data, (hashlib.md5(data).hexdigest() if data is not None else None)
+
+    def put_if(self, key: str, data: bytes, version: Optional[str]) -> bool:
+        """Write only if `key` is still at `version` (None: still absent); single-process only."""
+        with self._cas_lock:
+            if self.get_versioned(key)[1] != version:
+                return False
+            self.put(key, data)
+            return True
+
+    def delete(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        base = self._path(prefix) if prefix else self.root
+        if not base.exists():
+            return
+        for p in sorted(base.rglob("*")):
+            if p.is_file() and not p.name.startswith("."):
+                yield p.relative_to(self.root).as_posix()
+
+
+class S3BlobStore:
+    """Same interface as FileBlobStore, backed by an S3-compatible bucket."""
+
+    def __init__(self, s3_client, bucket: str, prefix: str = ""):
+        self._s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            obj = self._s3.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        return obj["Body"].read()
+
+    def put(self, key: str, data: bytes) -> None:
+        self._s3.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    def get_versioned(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        try:
+            obj = self._s3.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None, None
+            raise
+        return obj["Body"].read(), obj["ETag"]
+
+    def put_if(self, key: str, data: bytes, version: Optional[str]) -> bool:
+        """Conditional put: If-Match the ETag read, or If-None-Match when the key was absent."""
+        condition = {"IfMatch": version} if version else {"IfNoneMatch": "*"}
+        try:
+            self._s3.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data, **condition)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict", "412"):
+                return False
+            raise
+        return True
+
+    def delete(self, key: str) -> None:
+        self._s3.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        paginator = self._s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(self.prefix):]
@@ -0,0 +1,475 @@
+from __future__ import annotations
+
+import contextvars
+import json
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from car_agent.config import Settings
+from car_agent.scraping.constants import (
+    COALESCE_LEASE_TTL_S,
+    COALESCE_POLL_S,
+    COALESCE_RESULT_TTL_S,
+    STATE_MAP,
+)
+from car_agent.scraping.drive_scraper import matches_criteria, scrape_drive
+from car_agent.scraping.report import CrawlReport
+from car_agent.scraping.seen_index import CombinedSeenIndex, SeenIndex
+
+# Bounds that narrow a crawl: (field, "lo" | "hi" | "eq"). "eq" fields are not on
+# the listings, so filter_shared cannot check them: only identical values share.
+BOUND_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("year_min", "lo"),
+    ("price_min", "lo"),
+    ("year_max", "hi"),
+    ("price_max", "hi"),
+    ("mileage_max", "hi"),
+    ("transmission", "eq"),
+)
+
+
+def _slug(value: Any) -> str:
+    return str(value or "").strip().lower().replace(" ", "-")
+
+
+def path_key(criteria: Dict) -> str:
+    """The part of a search that selects a result-page path (make/model/state/type)."""
+    state = STATE_MAP.get(_slug(criteria.get("location")).replace("-", " "), "vic")
+    listing_type = _slug(criteria.get("listing_type")) or "all"
+    return f"{listing_type}/{state}/{_slug(criteria.get('make'))}/{_slug(criteria.get('model'))}"
+
+
+def crawl_spec(criteria: Dict) -> Dict[str, Any]:
+    """Normalized filter bounds; absent bounds are omitted."""
+    spec = {}
+    for field, _ in BOUND_FIELDS:
+        value = criteria.get(field)
+        if value in (None, "", 0):
+            continue
+        if field == "transmission":
+            value = "automatic" if str(value).lower().startswith("auto") else "manual"
+        else:
+            value = int(value)
+        spec[field] = value
+    return spec
+
+
+def spec_key(spec: Dict[str, Any]) -> str:
+    return "&".join(f"{k}={spec[k]}" for k in sorted(spec)) or "-"
+
+
+def crawl_key(criteria: Dict) -> str:
+    """Canonical identity of the crawl a set of criteria needs (path_key?spec_key, as leases are keyed)."""
+    return f"{path_key(criteria)}?{spec_key(crawl_spec(criteria))}"
+
+
+def subsumes(outer: Dict[str, Any], inner: Dict[str, Any]) -> bool:
+    """True if every listing matching `inner` also matches `outer` (same path assumed)."""
+    for field, kind in BOUND_FIELDS:
+        o, i = outer.get(field), inner.get(field)
+        if kind == "eq":
+            if i != o:
+                return False
+            continue
+        if o is None:
+            continue
+        if i is None:
+            return False
+        if kind == "lo" and i < o:
+            return False
+        if kind == "hi" and i > o:
+            return False
+    return True
+
+
+@dataclass
+class CoalesceReport:
+    queries: int = 0
+    crawls_run: int = 0
+    shared_in_process: int = 0
+    shared_via_lease: int = 0
+    fetches_run: int = 0
+    fetches_saved: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+# ----- lease stores -----
+
+class LocalLeaseStore:
+    """In-memory stand-in for DynamoLeaseStore (shared by threads of one process)."""
+
+    def __init__(self):
+        self._items: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def candidates(self, pkey: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(v) for (p, _), v in self._items.items() if p == pkey]
+
+    def acquire(self, pkey: str, skey: str, spec: Dict, max_results: int, owner: str,
+                lease_ttl_s: float) -> bool:
+        now = time.time()
+        with self._lock:
+            item = self._items.get((pkey, skey))
+            if item and not _expired(item, now):
+                return False
+            self._items[(pkey, skey)] = {"path_key": pkey, "spec_key": skey, "spec": json.dumps(spec),
+                                         "max_results": max_results, "owner": owner, "status": "running",
+                                         "lease_expires_at": now + lease_ttl_s}
+            return True
+
+    def publish(self, pkey: str, skey: str, owner: str, listings: List[Dict], fetch_cost: int,
+                complete: bool, result_ttl_s: float) -> None:
+        with self._lock:
+            item = self._items.get((pkey, skey))
+            if item and item["owner"] == owner:
+                item.update(status="done", result=_pack(listings), fetch_cost=fetch_cost, complete=complete,
+                            result_expires_at=time.time() + result_ttl_s)
+
+    def release(self, pkey: str, skey: str, owner: str) -> None:
+        with self._lock:
+            item = self._items.get((pkey, skey))
+            if item and item["owner"] == owner and item["status"] == "running":
+                del self._items[(pkey, skey)]
+
+
+class DynamoLeaseStore:
+    """Crawl leases in DynamoDB: HASH path_key, RANGE spec_key, TTL attribute expires_at.
+
+    The conditional put only succeeds when no live lease or fresh result exists,
+    so concurrent invocations elect exactly one crawler per spec.
+    """
+
+    def __init__(self, table):
+        self._table = table
+
+    def candidates(self, pkey: str) -> List[Dict[str, Any]]:
+        try:
+            resp = self._table.query(KeyConditionExpression=Key("path_key").eq(pkey), ConsistentRead=True)
+        except ClientError as e:
+            print(f"Error reading crawl leases: {e}")
+            return []
+        items = resp.get("Items", [])
+        for item in items:
+            for k in ("lease_expires_at", "result_expires_at", "fetch_cost", "max_results"):
+                if k in item:
+                    item[k] = float(item[k])
+            if "result" in item:
+                item["result"] = bytes(item["result"])
+        return items
+
+    def acquire(self, pkey: str, skey: str, spec: Dict, max_results: int, owner: str,
+                lease_ttl_s: float) -> bool:
+        now = int(time.time())
+        try:
+            self._table.put_item(
+                Item={"path_key": pkey, "spec_key": skey, "spec": json.dumps(spec),
+                      "max_results": max_results, "owner": owner,
+                      "status": "running", "lease_expires_at": now + int(lease_ttl_s),
+                      "expires_at": now + int(lease_ttl_s) + int(COALESCE_RESULT_TTL_S)},
+                ConditionExpression=(
+                    "attribute_not_exists(path_key)"
+                    " OR (#s = :running AND lease_expires_at < :now)"
+                    " OR (#s = :done AND result_expires_at < :now)"
+                ),
+                ExpressionAttributeNames={"#s": "status"},
+                ExpressionAttributeValues={":running": "running", ":done": "done", ":now": now},
+            )
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            print(f"Error acquiring crawl lease: {e}")
+            return True  # fail open: crawling twice beats not crawling
+
+    def publish(self, pkey: str, skey: str, owner: str, listings: List[Dict], fetch_cost: int,
+                complete: bool, result_ttl_s: float) -> None:
+        now = int(time.time())
+        try:
+            self._table.update_item(
+                Key={"path_key": pkey, "spec_key": skey},
+                UpdateExpression=("SET #s = :done, #r = :r, fetch_cost = :c, complete = :k,"
+                                  " result_expires_at = :re, expires_at = :x"),
+                ConditionExpression="#o = :owner",
+                ExpressionAttributeNames={"#s": "status", "#r": "result", "#o": "owner"},
+                ExpressionAttributeValues={":done": "done", ":r": _pack(listings), ":c": fetch_cost,
+                                           ":k": complete,
+                                           ":re": now + int(result_ttl_s), ":x": now + int(result_ttl_s),
+                                           ":owner": owner},
+            )
+        except ClientError as e:
+            print(f"Error publishing crawl result: {e}")
+
+    def release(self, pkey: str, skey: str, owner: str) -> None:
+        try:
+            self._table.delete_item(
+                Key={"path_key": pkey, "spec_key": skey},
+                ConditionExpression="#o = :owner AND #s = :running",
+                ExpressionAttributeNames={"#o": "owner", "#s": "status"},
+                ExpressionAttributeValues={":owner": owner, ":running": "running"},
+            )
+        except ClientError:
+            pass
+
+
+def _expired(item: Dict[str, Any], now: float) -> bool:
+    if item.get("status") == "done":
+        return item.get("result_expires_at", 0) < now
+    return item.get("lease_expires_at", 0) < now
+
+
+def _pack(listings: List[Dict]) -> bytes:
+    return zlib.compress(json.dumps(listings, default=str).encode("utf-8"))
+
+
+def _unpack(blob: bytes) -> List[Dict]:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+# ----- coalescer -----
+
+# (criteria, max_results[, seen_index=...]) -> (listings, fetch cost, complete)
+CrawlFn = Callable[..., Tuple[List[Dict], int, bool]]
+
+
+def filter_shared(listings: List[Dict], criteria: Dict, max_results: int) -> List[Dict]:
+    """Apply one query's own (possibly stricter) filters to a shared crawl."""
+    return [dict(l) for l in listings if matches_criteria(l, criteria)][:max_results]
+
+
+def covers(crawl_spec_: Dict, complete: bool, spec: Dict) -> bool:
+    """True if a crawl's listings hold everything a query with `spec` would find.
+
+    A crawl cut off at max_results only covers its own spec: a stricter query
+    filtering that capped list can end up with far fewer results than its own
+    crawl (even none), so it is only shared once the crawl was complete.
+    """
+    return crawl_spec_ == spec or (complete and subsumes(crawl_spec_, spec))
+
+
+class CrawlCoalescer:
+    """Shares crawls between queries whose criteria are identical or subsumed.
+
+    In-process, concurrent callers join an in-flight crawl whose spec covers
+    theirs. Across invocations, a lease store (DynamoDB or the local stand-in)
+    elects one crawler per spec and publishes its listings for `result_ttl_s`,
+    so other invocations reuse them instead of crawling. Each caller then
+    applies its own filters to the shared listings. A stricter query only uses
+    a looser crawl that was complete (see covers()); otherwise it crawls itself.
+    """
+
+    def __init__(self, crawl_fn: CrawlFn, lease_store=None,
+                 lease_ttl_s: float = COALESCE_LEASE_TTL_S,
+                 result_ttl_s: float = COALESCE_RESULT_TTL_S,
+                 poll_s: float = COALESCE_POLL_S):
+        self._crawl_fn = crawl_fn
+        self._leases = lease_store
+        self.lease_ttl_s = lease_ttl_s
+        self.result_ttl_s = result_ttl_s
+        self.poll_s = poll_s
+        self.owner = uuid.uuid4().hex
+        self.report = CoalesceReport()
+        # path_key -> [(spec, max_results, future of (listings, fetch_cost, complete))]
+        self._inflight: Dict[str, List[Tuple[Dict, int, Future]]] = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, criteria: Dict, max_results: int, seen_index=None) -> List[Dict]:
+        """Listings for `criteria`, from a shared crawl where possible (never with a `seen_index`)."""
+        listings, _, _ = self._fetch(criteria, max_results, seen_index)
+        return filter_shared(listings, criteria, max_results)
+
+    def fetch_many(self, queries: Dict[str, Tuple[Dict, int]], concurrency: int = 4,
+                   deadline: Optional[float] = None,
+                   seen: Optional[Dict[str, SeenIndex]] = None) -> Dict[str, List[Dict]]:
+        """Run a batch: one crawl per group_queries() group, groups in parallel.
+
+        `queries` maps query_id -> (criteria, max_results). Groups not yet started
+        when time.time() passes `deadline` are skipped; their queries are absent
+        from the result. With `seen` (query_id -> SeenIndex), each group's crawl
+        skips listings every member has already seen, so max_results counts only
+        new or changed ones; those crawls are not shared outside the group.
+        """
+        def seen_by(qids: List[str]) -> Optional[CombinedSeenIndex]:
+            return CombinedSeenIndex(seen[q] for q in qids) if seen is not None else None
+
+        groups = group_queries({qid: c for qid, (c, _) in queries.items()})
+
+        def run(group: Tuple[Dict, List[str]]) -> Dict[str, List[Dict]]:
+            leader, members = group
+            if deadline is not None and time.time() > deadline:
+                return {}
+            listings, cost, complete = self._fetch(leader, max(queries[q][1] for q in members), seen_by(members))
+            leader_spec = crawl_spec(leader)
+            out, alone = {}, []
+            for q in members:
+                criteria, max_results = queries[q]
+                if covers(leader_spec, complete, crawl_spec(criteria)):
+                    out[q] = filter_shared(listings, criteria, max_results)
+                else:
+                    alone.append(q)
+            with self._lock:
+                extra = len(out) - 1
+                self.report.queries += extra
+                self.report.shared_in_process += extra
+                self.report.fetches_saved += extra * cost
+            # The leader's crawl was capped: stricter members crawl on their own
+            for q in alone:
+                out[q] = self.fetch(*queries[q], seen_index=seen_by([q]))
+            return out
+
+        results: Dict[str, List[Dict]] = {}
+        # Each group runs in a copy of the caller's context so LLM metric tags follow it
+        contexts = [contextvars.copy_context() for _ in groups]
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            for part in pool.map(lambda cg: cg[0].run(run, cg[1]), zip(contexts, groups)):
+                results.update(part)
+        print(f"[COALESCE] {len(queries)} queries -> {len(groups)} crawls: {self.report.as_dict()}")
+        return results
+
+    def _fetch(self, criteria: Dict, max_results: int, seen_index=None) -> Tuple[List[Dict], int, bool]:
+        """(listings, fetch cost, complete) from a crawl that covers `criteria`."""
+        pkey, spec = path_key(criteria), crawl_spec(criteria)
+        with self._lock:
+            self.report.queries += 1
+        if seen_index is not None:
+            # What this crawl skips depends on whose index it is: nobody else can use it
+            listings, cost, complete = self._crawl_fn(criteria, max_results, seen_index=seen_index)
+            with self._lock:
+                self.report.crawls_run += 1
+                self.report.fetches_run += cost
+            return listings, cost, complete
+        passed: List[Future] = []
+        while True:
+            with self._lock:
+                joined = self._find_inflight(pkey, spec, max_results, passed)
+                if joined is None:
+                    fut: Future = Future()
+                    fut.set_running_or_notify_cancel()
+                    self._inflight.setdefault(pkey, []).append((spec, max_results, fut))
+                    break
+            other_spec, other = joined
+            listings, cost, complete = other.result()
+            if covers(other_spec, complete, spec):
+                with self._lock:
+                    self.report.shared_in_process += 1
+                    self.report.fetches_saved += cost
+                return listings, cost, complete
+            passed.append(other)
+
+        try:
+            listings, cost, complete, shared = self._fetch_shared(pkey, spec, criteria, max_results)
+            fut.set_result((listings, cost, complete))
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight[pkey] = [t for t in self._inflight.get(pkey, []) if t[2] is not fut]
+        with self._lock:
+            if shared:
+                self.report.shared_via_lease += 1
+                self.report.fetches_saved += cost
+            else:
+                self.report.crawls_run += 1
+                self.report.fetches_run += cost
+        return listings, cost, complete
+
+    def _find_inflight(self, pkey: str, spec: Dict, max_results: int,
+                       passed: List[Future]) -> Optional[Tuple[Dict, Future]]:
+        for other_spec, other_max, fut in self._inflight.get(pkey, []):
+            if fut not in passed and other_max >= max_results and subsumes(other_spec, spec):
+                return other_spec, fut
+        return None
+
+    def _fetch_shared(self, pkey: str, spec: Dict, criteria: Dict,
+                      max_results: int) -> Tuple[List[Dict], int, bool, bool]:
+        if self._leases is None:
+            return (*self._crawl_fn(criteria, max_results), False)
+
+        skey = spec_key(spec)
+        deadline = time.time() + self.lease_ttl_s
+        while True:
+            now = time.time()
+            waiting = False
+            for item in self._leases.candidates(pkey):
+                if _expired(item, now) or int(item.get("max_results", 0)) < max_results:
+                    continue
+                item_spec = json.loads(item["spec"])
+                if not subsumes(item_spec, spec):
+                    continue
+                if item["status"] == "done":
+                    complete = bool(item.get("complete"))
+                    if covers(item_spec, complete, spec):
+                        return _unpack(item["result"]), int(item.get("fetch_cost", 0)), complete, True
+                elif item["owner"] != self.owner:
+                    waiting = True
+            if not waiting and self._leases.acquire(pkey, skey, spec, max_results, self.owner, self.lease_ttl_s):
+                try:
+                    listings, cost, complete = self._crawl_fn(criteria, max_results)
+                except BaseException:
+                    self._leases.release(pkey, skey, self.owner)
+                    raise
+                self._leases.publish(pkey, skey, self.owner, listings, cost, complete, self.result_ttl_s)
+                return listings, cost, complete, False
+            if time.time() > deadline:
+                # Whoever held the lease is gone and never published: crawl ourselves
+                return (*self._crawl_fn(criteria, max_results), False)
+            time.sleep(self.poll_s)
+
+
+def group_queries(queries: Dict[str, Dict]) -> List[Tuple[Dict, List[str]]]:
+    """Group query criteria into crawls: each group's leader subsumes every member.
+
+    Loosest specs are placed first so stricter ones can join them; disjoint specs
+    on the same path are not merged (their union could be far larger than either).
+    Queries with the same crawl_key join their group without the subsumes() scan.
+    """
+    def looseness(item):
+        return len(crawl_spec(item[1]))
+
+    groups: List[Tuple[Dict, List[str]]] = []
+    group_of: Dict[str, int] = {}  # crawl_key -> index of the group that query joined
+    for qid, criteria in sorted(queries.items(), key=looseness):
+        key = crawl_key(criteria)
+        if key in group_of:
+            groups[group_of[key]][1].append(qid)
+            continue
+        pkey, spec = path_key(criteria), crawl_spec(criteria)
+        for i, (leader, members) in enumerate(groups):
+            if path_key(leader) == pkey and subsumes(crawl_spec(leader), spec):
+                members.append(qid)
+                group_of[key] = i
+                break
+        else:
+            group_of[key] = len(groups)
+            groups.append((criteria, [qid]))
+    return groups
+
+
+def scrape_drive_crawl(criteria: Dict, max_results: int, llm=None,
+                       seen_index=None) -> Tuple[List[Dict], int, bool]:
+    """Default CrawlFn: scrape_drive, its fetch count (search pages + detail pages) and completeness.
+
+    Bind `llm` (functools.partial) to let the crawl resolve its fallback queue.
+    """
+    report = CrawlReport()
+    listings = scrape_drive(criteria, llm, max_results=max_results, max_page=None, report=report,
+                            seen_index=seen_index)
+    return listings, report.search_pages + report.detail_fetches, report.complete
+
+
+def build_lease_store(settings: Settings, dynamodb_resource=None):
+    """DynamoDB-backed leases when a resource is given, else the in-process stand-in."""
+    if dynamodb_resource is None:
+        return LocalLeaseStore()
+    return DynamoLeaseStore(dynamodb_resource.Table(settings.crawl_leases_table_name))
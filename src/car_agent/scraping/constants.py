@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import os
+
 # State mapping for Drive URL builder
 STATE_MAP = {
     "new south wales": "nsw", "nsw": "nsw",
@@ -22,11 +24,51 @@ DEFAULT_HEADERS = {
     "Accept-Language": "en-US,en;q=0.9",
 }
 
-# Optional: commonly used base URL
-DRIVE_BASE_URL = "https://www.drive.com.au"
+# Optional: commonly used base URL (override to point at scripts/replay_server.py)
+DRIVE_BASE_URL = os.environ.get("DRIVE_BASE_URL", "https://www.drive.com.au")
 DRIVE_SEARCH_BASE = f"{DRIVE_BASE_URL}/cars-for-sale/search/"
 
 # Optional: hard limits to keep things safe
 MAX_SNIPPET_CHARS = 1500
 REQUEST_TIMEOUT_S = 15
-DEFAULT_POLITE_SLEEP_S = 1.0
+
+# Politeness: spacing between request starts to one host (token-bucket rate is
+# 1 / DEFAULT_POLITE_SLEEP_S), 1 req/s as before the fetches went concurrent; the
+# worker pools only overlap response latency. A faster rate or a burst is opt-in.
+DEFAULT_POLITE_SLEEP_S = float(os.environ.get("DRIVE_POLITE_SLEEP_S", "1.0"))
+DEFAULT_HOST_BURST = int(os.environ.get("DRIVE_HOST_BURST", "1"))
+DEFAULT_DETAIL_CONCURRENCY = 4
+DEFAULT_PAGE_CONCURRENCY = 3
+
+# Search pagination: hard page cap when max_page is None, and planner priors
+MAX_SEARCH_PAGES = 20
+PLANNER_PRIOR_CARDS_PER_PAGE = 12
+PLANNER_PRIOR_MATCH_RATE = 0.3
+
+# Shared HTTP transport (see scraping/http.py)
+HTTP_POOL_MAXSIZE = 8
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_BASE_S = 0.5
+HTTP_BACKOFF_MAX_S = 20.0
+CIRCUIT_BREAKER_THRESHOLD = 3
+CIRCUIT_BREAKER_COOLDOWN_S = 120.0
+
+# Per-query seen-listing index (see scraping/seen_index.py)
+SEEN_INDEX_MAX_AGE_DAYS = 90
+SEEN_INDEX_MAX_ENTRIES = 20000
+
+# Crawl coalescing (see scraping/coalesce.py)
+COALESCE_LEASE_TTL_S = 120.0
+COALESCE_RESULT_TTL_S = 900.0
+COALESCE_POLL_S = 0.5
+
+# LLM listing parser batching (see scraping/llm_parser.py)
+LLM_BATCH_MAX_TOKENS = 6000      # snippet tokens per request
+LLM_BATCH_MAX_LISTINGS = 25      # keeps the JSON reply well inside the output limit
+LLM_BATCH_CONCURRENCY = 4
+LLM_BATCH_RETRIES = 1            # extra rounds for indices the model left out
+LLM_SNIPPET_MAX_TOKENS = 400
+
+# Detail extraction: fields below this confidence go to the end-of-crawl LLM fallback
+MIN_FIELD_CONFIDENCE = 0.6
+FALLBACK_EVIDENCE_CHARS = 1200
@@ -1,158 +1,433 @@
 from __future__ import annotations
 
 import re
-import time
-from typing import Dict, List
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Deque, Dict, Iterator, List, Optional
 
 import requests
 from bs4 import BeautifulSoup
 
-from car_agent.scraping.constants import DEFAULT_HEADERS, DRIVE_BASE_URL, REQUEST_TIMEOUT_S, DEFAULT_POLITE_SLEEP_S
+from car_agent.scraping.constants import (
+    DEFAULT_DETAIL_CONCURRENCY,
+    DEFAULT_PAGE_CONCURRENCY,
+    DRIVE_BASE_URL,
+    MAX_SEARCH_PAGES,
+    STATE_MAP,
+)
+from car_agent.scraping.archive import get_page_archive
 from car_agent.scraping.drive_url import build_drive_url
+from car_agent.scraping.extract import (  # noqa: F401
+    extract_detail,
+    extract_year_from_title,
+    needs_fallback,
+    parse_price,
+    set_field,
+    to_state,
+)
 from car_agent.scraping.filters import extract_year, filter_snippet_by_criteria
-from car_agent.scraping.llm_parser import parse_listings_with_llm
-
-
-def scrape_drive(criteria: Dict, llm, max_results: int = 20, max_page: int = 1):
-    """Fixed: deduplicate + detail page scraping"""
-    
-    # Step 1: Get unique listing URLs from search
-    listing_urls = get_unique_listing_urls(criteria, max_page)
-    print(f"[SCRAPE] Found {len(listing_urls)} unique URLs")
-    
-    # Step 2: Scrape each detail page (accurate data)
-    results = []
-    seen_cars = set()  # Deduplicate by URL
-    
-    for i, url in enumerate(listing_urls[:max_results]):
-        if url in seen_cars:
-            continue
-            
-        try:
-            print(f"[SCRAPE] Detail #{i+1}/{len(listing_urls)}: {url}")
-            car_data = scrape_detail_page(url)
-            
-            if car_data and matches_criteria(car_data, criteria):
-                results.append(car_data)
-                seen_cars.add(url)
-                print(f"[SCRAPE] ✅ {car_data['name']} ${car_data['price']:,} ({car_data['mileage']:,}km)")
-            time.sleep(1)  # Polite delay
-            
-        except Exception as e:
-            print(f"[SCRAPE] ❌ {url}: {e}")
-            continue
-    
+from car_agent.scraping.http import CircuitOpenError, get_transport
+from car_agent.scraping.http_cache import DetailPageCache, get_detail_cache
+from car_agent.scraping.llm_parser import LLMParseStats, parse_listings_with_llm
+from car_agent.scraping.planner import PagePlanner
+from car_agent.scraping.report import CrawlReport
+from car_agent.scraping.seen_index import SEEN, SeenIndex, content_hash
+
+_CARD_PRICE_RE = re.compile(r'\$\s?(\d{1,3}(?:,\d{3})+|\d+)')
+_CARD_KM_RE = re.compile(r'(\d{1,3}(?:,\d{3})+|\d+)\s*km\b', re.I)
+_CARD_STATE_RE = re.compile(r'\b(NSW|VIC|QLD|SA|WA|TAS|ACT|NT)\b')
+
+
+def scrape_drive(criteria: Dict, llm, max_results: int = 20, max_page: Optional[int] = 1,
+                 concurrency: int = DEFAULT_DETAIL_CONCURRENCY,
+                 report: Optional[CrawlReport] = None,
+                 seen_index: Optional[SeenIndex] = None):
+    """Collect scrape_drive_iter into a list (kept for existing callers)."""
+    report = report if report is not None else CrawlReport()
+    results = list(scrape_drive_iter(criteria, max_results=max_results, max_page=max_page,
+                                     concurrency=concurrency, report=report, seen_index=seen_index,
+                                     llm=llm))
     print(f"[SCRAPE] Final: {len(results)} results")
     return results
 
+
+def scrape_drive_iter(criteria: Dict, max_results: int = 20, max_page: Optional[int] = None,
+                      concurrency: int = DEFAULT_DETAIL_CONCURRENCY,
+                      page_concurrency: int = DEFAULT_PAGE_CONCURRENCY,
+                      report: Optional[CrawlReport] = None,
+                      seen_index: Optional[SeenIndex] = None,
+                      llm=None) -> Iterator[Dict]:
+    """Yield matching listings in site order as soon as each one is complete.
+
+    Search pages are fetched concurrently, but only as many as PagePlanner expects
+    are needed for `max_results` (up to `max_page`, or MAX_SEARCH_PAGES if None).
+    Cards that fail the criteria are dropped before any detail fetch; cards that
+    already show price, year and mileage are yielded directly; the rest are filled
+    in from their detail page, `concurrency` at a time. Once `max_results` matches
+    are yielded (or the caller stops iterating) queued work is cancelled.
+
+    With a `seen_index` (recurring queries), cards already seen with the same
+    content hash are skipped without a detail fetch, listings are marked as they
+    are yielded, and yielded records carry `seen_status` ("new" or "changed") and
+    the card's `content_hash`, the value the caller should mark its index with.
+
+    Listings with a price, year, mileage or location that is missing or only
+    weakly sourced are held in a fallback queue instead of being yielded. If the
+    crawl ends short of `max_results`, the queue is sent to `llm` in batches, and
+    whatever still matches (unknown constrained fields now reject) is yielded last.
+    `report.complete` is set when the search ran off the end of the results and
+    `max_results` cut nothing off.
+    Politeness, retries and the circuit breaker live in scraping/http.py.
+    """
+    transport = get_transport()
+    report = report if report is not None else CrawlReport()
+    last_page = min(max_page or MAX_SEARCH_PAGES, MAX_SEARCH_PAGES)
+    planner = PagePlanner(max_results, parallelism=min(page_concurrency, last_page))
+
+    page_pool = ThreadPoolExecutor(max_workers=max(1, page_concurrency))
+    detail_pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    pages: Deque = deque()   # (page_no, future) in page order
+    slots: Deque = deque()   # (card, detail future or None) in site order
+    seen = set()
+    fallback: List = []      # (card, record) awaiting the LLM pass, in site order
+    next_page = 1
+    exhausted = False
+    partial = False          # a search page failed or the circuit opened
+    yielded = 0
+
+    try:
+        while yielded < max_results:
+            # Plan and submit search pages
+            if not exhausted and next_page <= last_page:
+                for _ in range(planner.pages_wanted(len(slots), len(pages))):
+                    if next_page > last_page:
+                        break
+                    pages.append((next_page, page_pool.submit(fetch_search_page, criteria, next_page)))
+                    next_page += 1
+
+            # Emit every slot at the head of the queue that is ready
+            while slots and (slots[0][1] is None or slots[0][1].done()) and yielded < max_results:
+                card, fut = slots.popleft()
+                car_data = _resolve_slot(card, fut, criteria)
+                if car_data is not None:
+                    report.listings_resolved += 1
+                    if seen_index is not None:
+                        car_data["seen_status"] = card["seen_status"]
+                        car_data["content_hash"] = card["content_hash"]
+                matched = car_data is not None and matches_criteria(car_data, criteria)
+                if matched and needs_fallback(car_data):
+                    report.fallback_listings += 1
+                    fallback.append((card, car_data))
+                    continue  # outcome known after the LLM pass
+                planner.observe_outcome(matched)
+                if matched:
+                    yielded += 1
+                    _mark_seen(seen_index, card)
+                    print(f"[SCRAPE] ✅ {_describe(car_data)}")
+                    yield _finish(car_data)
+            if yielded >= max_results:
+                break
+
+            # Fold in the next search page once it is back
+            if pages and pages[0][1].done():
+                page_no, fut = pages.popleft()
+                try:
+                    page_cards = fut.result()
+                except CircuitOpenError as e:
+                    print(f"[SCRAPE] stopping search early: {e}")
+                    exhausted = partial = True
+                    continue
+                if page_cards is None:
+                    partial = True
+                    continue  # failed page, already logged
+                report.search_pages += 1
+                report.cards_seen += len(page_cards)
+                planner.observe_page(len(page_cards))
+                if not page_cards:
+                    exhausted = True  # ran off the end of the results
+                new_cards = [c for c in page_cards if c["url"] not in seen]
+                if page_cards and not new_cards:
+                    print(f"[SCRAPE] page {page_no} repeated earlier cards; treating as end of results")
+                    exhausted = True
+                for card in new_cards:
+                    if card["url"] in seen:
+                        continue
+                    seen.add(card["url"])
+                    if not card_matches_criteria(card, criteria):
+                        report.cards_rejected += 1
+                        continue
+                    if seen_index is not None:
+                        card["content_hash"] = content_hash(card)
+                        card["seen_status"] = seen_index.status(card["url"], card["content_hash"])
+                        if card["seen_status"] == SEEN:
+                            report.cards_unchanged += 1
+                            continue
+                    if card_is_complete(card):
+                        report.cards_complete += 1
+                        slots.append((card, None))
+                    else:
+                        report.detail_fetches += 1
+                        slots.append((card, detail_pool.submit(_scrape_detail_safe, card["url"])))
+                continue
+
+            if not slots and not pages:
+                if exhausted or next_page > last_page:
+                    break
+                continue  # planner will submit another page
+
+            waiting = [f for f in (slots[0][1] if slots else None, pages[0][1] if pages else None) if f is not None]
+            wait(waiting, return_when=FIRST_COMPLETED)
+
+        if fallback and yielded < max_results:
+            page_pool.shutdown(wait=False, cancel_futures=True)
+            detail_pool.shutdown(wait=False, cancel_futures=True)
+            for (card, _), car_data in zip(fallback, resolve_fallback(fallback, llm, report)):
+                if yielded >= max_results:
+                    break
+                if matches_criteria(car_data, criteria, strict=True):
+                    yielded += 1
+                    _mark_seen(seen_index, card)
+                    print(f"[SCRAPE] ✅ {_describe(car_data)} (LLM fallback)")
+                    yield _finish(car_data)
+        report.complete = exhausted and not partial and yielded < max_results
+    finally:
+        page_pool.shutdown(wait=False, cancel_futures=True)
+        detail_pool.shutdown(wait=False, cancel_futures=True)
+        report.results = yielded
+        print(f"[SCRAPE] Report: {report.summary()}")
+        print(f"[SCRAPE] HTTP: {transport.stats.as_dict()}")
+        cache = get_detail_cache()
+        if cache:
+            cache.flush()
+            print(f"[SCRAPE] Cache: {cache.stats.as_dict()}")
+        archive = get_page_archive()
+        if archive:
+            archive.flush()
+            print(f"[SCRAPE] Archive: {archive.stats.as_dict()}")
+
+
+def _resolve_slot(card: Dict, fut: Optional[Future], criteria: Dict) -> Optional[Dict]:
+    if fut is None:
+        return card_to_record(card, criteria)
+    detail = fut.result()
+    return merge_card_and_detail(card, detail, criteria) if detail else None
+
+
+def _mark_seen(seen_index: Optional[SeenIndex], card: Dict) -> None:
+    if seen_index is not None:
+        seen_index.mark(card["url"], card["content_hash"])
+
+
+def _finish(car_data: Dict) -> Dict:
+    car_data.pop("evidence", None)
+    return car_data
+
+
+def _describe(car: Dict) -> str:
+    price = f"${car['price']:,}" if car.get("price") is not None else "$?"
+    km = f"{car['mileage']:,}km" if car.get("mileage") is not None else "?km"
+    return f"{car.get('name') or 'Unknown'} {price} ({km})"
+
+
+def resolve_fallback(queue: List, llm, report: CrawlReport) -> List[Dict]:
+    """One batched LLM pass over every queued listing; fills only the fields that need it.
+
+    Without an LLM the records are returned as they are.
+    """
+    records = [record for _, record in queue]
+    if llm is None or not queue:
+        return records
+    texts = [" | ".join(filter(None, (card.get("snippet"), record.get("evidence")))) for card, record in queue]
+    stats = LLMParseStats()
+    try:
+        filled = parse_listings_with_llm(llm, texts, stats=stats)
+    except Exception as e:
+        print(f"[SCRAPE] ❌ LLM fallback failed: {e}")
+        return records
+    report.fallback_batches += stats.batches
+    for record, info in zip(records, filled):
+        for field in needs_fallback(record):
+            value = info.get(field)
+            if field == "location":
+                value = to_state(value)
+            elif value is not None:
+                try:
+                    value = int(value)
+                except (TypeError, ValueError):
+                    value = None
+            if value is not None:
+                set_field(record, field, value, "llm")
+        if not needs_fallback(record):
+            report.fallback_resolved += 1
+    return records
+
+
+def _scrape_detail_safe(url: str) -> Optional[Dict]:
+    try:
+        return scrape_detail_page(url)
+    except CircuitOpenError:
+        # Site is throttling us; remaining queued fetches fail fast here too
+        return None
+    except Exception as e:
+        print(f"[SCRAPE] ❌ {url}: {e}")
+        return None
+
 def get_unique_listing_urls(criteria: Dict, max_page: int) -> List[str]:
-    """Extract UNIQUE listing URLs from search pages"""
-    all_urls = set()
-    base_url = build_drive_url(criteria)
-    
+    """Extract UNIQUE listing URLs from search pages, in page order"""
+    return list(dict.fromkeys(card["url"] for card in get_listing_cards(criteria, max_page)))
+
+def get_listing_cards(criteria: Dict, max_page: int) -> List[Dict]:
+    """Unique listing cards from search pages, in site order, with card-level fields"""
+    cards: Dict[str, Dict] = {}
     for page in range(1, max_page + 1):
-        url = f"{base_url}page={page}"
-        resp = requests.get(url, headers=DEFAULT_HEADERS, timeout=20)
-        soup = BeautifulSoup(resp.text, 'lxml')
-        
-        # Find listing links
-        cards = soup.find_all('div', class_=lambda x: x and (
-            'listing-card' in x or 'marketplace-listing-card' in x
-        ))
-        
-        for card in cards:
-            link = card.find('a', href=True)
-            if link and '/cars-for-sale/car/' in link['href']:
-                full_url = DRIVE_BASE_URL + link['href'].split('?')[0]  # Clean URL
-                all_urls.add(full_url)
-    
-    return list(all_urls)
+        try:
+            page_cards = fetch_search_page(criteria, page)
+        except CircuitOpenError as e:
+            print(f"[SCRAPE] stopping search early: {e}")
+            break
+        if not page_cards:
+            if page_cards is not None:
+                break  # ran off the end of the results
+            continue
+        if all(card["url"] in cards for card in page_cards):
+            break  # site returned a page we already have
+        for card in page_cards:
+            cards.setdefault(card["url"], card)
+    archive = get_page_archive()
+    if archive:
+        archive.flush()
+    return list(cards.values())
+
+def fetch_search_page(criteria: Dict, page: int) -> Optional[List[Dict]]:
+    """Cards on one search page (None if the page failed; CircuitOpenError propagates)"""
+    url = build_drive_url(criteria, page=page)
+    try:
+        resp = get_transport().get(url)
+    except CircuitOpenError:
+        raise
+    except requests.RequestException as e:
+        print(f"[SCRAPE] ❌ search page {page}: {e}")
+        return None
+    archive = get_page_archive()
+    if archive:
+        archive.put(url, resp.content, "search")
+    return parse_search_cards(resp.text)
+
+def parse_search_cards(html: str) -> List[Dict]:
+    """Listing cards on one search page: url plus whatever fields the card shows"""
+    soup = BeautifulSoup(html, 'lxml')
+    cards = soup.find_all('div', class_=lambda x: x and (
+        'listing-card' in x or 'marketplace-listing-card' in x
+    ))
+
+    parsed = []
+    for card in cards:
+        link = card.find('a', href=True)
+        if not (link and '/cars-for-sale/car/' in link['href']):
+            continue
+        snippet = card.get_text(" ", strip=True)
+        title_el = card.find(['h2', 'h3', 'h4']) or link
+        name = title_el.get_text(" ", strip=True) or None
+        price_m = _CARD_PRICE_RE.search(snippet)
+        km_m = _CARD_KM_RE.search(snippet)
+        loc_m = _CARD_STATE_RE.search(snippet)
+        parsed.append({
+            "url": DRIVE_BASE_URL + link['href'].split('?')[0],  # Clean URL
+            "name": name,
+            "price": int(price_m.group(1).replace(',', '')) if price_m else None,
+            "year": extract_year(name or "") or extract_year(snippet),
+            "mileage": int(km_m.group(1).replace(',', '')) if km_m else None,
+            "location": loc_m.group(1).upper() if loc_m else None,
+            "snippet": snippet,
+        })
+    return parsed
+
+def card_matches_criteria(card: Dict, criteria: Dict) -> bool:
+    """Cheap pre-filter on card text; fields the card doesn't show never reject"""
+    if card.get("year") is None:
+        criteria = {**criteria, "year_min": None}  # a year-less card is judged after extraction
+    if not filter_snippet_by_criteria(card["snippet"], criteria):
+        return False
+    return matches_criteria(card, criteria)
+
+def card_is_complete(card: Dict) -> bool:
+    return all(card.get(k) is not None for k in ("name", "price", "year", "mileage"))
+
+def _search_state(criteria: Dict) -> str:
+    """State the search URL is scoped to (same default as build_drive_url)."""
+    return STATE_MAP.get((criteria.get("location") or "").lower(), "vic").upper()
+
+def card_to_record(card: Dict, criteria: Dict) -> Dict:
+    record = {"url": card["url"], "source": "drive.com.au", "field_sources": {}, "field_confidence": {}}
+    for k in ("name", "price", "year", "mileage", "location"):
+        if card.get(k) is not None:
+            set_field(record, k, card[k], "card")
+        else:
+            record[k] = None
+    if record["location"] is None:
+        set_field(record, "location", _search_state(criteria), "search")
+    return record
+
+def merge_card_and_detail(card: Dict, detail: Dict, criteria: Optional[Dict] = None) -> Dict:
+    """Detail page only fills fields the card didn't show"""
+    merged = dict(detail)
+    merged["field_sources"] = dict(detail.get("field_sources") or {})
+    merged["field_confidence"] = dict(detail.get("field_confidence") or {})
+    for k in ("name", "price", "year", "mileage", "location"):
+        if card.get(k) is not None:
+            set_field(merged, k, card[k], "card")
+    if merged.get("location") is None and criteria is not None:
+        set_field(merged, "location", _search_state(criteria), "search")
+    return merged
 
 def scrape_detail_page(url: str) -> Dict:
-    """Accurate data from INDIVIDUAL detail page"""
-    resp = requests.get(url, headers=DEFAULT_HEADERS, timeout=20)
-    soup = BeautifulSoup(resp.text, 'lxml')
-    
-    # Title
-    title_el = soup.find('h1') or soup.find('title')
-    name = title_el.get_text(strip=True) if title_el else "Unknown"
-    
-    # Price (multiple selectors)
-    price_selectors = [
-        '[data-testid="price"]', '.price', '.listing-price',
-        'span:contains("$")', '[class*="price"]'
-    ]
-    price_text = ""
-    for selector in price_selectors:
-        el = soup.select_one(selector)
-        if el:
-            price_text = el.get_text(strip=True)
-            break
-    
-    price = parse_price(price_text)
-    year = extract_year_from_title(name)
-    mileage = parse_mileage(soup)
-    location = parse_location(soup)
-    
-    return {
-        "name": name,
-        "price": price,
-        "year": year,
-        "mileage": mileage or 0,
-        "location": location or "VIC",
-        "url": url,
-        "source": "drive.com.au"
-    }
-
-def parse_price(text: str) -> int:
-    """$26,470 → 26470"""
-    import re
-    match = re.search(r'[\$]?([\d,]+\.?\d*)', text.replace('k', '000'))
-    return int(match.group(1).replace(',', '')) if match else 0
-
-def extract_year_from_title(text: str) -> int:
-    """2022 Mazda → 2022"""
-    import re
-    match = re.search(r'\b(20\d{2}|19\d{2})\b', text)
-    return int(match.group(1)) if match else 0
-
-def parse_mileage(soup: BeautifulSoup) -> int:
-    """Find mileage from detail page"""
-    import re
-    
-    # Try multiple selectors
-    selectors = [
-        '[data-testid="mileage"]', '.mileage', '[class*="km"]', '[class*="mileage"]'
-    ]
-    
-    for selector in selectors:
-        el = soup.select_one(selector)
-        if el:
-            text = el.get_text()
-            match = re.search(r'(\d{1,3}(?:,\d{3})*)', text)
-            if match:
-                return int(match.group(1).replace(',', ''))
-    
-    # Fallback: search entire page
-    text = soup.get_text()
-    match = re.search(r'(\d{1,3}(?:,\d{3})*)\s*km', text, re.I)
-    return int(match.group(1).replace(',', '')) if match else 0
-
-def parse_location(soup: BeautifulSoup) -> str:
-    """VIC, NSW, etc."""
-    location_selectors = [
-        '[data-testid="location"]', '.location', '[class*="location"]'
-    ]
-    for selector in location_selectors:
-        el = soup.select_one(selector)
-        if el:
-            return el.get_text(strip=True).upper()
-    return "VIC"
-
-def matches_criteria(car: Dict, criteria: Dict) -> bool:
-    """Post-scrape filtering"""
-    if criteria.get('year_min') and car.get('year', 0) < criteria['year_min']:
+    """Accurate data from INDIVIDUAL detail page (conditional GET when cached)"""
+    cache = get_detail_cache()
+    entry = cache.lookup(url) if cache else None
+    if entry and cache.is_fresh(entry):
+        record = cache.record(url, entry, parse_detail_html)
+        if record is not None:
+            cache.record_hit()
+            return record
+        entry = None  # body gone: fetch it again
+
+    resp = get_transport().get(url, headers=DetailPageCache.validators(entry))
+    if resp.status_code == 304 and entry:
+        record = cache.record(url, entry, parse_detail_html)
+        if record is not None:
+            cache.revalidated(url)
+            return record  # unchanged page: no re-parse unless the extractor changed
+        resp = get_transport().get(url)
+
+    archive = get_page_archive()
+    if archive:
+        archive.put(url, resp.content, "detail")
+    record = parse_detail_html(resp.text, url)
+    if cache:
+        cache.put(url, resp, record)
+    return record
+
+def parse_detail_html(html: str, url: str) -> Dict:
+    return extract_detail(html, url)
+
+def matches_criteria(car: Dict, criteria: Dict, strict: bool = False) -> bool:
+    """Post-scrape filtering (fields that are None are unknown and never reject, unless strict)"""
+    year, price, mileage = car.get('year'), car.get('price'), car.get('mileage')
+    if strict:
+        if (criteria.get('year_min') or criteria.get('year_max')) and year is None:
+            return False
+        if (criteria.get('price_min') or criteria.get('price_max')) and price is None:
+            return False
+        if criteria.get('mileage_max') and mileage is None:
+            return False
+    if criteria.get('year_min') and year is not None and year < criteria['year_min']:
+        return False
+    if criteria.get('year_max') and year and year > criteria['year_max']:
+        return False
+    if criteria.get('price_min') and price is not None and price < criteria['price_min']:
+        return False
+    if criteria.get('price_max') and price is not None and price > criteria['price_max']:
         return False
-    if criteria.get('price_max') and car.get('price', 0) > criteria['price_max']:
+    if criteria.get('mileage_max') and mileage and mileage > criteria['mileage_max']:
         return False
-    return True
\ No newline at end of file
+    return True
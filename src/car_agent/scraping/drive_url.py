@@ -1,51 +1,62 @@
 from __future__ import annotations
 
-from typing import Dict
+from typing import Dict, List, Tuple
+from urllib.parse import urlencode
 
 from car_agent.scraping.constants import DRIVE_SEARCH_BASE, STATE_MAP
 
 
-def build_drive_url(criteria: Dict) -> str:
+def _search_path(criteria: Dict) -> str:
     state_raw = (criteria.get("location") or "").lower()
     state = STATE_MAP.get(state_raw, "vic")
 
     listing_type = (criteria.get("listing_type") or "all").strip().lower()
 
-    make = (criteria.get("make") or "").lower().replace(" ", "-")
-    model = (criteria.get("model") or "").lower().replace(" ", "-")
+    make = (criteria.get("make") or "").strip().lower().replace(" ", "-")
+    model = (criteria.get("model") or "").strip().lower().replace(" ", "-")
 
     if make:
         if model:
-            path = f"{listing_type}/{state}/all/{make}/{model}/"
-        else:
-            path = f"{listing_type}/{state}/all/{make}/"
-    else:
-        path = f"{listing_type}/{state}/"
+            return f"{listing_type}/{state}/all/{make}/{model}/"
+        return f"{listing_type}/{state}/all/{make}/"
+    return f"{listing_type}/{state}/"
 
-    url = f"{DRIVE_SEARCH_BASE}{path}"
 
-    hash_parts = []
+def search_params(criteria: Dict) -> List[Tuple[str, str]]:
+    """Server-side filters for every supported criteria field, in canonical (sorted) order."""
+    params = []
+
     year_min = criteria.get("year_min")
     year_max = criteria.get("year_max")
     if year_min or year_max:
-        hash_parts.append(f"year=[{year_min or 0},{year_max or 0}]")
+        params.append(("year", f"[{year_min or 0},{year_max or 0}]"))
 
-    price_min = criteria.get("price_min", 0)
-    price_max = criteria.get("price_max", 0)
+    price_min = criteria.get("price_min") or 0
+    price_max = criteria.get("price_max") or 0
     if price_min or price_max:
-        hash_parts.append(f"price=[{price_min},{price_max}]")
+        params.append(("price", f"[{price_min},{price_max}]"))
 
-    transmission = criteria.get("transmission")
-    if transmission and transmission.lower() in ("auto", "automatic"):
-        hash_parts.append("transmission=auto")
+    transmission = (criteria.get("transmission") or "").strip().lower()
+    if transmission in ("auto", "automatic"):
+        params.append(("transmission", "auto"))
+    elif transmission == "manual":
+        params.append(("transmission", "manual"))
 
     mileage_max = criteria.get("mileage_max")
     if mileage_max:
-        hash_parts.append(f"kms=[0,{mileage_max}]")
+        params.append(("kms", f"[0,{mileage_max}]"))
+
+    params.append(("sortBy", "recommended"))
+    return sorted(params)
 
-    hash_parts.append("sortBy=recommended")
 
-    if hash_parts:
-        url += "#" + "&".join(hash_parts)
+def build_drive_url(criteria: Dict, page: int = 1) -> str:
+    """Search URL with filters and pagination as real query parameters.
 
-    return url
+    Filters used to go after a '#', which browsers never send, so the site
+    returned unfiltered pages and ignored `page`.
+    """
+    params = search_params(criteria)
+    if page and page > 1:
+        params.append(("page", str(page)))
+    return f"{DRIVE_SEARCH_BASE}{_search_path(criteria)}?{urlencode(params, safe='[],')}"
@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import lxml.html
+
+from car_agent.scraping.constants import FALLBACK_EVIDENCE_CHARS, MIN_FIELD_CONFIDENCE
+
+# Precompiled once per process
+_PRICE_RE = re.compile(r'\$?\s*(\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?\s*(k\b)?', re.I)
+_YEAR_RE = re.compile(r'\b(20\d{2}|19\d{2})\b')
+_NUMBER_RE = re.compile(r'(\d{1,3}(?:,\d{3})+|\d+)')
+_KM_RE = re.compile(r'(\d{1,3}(?:,\d{3})+|\d+)\s*km\b', re.I)
+_STATE_RE = re.compile(r'\b(NSW|VIC|QLD|SA|WA|TAS|ACT|NT)\b', re.I)
+
+# DOM fallback: (field, attribute, needle, exact) in priority order
+_DOM_RULES: List[Tuple[str, str, str, bool]] = [
+    ("price", "data-testid", "price", True),
+    ("mileage", "data-testid", "mileage", True),
+    ("mileage", "data-testid", "odometer", True),
+    ("location", "data-testid", "location", True),
+    ("price", "class", "price", True),
+    ("price", "class", "listing-price", True),
+    ("mileage", "class", "mileage", True),
+    ("location", "class", "location", True),
+    ("price", "class", "price", False),
+    ("mileage", "class", "km", False),
+    ("mileage", "class", "mileage", False),
+    ("location", "class", "location", False),
+]
+
+# How far each provenance is trusted. "text" is any "N km" on the page, which may
+# belong to a related listing, so it is kept only as a hint for the LLM fallback.
+FIELD_CONFIDENCE = {
+    "jsonld": 0.95,
+    "state": 0.9,
+    "dom": 0.8,
+    "card": 0.8,
+    "search": 0.8,   # location implied by the state-scoped search URL
+    "llm": 0.7,
+    "text": 0.4,
+}
+CHECKED_FIELDS = ("price", "year", "mileage", "location")
+# Bump whenever extract_detail's output changes: cached records made by an older
+# version are re-extracted from the cached page instead of being served
+EXTRACTOR_VERSION = 3
+_EVIDENCE_RE = re.compile(r'\$\s?\d|\d\s*km\b|\b(?:NSW|VIC|QLD|SA|WA|TAS|ACT|NT)\b|odometer|kilomet', re.I)
+
+_STATE_KEYS = {"__NEXT_DATA__", "__NUXT_DATA__", "__APOLLO_STATE__"}
+_LISTING_KEYS = {
+    "price": ("price", "priceDriveAway", "driveAwayPrice", "askingPrice", "amount"),
+    "year": ("year", "releaseYear", "modelYear", "vehicleModelDate"),
+    "mileage": ("odometer", "kilometres", "kms", "mileage", "mileageFromOdometer"),
+    "location": ("state", "addressRegion", "region", "location"),
+    "name": ("title", "name", "heading"),
+}
+
+
+def parse_price(text: str) -> int:
+    """$26,470 → 26470, 25k → 25000"""
+    match = _PRICE_RE.search(text or "")
+    if not match:
+        return 0
+    value = int(match.group(1).replace(',', ''))
+    return value * 1000 if match.group(2) else value
+
+
+def extract_year_from_title(text: str) -> int:
+    """2022 Mazda → 2022"""
+    match = _YEAR_RE.search(text or "")
+    return int(match.group(1)) if match else 0
+
+
+def _to_int(value: Any) -> Optional[int]:
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, dict):
+        return _to_int(value.get("value") or value.get("amount"))
+    if isinstance(value, str):
+        m = _NUMBER_RE.search(value)
+        return int(m.group(1).replace(',', '')) if m else None
+    return None
+
+
+def to_state(value: Any) -> Optional[str]:
+    if isinstance(value, dict):
+        value = value.get("addressRegion") or value.get("state") or value.get("name")
+    if isinstance(value, str) and value.strip():
+        m = _STATE_RE.search(value)
+        return m.group(1).upper() if m else value.strip().upper()
+    return None
+
+
+def _iter_jsonld(blob: Any):
+    if isinstance(blob, list):
+        for item in blob:
+            yield from _iter_jsonld(item)
+    elif isinstance(blob, dict):
+        if "@graph" in blob:
+            yield from _iter_jsonld(blob["@graph"])
+        yield blob
+
+
+def _from_jsonld(texts: List[str]) -> Dict[str, Any]:
+    for text in texts:
+        try:
+            blob = json.loads(text)
+        except ValueError:
+            continue
+        for node in _iter_jsonld(blob):
+            types = node.get("@type")
+            types = types if isinstance(types, list) else [types]
+            if not {"Car", "Vehicle", "Product", "Offer"} & set(t for t in types if isinstance(t, str)):
+                continue
+            offers = node.get("offers") or {}
+            if isinstance(offers, list):
+                offers = offers[0] if offers else {}
+            seller = offers.get("seller") or node.get("seller") or {}
+            place = offers.get("availableAtOrFrom") or {}
+            out = {
+                "name": node.get("name"),
+                "price": _to_int(offers.get("price") or node.get("price")),
+                "year": _to_int(node.get("vehicleModelDate") or node.get("modelDate") or node.get("productionDate")),
+                "mileage": _to_int(node.get("mileageFromOdometer")),
+                "location": to_state(place.get("address") or seller.get("address") or place),
+            }
+            return {k: v for k, v in out.items() if v}
+    return {}
+
+
+def _find_listing_obj(obj: Any, depth: int = 0) -> Optional[Dict[str, Any]]:
+    """First dict in a page-state blob that looks like a listing (price + year/odometer)."""
+    if depth > 12:
+        return None
+    if isinstance(obj, dict):
+        keys = obj.keys()
+        has_price = any(k in keys for k in _LISTING_KEYS["price"])
+        has_other = any(k in keys for k in _LISTING_KEYS["year"] + _LISTING_KEYS["mileage"])
+        if has_price and has_other:
+            return obj
+        children = obj.values()
+    elif isinstance(obj, list):
+        children = obj
+    else:
+        return None
+    for child in children:
+        if isinstance(child, (dict, list)):
+            found = _find_listing_obj(child, depth + 1)
+            if found is not None:
+                return found
+    return None
+
+
+def _from_state(texts: List[str]) -> Dict[str, Any]:
+    for text in texts:
+        try:
+            listing = _find_listing_obj(json.loads(text))
+        except ValueError:
+            continue
+        if not listing:
+            continue
+        out = {}
+        for field, keys in _LISTING_KEYS.items():
+            for key in keys:
+                if listing.get(key) is not None:
+                    value = listing[key]
+                    if field == "location":
+                        out[field] = to_state(value)
+                    elif field == "name":
+                        out[field] = value if isinstance(value, str) else None
+                    else:
+                        out[field] = _to_int(value)
+                    break
+        return {k: v for k, v in out.items() if v}
+    return {}
+
+
+def field_confidence(record: Dict[str, Any], field: str) -> float:
+    if record.get(field) is None:
+        return 0.0
+    conf = (record.get("field_confidence") or {}).get(field)
+    if conf is None:
+        conf = FIELD_CONFIDENCE.get((record.get("field_sources") or {}).get(field), 0.0)
+    return conf
+
+
+def needs_fallback(record: Dict[str, Any]) -> List[str]:
+    """Checked fields that are missing or below MIN_FIELD_CONFIDENCE."""
+    return [f for f in CHECKED_FIELDS if field_confidence(record, f) < MIN_FIELD_CONFIDENCE]
+
+
+def set_field(record: Dict[str, Any], field: str, value: Any, source: str) -> None:
+    record[field] = value
+    record.setdefault("field_sources", {})[field] = source
+    record.setdefault("field_confidence", {})[field] = FIELD_CONFIDENCE[source]
+
+
+def _evidence(name: Optional[str], text: str) -> str:
+    """Short excerpt for the LLM: the title plus text around prices, kms and states."""
+    parts = [name or ""]
+    budget = FALLBACK_EVIDENCE_CHARS
+    last_end = 0
+    for m in _EVIDENCE_RE.finditer(text):
+        if budget <= 0:
+            break
+        start, end = max(m.start() - 60, last_end), min(m.end() + 60, len(text))
+        if end <= last_end:
+            continue
+        chunk = " ".join(text[start:end].split())
+        parts.append(chunk)
+        budget -= len(chunk)
+        last_end = end
+    return " | ".join(p for p in parts if p)[:FALLBACK_EVIDENCE_CHARS]
+
+
+def extract_detail(html: str, url: str) -> Dict[str, Any]:
+    """Parse a detail page once and read every field from a single tree walk.
+
+    Strategy order per field: JSON-LD ("jsonld"), embedded page state ("state"),
+    DOM attributes ("dom"), then free page text ("text"). The winning strategy for
+    each field is returned under `field_sources` and its trust under
+    `field_confidence`. Fields nothing found are None (never a default), and
+    records that need the LLM fallback carry a short `evidence` excerpt.
+    """
+    doc = lxml.html.fromstring(html or "<html></html>")
+
+    jsonld: List[str] = []
+    state: List[str] = []
+    title: Optional[str] = None
+    h1: Optional[str] = None
+    dom: Dict[str, Tuple[int, str]] = {}
+    text_parts: List[str] = []
+
+    for el in doc.iter():
+        tag = el.tag
+        if not isinstance(tag, str):
+            continue
+        if tag == "script":
+            typ = el.get("type", "")
+            if typ == "application/ld+json":
+                jsonld.append(el.text or "")
+            elif el.get("id") in _STATE_KEYS or (typ == "application/json" and el.get("id")):
+                state.append(el.text or "")
+        if tag in ("script", "style"):
+            if el.tail:
+                text_parts.append(el.tail)
+            continue
+        if tag == "h1" and h1 is None:
+            h1 = el.text_content().strip()
+        elif tag == "title" and title is None:
+            title = (el.text or "").strip()
+
+        testid = el.get("data-testid")
+        classes = el.get("class") or ""
+        if testid or classes:
+            tokens = classes.split()
+            for rank, (field, attr, needle, exact) in enumerate(_DOM_RULES):
+                if field in dom and dom[field][0] <= rank:
+                    continue
+                if attr == "data-testid":
+                    hit = testid == needle
+                elif exact:
+                    hit = needle in tokens
+                else:
+                    hit = needle in classes
+                if hit:
+                    dom[field] = (rank, el.text_content().strip())
+        if el.text:
+            text_parts.append(el.text)
+        if el.tail:
+            text_parts.append(el.tail)
+
+    found: Dict[str, Any] = {}
+    sources: Dict[str, str] = {}
+
+    def take(values: Dict[str, Any], source: str) -> None:
+        for k, v in values.items():
+            if k not in found and v not in (None, "", 0):
+                found[k] = v
+                sources[k] = source
+
+    take(_from_jsonld(jsonld), "jsonld")
+    take(_from_state(state), "state")
+
+    name = h1 or title
+    take({"name": name}, "dom")
+    take({
+        "price": parse_price(dom["price"][1]) if "price" in dom else None,
+        "mileage": _to_int(dom["mileage"][1]) if "mileage" in dom else None,
+        "location": to_state(dom["location"][1]) if "location" in dom else None,
+    }, "dom")
+    if "year" not in found and found.get("name"):
+        take({"year": extract_year_from_title(found["name"])}, "dom")
+
+    page_text = None
+    if "mileage" not in found:
+        page_text = " ".join(text_parts)
+        m = _KM_RE.search(page_text)
+        if m:
+            take({"mileage": int(m.group(1).replace(',', ''))}, "text")
+
+    record = {
+        "name": found.get("name"),
+        "price": found.get("price"),
+        "year": found.get("year"),
+        "mileage": found.get("mileage"),
+        "location": found.get("location"),
+        "url": url,
+        "source": "drive.com.au",
+        "field_sources": sources,
+        "field_confidence": {k: FIELD_CONFIDENCE[v] for k, v in sources.items()},
+    }
+    if needs_fallback(record):
+        record["evidence"] = _evidence(found.get("name"), page_text if page_text is not None else " ".join(text_parts))
+    return record
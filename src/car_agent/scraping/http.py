@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass, field, fields
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.request import ACCEPT_ENCODING
+
+from car_agent.scraping.constants import (
+    CIRCUIT_BREAKER_COOLDOWN_S,
+    CIRCUIT_BREAKER_THRESHOLD,
+    DEFAULT_HEADERS,
+    DEFAULT_HOST_BURST,
+    DEFAULT_POLITE_SLEEP_S,
+    HTTP_BACKOFF_BASE_S,
+    HTTP_BACKOFF_MAX_S,
+    HTTP_MAX_RETRIES,
+    HTTP_POOL_MAXSIZE,
+    REQUEST_TIMEOUT_S,
+)
+from car_agent.scraping.rate_limit import HostRateLimiter
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+THROTTLE_STATUSES = frozenset({429, 503})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of fetching while a host's circuit breaker is open."""
+
+
+@dataclass
+class TransportStats:
+    requests: int = 0
+    connections_opened: int = 0
+    retries: int = 0
+    throttled: int = 0
+    circuit_rejections: int = 0
+    bytes_received: int = 0
+    bytes_decoded: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    @property
+    def connections_reused(self) -> int:
+        return max(0, self.requests - self.connections_opened)
+
+    def as_dict(self) -> Dict[str, int]:
+        d = {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+        d["connections_reused"] = self.connections_reused
+        return d
+
+
+def _counting_pool(base, stats: TransportStats):
+    class _Pool(base):
+        def _new_conn(self):
+            stats.incr("connections_opened")
+            return super()._new_conn()
+    return _Pool
+
+
+class _CountingAdapter(HTTPAdapter):
+    def __init__(self, stats: TransportStats, **kwargs):
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self._stats),
+            "https": _counting_pool(HTTPSConnectionPool, self._stats),
+        }
+
+
+class _Breaker:
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+
+
+class DriveTransport:
+    """Pooled keep-alive session shared by every Drive request.
+
+    Adds per-host rate limiting, bounded exponential backoff on 429/5xx and
+    connection errors (honouring Retry-After), and a per-host circuit breaker
+    that trips after repeated throttling so a crawl stops instead of hammering.
+    """
+
+    def __init__(
+        self,
+        pool_maxsize: int = HTTP_POOL_MAXSIZE,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff_base_s: float = HTTP_BACKOFF_BASE_S,
+        backoff_max_s: float = HTTP_BACKOFF_MAX_S,
+        breaker_threshold: int = CIRCUIT_BREAKER_THRESHOLD,
+        breaker_cooldown_s: float = CIRCUIT_BREAKER_COOLDOWN_S,
+        timeout: float = REQUEST_TIMEOUT_S,
+        limiter: Optional[HostRateLimiter] = None,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown_s = breaker_cooldown_s
+        self.timeout = timeout
+        self.limiter = limiter or HostRateLimiter(rate=1.0 / DEFAULT_POLITE_SLEEP_S, burst=DEFAULT_HOST_BURST)
+        self.stats = TransportStats()
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        # gzip/deflate always; br/zstd when urllib3 can decode them
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        adapter = _CountingAdapter(self.stats, pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._breakers: Dict[str, _Breaker] = {}
+        self._lock = threading.Lock()
+
+    # ----- circuit breaker -----
+
+    def _breaker(self, host: str) -> _Breaker:
+        with self._lock:
+            return self._breakers.setdefault(host, _Breaker())
+
+    def is_open(self, url: str) -> bool:
+        return self._breaker(urlsplit(url).netloc).open_until > time.monotonic()
+
+    def _record_throttle(self, host: str) -> None:
+        b = self._breaker(host)
+        with self._lock:
+            b.failures += 1
+            if b.failures >= self.breaker_threshold:
+                b.open_until = time.monotonic() + self.breaker_cooldown_s
+                print(f"[HTTP] circuit open for {host} ({b.failures} throttled responses)")
+
+    def _record_success(self, host: str) -> None:
+        b = self._breaker(host)
+        with self._lock:
+            b.failures = 0
+
+    # ----- backoff -----
+
+    def _retry_after(self, resp: requests.Response) -> Optional[float]:
+        value = resp.headers.get("Retry-After")
+        if not value:
+            return None
+        if value.strip().isdigit():
+            return float(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps concurrent workers from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt)))
+
+    # ----- public API -----
+
+    def get(self, url: str, headers: Optional[Mapping[str, str]] = None) -> requests.Response:
+        """GET with retries. Raises CircuitOpenError or requests.HTTPError on failure."""
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            if self.is_open(url):
+                self.stats.incr("circuit_rejections")
+                raise CircuitOpenError(f"circuit open for {host}")
+
+            self.limiter.acquire(url)
+            self.stats.incr("requests")
+            try:
+                resp = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                self.stats.incr("retries")
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            self.stats.incr("bytes_decoded", len(resp.content))
+            self.stats.incr("bytes_received", resp.raw.tell() if resp.raw is not None else len(resp.content))
+
+            if resp.status_code not in RETRY_STATUSES:
+                self._record_success(host)
+                resp.raise_for_status()
+                return resp
+
+            if resp.status_code in THROTTLE_STATUSES:
+                self.stats.incr("throttled")
+                self._record_throttle(host)
+
+            delay = self._retry_after(resp)
+            if attempt >= self.max_retries or (delay is not None and delay > self.backoff_max_s):
+                resp.raise_for_status()
+            self.stats.incr("retries")
+            time.sleep(delay if delay is not None else self._backoff(attempt))
+            attempt += 1
+
+
+_transport: Optional[DriveTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> DriveTransport:
+    """Process-wide transport, so warm Lambda containers keep their connections."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = DriveTransport()
+        return _transport
+
+
+def set_transport(transport: Optional[DriveTransport]) -> None:
+    """Swap the process-wide transport (benchmarks, replay runs)."""
+    global _transport
+    with _transport_lock:
+        _transport = transport
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, Optional, Set
+
+from car_agent.config import Settings
+from car_agent.scraping.blob_store import FileBlobStore, S3BlobStore
+from car_agent.scraping.extract import EXTRACTOR_VERSION
+
+INDEX_KEY = "index.json"
+FLUSH_ATTEMPTS = 5   # conditional index writes before giving up on this flush
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0            # served without touching the network
+    not_modified: int = 0    # revalidated with a 304
+    misses: int = 0          # full download + parse
+    reextracted: int = 0     # record made by an older extractor, re-parsed from the cached body
+    evictions: int = 0
+    flush_conflicts: int = 0  # index changed by another process since it was read; merged and retried
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+
+
+class DetailPageCache:
+    """Conditional-GET cache for detail pages.
+
+    Bodies live in the blob store under `bodies/<sha1(url)>` (zlib); validators,
+    the extracted record and LRU order live in one index blob that is loaded
+    lazily and written back by `flush()`. Entries older than `ttl_s` are dropped,
+    entries younger than `fresh_s` are served without a request, and the total
+    body size is kept under `max_bytes` by evicting least-recently-used URLs.
+
+    Each record carries the `record_version` (EXTRACTOR_VERSION) that made it;
+    an older one is re-extracted from the cached body. Several processes share
+    the index, so `flush()` merges this process's changes into the current
+    index and writes it with a conditional put, retrying if it moved meanwhile.
+    """
+
+    def __init__(self, store, max_bytes: int, ttl_s: float, fresh_s: float = 0, record_version: int = 0):
+        self._store = store
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.fresh_s = fresh_s
+        self.record_version = record_version
+        self.stats = CacheStats()
+        self._index: Optional["OrderedDict[str, Dict[str, Any]]"] = None
+        self._total = 0
+        self._changed: Set[str] = set()   # keys put or updated since the last flush
+        self._removed: Set[str] = set()   # keys dropped since the last flush
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _parse_index(raw: Optional[bytes]) -> "OrderedDict[str, Dict[str, Any]]":
+        return OrderedDict((e["key"], e) for e in (json.loads(raw) if raw else []))
+
+    def _load(self) -> "OrderedDict[str, Dict[str, Any]]":
+        if self._index is None:
+            self._index = self._parse_index(self._store.get(INDEX_KEY))
+            self._total = sum(e["size"] for e in self._index.values())
+        return self._index
+
+    def _drop(self, key: str) -> None:
+        entry = self._index.pop(key, None)
+        if entry:
+            self._total -= entry["size"]
+            self._store.delete(f"bodies/{key}")
+            self._changed.discard(key)
+            self._removed.add(key)
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and len(self._index) > 1:
+            self._drop(next(iter(self._index)))
+            self.stats.incr("evictions")
+
+    # ----- lookups -----
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the cache entry for `url` (or None), expiring it if past TTL."""
+        with self._lock:
+            index = self._load()
+            key = self._key(url)
+            entry = index.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["stored_at"] > self.ttl_s:
+                self._drop(key)
+                return None
+            index.move_to_end(key)
+            return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["validated_at"] < self.fresh_s
+
+    @staticmethod
+    def validators(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def body(self, url: str) -> Optional[str]:
+        raw = self._store.get(f"bodies/{self._key(url)}")
+        return zlib.decompress(raw).decode("utf-8") if raw else None
+
+    def record(self, url: str, entry: Dict[str, Any],
+               extract: Callable[[str, str], Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """A copy of the entry's record, re-extracted from the cached body if an older extractor made it.
+
+        None (and the entry is dropped) if the body is gone and it cannot be re-extracted.
+        """
+        if entry.get("record_version") == self.record_version:
+            return dict(entry["record"])
+        html = self.body(url)
+        key = self._key(url)
+        with self._lock:
+            self._load()
+            if html is None:
+                self._drop(key)
+                return None
+        record = extract(html, url)
+        with self._lock:
+            entry.update(record=record, record_version=self.record_version)
+            self._changed.add(key)
+        self.stats.incr("reextracted")
+        return dict(record)
+
+    # ----- updates -----
+
+    def record_hit(self) -> None:
+        self.stats.incr("hits")
+
+    def revalidated(self, url: str) -> None:
+        with self._lock:
+            key = self._key(url)
+            entry = self._load().get(key)
+            if entry:
+                entry["validated_at"] = time.time()
+                self._changed.add(key)
+        self.stats.incr("not_modified")
+
+    def put(self, url: str, resp, record: Dict[str, Any]) -> None:
+        self.stats.incr("misses")
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        if not (etag or last_modified or self.fresh_s):
+            return  # nothing to revalidate with and never served fresh
+
+        blob = zlib.compress(resp.content)
+        key = self._key(url)
+        with self._lock:
+            index = self._load()
+            self._drop(key)
+            self._store.put(f"bodies/{key}", blob)
+            now = time.time()
+            index[key] = {
+                "key": key,
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "stored_at": now,
+                "validated_at": now,
+                "size": len(blob),
+                "record": record,
+                "record_version": self.record_version,
+            }
+            self._total += len(blob)
+            self._removed.discard(key)
+            self._changed.add(key)
+            self._evict()
+
+    def flush(self) -> None:
+        """Merge this process's changes into the stored index and write it back conditionally."""
+        with self._lock:
+            if self._index is None or not (self._changed or self._removed):
+                return
+            mine = {k: self._index[k] for k in self._changed if k in self._index}
+            for _ in range(FLUSH_ATTEMPTS):
+                raw, version = self._store.get_versioned(INDEX_KEY)
+                merged = self._parse_index(raw)
+                for key in self._removed:
+                    merged.pop(key, None)
+                for key, entry in mine.items():
+                    merged.pop(key, None)
+                    merged[key] = entry  # most recently used
+                total = sum(e["size"] for e in merged.values())
+                evicted = []
+                while total > self.max_bytes and len(merged) > 1:
+                    key, entry = merged.popitem(last=False)
+                    total -= entry["size"]
+                    evicted.append(key)
+                if self._store.put_if(INDEX_KEY, json.dumps(list(merged.values())).encode("utf-8"), version):
+                    for key in evicted:
+                        self._store.delete(f"bodies/{key}")
+                    self.stats.incr("evictions", len(evicted))
+                    self._index, self._total = merged, total
+                    self._changed.clear()
+                    self._removed.clear()
+                    return
+                self.stats.incr("flush_conflicts")  # another process wrote first: merge again
+            print(f"[CACHE] index kept changing over {FLUSH_ATTEMPTS} attempts; changes wait for the next flush")
+
+
+def build_detail_cache(settings: Settings) -> Optional[DetailPageCache]:
+    if settings.http_cache_bucket:
+        from car_agent.aws.clients import build_s3
+
+        store = S3BlobStore(build_s3(settings), settings.http_cache_bucket, prefix="http-cache")
+    elif settings.http_cache_dir:
+        store = FileBlobStore(settings.http_cache_dir)
+    else:
+        return None
+    return DetailPageCache(
+        store,
+        max_bytes=settings.http_cache_max_mb * 1024 * 1024,
+        ttl_s=settings.http_cache_ttl_s,
+        fresh_s=settings.http_cache_fresh_s,
+        record_version=EXTRACTOR_VERSION,
+    )
+
+
+_cache: Optional[DetailPageCache] = None
+_cache_built = False
+_cache_lock = threading.Lock()
+
+
+def get_detail_cache() -> Optional[DetailPageCache]:
+    """Process-wide cache built from Settings on first use (None when disabled)."""
+    global _cache, _cache_built
+    with _cache_lock:
+        if not _cache_built:
+            _cache = build_detail_cache(Settings())
+            _cache_built = True
+        return _cache
+
+
+def set_detail_cache(cache: Optional[DetailPageCache]) -> None:
+    global _cache, _cache_built
+    with _cache_lock:
+        _cache, _cache_built = cache, True
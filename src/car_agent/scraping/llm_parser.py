@@ -1,41 +1,181 @@
 from __future__ import annotations
 
-from typing import Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional, Tuple
 
 from langchain_core.output_parsers import JsonOutputParser
 
+from car_agent.llm.instrumentation import run_config
 from car_agent.llm.prompts import listing_batch_prompt
 from car_agent.schemas import ListingsBatch
+from car_agent.scraping.constants import (
+    LLM_BATCH_CONCURRENCY,
+    LLM_BATCH_MAX_LISTINGS,
+    LLM_BATCH_MAX_TOKENS,
+    LLM_BATCH_RETRIES,
+    LLM_SNIPPET_MAX_TOKENS,
+)
 
+_PARSER = JsonOutputParser(pydantic_object=ListingsBatch)
+_PROMPT = listing_batch_prompt().partial(format_instructions=_PARSER.get_format_instructions())
 
-def parse_listings_with_llm(llm, listing_texts: List[str]) -> List[Dict]:
-    if not listing_texts:
-        return []
+_encoder = None
+_encoder_lock = threading.Lock()
 
-    parser = JsonOutputParser(pydantic_object=ListingsBatch)
-    prompt = listing_batch_prompt()
 
-    numbered = []
-    for i, txt in enumerate(listing_texts):
-        snippet = (txt or "").strip()
-        if len(snippet) > 1500:
-            snippet = snippet[:1500]
-        numbered.append(f"[{i}] {snippet}")
+def _get_encoder():
+    """tiktoken encoder for the model family, or False when it can't be loaded (offline)."""
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            try:
+                import tiktoken
+
+                _encoder = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                print(f"[LLM-PARSE] tiktoken unavailable ({type(e).__name__}); estimating 4 chars/token")
+                _encoder = False
+        return _encoder
+
+
+def count_tokens(text: str) -> int:
+    enc = _get_encoder()
+    if enc:
+        return len(enc.encode(text))
+    return len(text) // 4 + 1
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    enc = _get_encoder()
+    if enc:
+        tokens = enc.encode(text)
+        return text if len(tokens) <= max_tokens else enc.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+@dataclass
+class LLMParseStats:
+    listings: int = 0
+    parsed: int = 0
+    batches: int = 0
+    retried_listings: int = 0    # indices re-sent because a reply left them out
+    unresolved: int = 0          # still missing after all retries
+    failed_batches: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    wall_s: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def incr(self, name: str, n=1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    @property
+    def listings_per_s(self) -> float:
+        return self.listings / self.wall_s if self.wall_s else 0.0
 
-    listing_block = "\n\n".join(numbered)
+    @property
+    def tokens_per_listing(self) -> float:
+        return (self.prompt_tokens + self.completion_tokens) / self.listings if self.listings else 0.0
 
-    chain = prompt | llm | parser
-    result = chain.invoke({
-        "listing_block": listing_block,
-        "format_instructions": parser.get_format_instructions(),
-    })
+    def as_dict(self) -> Dict[str, Any]:
+        out = {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+        out["wall_s"] = round(self.wall_s, 3)
+        out["listings_per_s"] = round(self.listings_per_s, 2)
+        out["tokens_per_listing"] = round(self.tokens_per_listing, 1)
+        return out
 
-    parsed_list = []
-    for info in result.get("listings", []):
-        clean = {k: v for k, v in info.items() if v is not None}
-        parsed_list.append(clean)
 
-    if len(parsed_list) < len(listing_texts):
-        parsed_list.extend({} for _ in range(len(listing_texts) - len(parsed_list)))
+def plan_batches(items: List[Tuple[int, str, int]], max_tokens: int,
+                 max_listings: int) -> List[List[Tuple[int, str, int]]]:
+    """Pack (index, snippet, tokens) into batches under both limits, keeping input order."""
+    batches: List[List[Tuple[int, str, int]]] = []
+    current: List[Tuple[int, str, int]] = []
+    used = 0
+    for item in items:
+        if current and (used + item[2] > max_tokens or len(current) >= max_listings):
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += item[2]
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _run_batch(chain, batch: List[Tuple[int, str, int]], stats: LLMParseStats,
+               config: Dict[str, Any]) -> Dict[int, Dict]:
+    listing_block = "\n\n".join(f"[{i}] {snippet}" for i, snippet, _ in batch)
+    wanted = {i for i, _, _ in batch}
+    try:
+        message = chain.invoke({"listing_block": listing_block}, config=config)
+        result = _PARSER.invoke(message)
+    except Exception as e:
+        print(f"[LLM-PARSE] ❌ batch of {len(batch)} failed: {e}")
+        stats.incr("failed_batches")
+        return {}
+    usage = getattr(message, "usage_metadata", None) or {}
+    stats.incr("prompt_tokens", int(usage.get("input_tokens") or 0))
+    stats.incr("completion_tokens", int(usage.get("output_tokens") or 0))
+
+    out: Dict[int, Dict] = {}
+    for info in (result or {}).get("listings", []) or []:
+        if not isinstance(info, dict):
+            continue
+        idx = info.get("index")
+        if isinstance(idx, str) and idx.strip().isdigit():
+            idx = int(idx)
+        # Records without a valid index can't be placed safely; they are retried instead
+        if idx in wanted and idx not in out:
+            out[idx] = {k: v for k, v in info.items() if v is not None and k != "index"}
+    return out
+
+
+def parse_listings_with_llm(llm, listing_texts: List[str],
+                            max_batch_tokens: int = LLM_BATCH_MAX_TOKENS,
+                            max_batch_listings: int = LLM_BATCH_MAX_LISTINGS,
+                            concurrency: int = LLM_BATCH_CONCURRENCY,
+                            retries: int = LLM_BATCH_RETRIES,
+                            stats: Optional[LLMParseStats] = None) -> List[Dict]:
+    """Structured fields for each listing text, aligned with the input ({} when unresolved).
+
+    Snippets are capped at LLM_SNIPPET_MAX_TOKENS, packed into batches by measured
+    token count and sent `concurrency` at a time. Every reply record is placed by
+    its `index`, never by position; indices a reply leaves out are re-batched and
+    retried up to `retries` more times.
+    """
+    if not listing_texts:
+        return []
+    stats = stats if stats is not None else LLMParseStats()
+    start = time.perf_counter()
+    chain = _PROMPT | llm
+    config = run_config("listing_batch")  # captured here so pool threads keep the caller's tags
+
+    items = []
+    for i, txt in enumerate(listing_texts):
+        snippet = truncate_tokens((txt or "").strip(), LLM_SNIPPET_MAX_TOKENS)
+        items.append((i, snippet, count_tokens(snippet) + 4))  # + the "[i] " prefix and separator
+
+    results: Dict[int, Dict] = {}
+    pending = items
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for attempt in range(retries + 1):
+            if not pending:
+                break
+            if attempt:
+                stats.incr("retried_listings", len(pending))
+            batches = plan_batches(pending, max_batch_tokens, max_batch_listings)
+            stats.incr("batches", len(batches))
+            for found in pool.map(lambda b: _run_batch(chain, b, stats, config), batches):
+                results.update(found)
+            pending = [item for item in pending if item[0] not in results]
 
-    return parsed_list
+    stats.incr("listings", len(listing_texts))
+    stats.incr("parsed", len(results))
+    stats.incr("unresolved", len(pending))
+    stats.incr("wall_s", time.perf_counter() - start)
+    print(f"[LLM-PARSE] {stats.as_dict()}")
+    return [results.get(i, {}) for i in range(len(listing_texts))]
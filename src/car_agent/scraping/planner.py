@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import math
+
+from car_agent.scraping.constants import PLANNER_PRIOR_CARDS_PER_PAGE, PLANNER_PRIOR_MATCH_RATE
+
+
+class PagePlanner:
+    """Decides how many search pages to keep in flight from the observed match rate.
+
+    Before any page has come back it assumes PLANNER_PRIOR_* values; afterwards
+    it uses the average cards per page and a smoothed matches-per-card rate, so a
+    query that matches densely stops at one page and a sparse one fans out.
+    """
+
+    def __init__(self, max_results: int, parallelism: int,
+                 prior_cards: float = PLANNER_PRIOR_CARDS_PER_PAGE,
+                 prior_rate: float = PLANNER_PRIOR_MATCH_RATE):
+        self.max_results = max_results
+        self.parallelism = max(1, parallelism)
+        self.prior_cards = prior_cards
+        self.prior_rate = prior_rate
+        self.pages_seen = 0
+        self.cards_seen = 0
+        self.resolved = 0
+        self.matched = 0
+
+    def observe_page(self, n_cards: int) -> None:
+        self.pages_seen += 1
+        self.cards_seen += n_cards
+
+    def observe_outcome(self, matched: bool) -> None:
+        self.resolved += 1
+        self.matched += int(matched)
+
+    @property
+    def cards_per_page(self) -> float:
+        return self.cards_seen / self.pages_seen if self.pages_seen else self.prior_cards
+
+    @property
+    def match_rate(self) -> float:
+        # Beta-style smoothing: behaves like 4 prior observations at prior_rate
+        return (self.matched + 4 * self.prior_rate) / (self.resolved + 4)
+
+    def pages_wanted(self, pending_cards: int, pages_in_flight: int) -> int:
+        """Extra pages to request now (0 if what is pending should be enough)."""
+        expected = self.matched + pending_cards * self.match_rate
+        expected += pages_in_flight * self.cards_per_page * self.match_rate
+        deficit = self.max_results - expected
+        if deficit <= 0:
+            return 0 if (pending_cards or pages_in_flight) else 1
+        per_page = max(self.cards_per_page * self.match_rate, 1e-6)
+        want = math.ceil(deficit / per_page)
+        return max(0, min(want, self.parallelism - pages_in_flight))
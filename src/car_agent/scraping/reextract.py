@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from car_agent.config import Settings
+from car_agent.scraping.archive import PageArchive, build_page_archive
+from car_agent.scraping.drive_scraper import parse_search_cards
+from car_agent.scraping.extract import extract_detail
+
+
+@dataclass
+class ReextractReport:
+    workers: int = 0
+    pages: int = 0
+    detail_pages: int = 0
+    search_pages: int = 0
+    records: int = 0
+    missing: int = 0    # manifest entry whose body is gone
+    failed: int = 0     # extractor raised
+    wall_s: float = 0.0
+
+    @property
+    def pages_per_s(self) -> float:
+        return self.pages / self.wall_s if self.wall_s else 0.0
+
+    def as_dict(self) -> Dict:
+        out = asdict(self)
+        out["wall_s"] = round(self.wall_s, 3)
+        out["pages_per_s"] = round(self.pages_per_s, 1)
+        return out
+
+
+# ----- worker side (one archive handle per process) -----
+
+_worker_archive: Optional[PageArchive] = None
+
+
+def _init_worker(settings: Settings) -> None:
+    global _worker_archive
+    _worker_archive = build_page_archive(settings)
+
+
+def _extract_entry(archive: PageArchive, entry: Dict) -> Tuple[str, List[Dict]]:
+    body = archive.get(entry["sha256"])
+    if body is None:
+        return "missing", []
+    html = body.decode("utf-8", errors="replace")
+    provenance = {"sha256": entry["sha256"], "fetched_at": entry["fetched_at"]}
+    try:
+        if entry["kind"] == "detail":
+            return "ok", [{**extract_detail(html, entry["url"]), **provenance}]
+        return "ok", [{**card, "kind": "card", "search_url": entry["url"], **provenance}
+                      for card in parse_search_cards(html)]
+    except Exception as e:
+        print(f"[REEXTRACT] ❌ {entry['url']}: {e}")
+        return "failed", []
+
+
+def _extract_batch(entries: List[Dict]) -> List[Tuple[str, str, List[Dict]]]:
+    return [(e["kind"],) + _extract_entry(_worker_archive, e) for e in entries]
+
+
+# ----- driver -----
+
+def _batches(entries: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    batch: List[Dict] = []
+    for e in entries:
+        batch.append(e)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def reextract_archive(settings: Settings, sink: Callable[[Dict], None], workers: Optional[int] = None,
+                      kinds: Tuple[str, ...] = ("detail", "search"), batch_size: int = 32) -> ReextractReport:
+    """Re-run the current extractors over the latest archived copy of every page.
+
+    Pages are read straight from the archive (no network) and parsed by a
+    process pool; at most two batches per worker are in flight so memory stays
+    flat however large the archive is. Records are passed to `sink` in
+    completion order.
+    """
+    archive = build_page_archive(settings)
+    if archive is None:
+        raise ValueError("no archive configured (set HTML_ARCHIVE_DIR or HTML_ARCHIVE_BUCKET)")
+    workers = workers or os.cpu_count() or 1
+    report = ReextractReport(workers=workers)
+    entries = [e for e in archive.latest().values() if e["kind"] in kinds]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings,)) as pool:
+        inflight: Deque = deque()
+        batches = _batches(entries, batch_size)
+        exhausted = False
+        while True:
+            while not exhausted and len(inflight) < 2 * workers:
+                batch = next(batches, None)
+                if batch is None:
+                    exhausted = True
+                    break
+                inflight.append(pool.submit(_extract_batch, batch))
+            if not inflight:
+                break
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                inflight.remove(fut)
+                for kind, status, records in fut.result():
+                    report.pages += 1
+                    if kind == "detail":
+                        report.detail_pages += 1
+                    else:
+                        report.search_pages += 1
+                    if status == "missing":
+                        report.missing += 1
+                    elif status == "failed":
+                        report.failed += 1
+                    for record in records:
+                        report.records += 1
+                        sink(record)
+    report.wall_s = time.perf_counter() - start
+    return report
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+
+
+@dataclass
+class CrawlReport:
+    """Per-crawl counters, filled in by scrape_drive and printed at the end."""
+
+    search_pages: int = 0
+    cards_seen: int = 0
+    cards_rejected: int = 0      # failed the card-level pre-filter
+    cards_complete: int = 0      # passed with every field on the card, no detail fetch needed
+    cards_unchanged: int = 0     # already seen by this recurring query, content unchanged
+    detail_fetches: int = 0
+    listings_resolved: int = 0   # listings built from a card or detail page
+    fallback_listings: int = 0   # queued for the LLM: a checked field missing or low-confidence
+    fallback_resolved: int = 0   # every checked field trusted after the LLM pass
+    fallback_batches: int = 0    # LLM requests spent on the queue
+    results: int = 0
+    complete: bool = False       # ran off the end of the results with nothing cut by max_results
+
+    @property
+    def detail_fetches_avoided(self) -> int:
+        return self.cards_rejected + self.cards_complete + self.cards_unchanged
+
+    @property
+    def fallback_rate(self) -> float:
+        return self.fallback_listings / self.listings_resolved if self.listings_resolved else 0.0
+
+    def as_dict(self) -> dict:
+        d = asdict(self)
+        d["detail_fetches_avoided"] = self.detail_fetches_avoided
+        d["fallback_rate"] = round(self.fallback_rate, 3)
+        return d
+
+    def summary(self) -> str:
+        return (
+            f"{self.cards_seen} cards on {self.search_pages} pages, "
+            f"{self.cards_rejected} rejected on the card, {self.cards_complete} complete on the card, "
+            f"{self.cards_unchanged} unchanged since last run, "
+            f"{self.detail_fetches} detail fetches ({self.detail_fetches_avoided} avoided), "
+            f"{self.fallback_listings}/{self.listings_resolved} listings to the LLM fallback "
+            f"({self.fallback_rate:.0%}, {self.fallback_resolved} resolved, {self.fallback_batches} requests), "
+            f"{self.results} results"
+        )
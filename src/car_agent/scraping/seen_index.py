@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import hashlib
+import struct
+import time
+import zlib
+from array import array
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from car_agent.scraping.constants import SEEN_INDEX_MAX_AGE_DAYS, SEEN_INDEX_MAX_ENTRIES
+
+_MAGIC = b"SIX1"
+_HEADER = struct.Struct("<4sI")
+
+NEW, CHANGED, SEEN = "new", "changed", "seen"
+
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return f"{parts.netloc.lower()}{path}"
+
+
+def url_fingerprint(url: str) -> int:
+    return int.from_bytes(hashlib.blake2b(normalize_url(url).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def content_hash(listing: Dict) -> int:
+    """32-bit hash of the fields a card shows that matter for 'changed'."""
+    key = f"{listing.get('name') or ''}|{listing.get('price') or ''}|{listing.get('mileage') or ''}"
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def _today() -> int:
+    return int(time.time() // 86400)
+
+
+class SeenIndex:
+    """Listings a recurring query has already seen: url fingerprint -> (content hash, day).
+
+    Serialized as three parallel arrays (uint64 fingerprints, uint32 hashes,
+    uint16 days since epoch) sorted by fingerprint and zlib-compressed: ~14
+    bytes per listing before compression, decoded with array.frombytes. An exact
+    fingerprint set is used rather than a Bloom filter because entries must expire
+    and carry a content hash, which a Bloom filter cannot do.
+    """
+
+    def __init__(self, entries: Optional[Dict[int, Tuple[int, int]]] = None):
+        self._entries: Dict[int, Tuple[int, int]] = entries or {}
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def status(self, url: str, chash: int) -> str:
+        entry = self._entries.get(url_fingerprint(url))
+        if entry is None:
+            return NEW
+        return SEEN if entry[0] == chash else CHANGED
+
+    def mark(self, url: str, chash: int) -> None:
+        self._entries[url_fingerprint(url)] = (chash, _today())
+        self.dirty = True
+
+    def expire(self, max_age_days: int = SEEN_INDEX_MAX_AGE_DAYS,
+               max_entries: int = SEEN_INDEX_MAX_ENTRIES) -> int:
+        """Drop entries not seen for `max_age_days`, then the oldest beyond `max_entries`."""
+        before = len(self._entries)
+        cutoff = _today() - max_age_days
+        kept = {fp: e for fp, e in self._entries.items() if e[1] >= cutoff}
+        if len(kept) > max_entries:
+            newest = sorted(kept.items(), key=lambda kv: kv[1][1], reverse=True)[:max_entries]
+            kept = dict(newest)
+        self._entries = kept
+        dropped = before - len(kept)
+        self.dirty = self.dirty or dropped > 0
+        return dropped
+
+    def to_bytes(self) -> bytes:
+        fps = sorted(self._entries)
+        a_fp = array("Q", fps)
+        a_hash = array("I", (self._entries[fp][0] for fp in fps))
+        a_day = array("H", (min(self._entries[fp][1], 0xFFFF) for fp in fps))
+        payload = a_fp.tobytes() + a_hash.tobytes() + a_day.tobytes()
+        return _HEADER.pack(_MAGIC, len(fps)) + zlib.compress(payload, 6)
+
+    @classmethod
+    def from_bytes(cls, blob: Optional[bytes]) -> "SeenIndex":
+        if not blob:
+            return cls()
+        magic, n = _HEADER.unpack_from(blob)
+        if magic != _MAGIC:
+            raise ValueError("not a seen-index blob")
+        payload = zlib.decompress(blob[_HEADER.size:])
+        a_fp, a_hash, a_day = array("Q"), array("I"), array("H")
+        a_fp.frombytes(payload[:8 * n])
+        a_hash.frombytes(payload[8 * n:12 * n])
+        a_day.frombytes(payload[12 * n:14 * n])
+        return cls(dict(zip(a_fp, zip(a_hash, a_day))))
+
+
+class CombinedSeenIndex:
+    """Read-only view of several queries' seen indexes, for a crawl they share.
+
+    A listing is SEEN only when every index has seen it unchanged, so the crawl
+    skips it for all of them. mark() does nothing: each query marks its own
+    index after the crawl, once it knows what it was sent.
+    """
+
+    def __init__(self, indexes):
+        self._indexes = list(indexes)
+
+    def status(self, url: str, chash: int) -> str:
+        statuses = {index.status(url, chash) for index in self._indexes}
+        if not statuses or NEW in statuses:
+            return NEW
+        return SEEN if statuses == {SEEN} else CHANGED
+
+    def mark(self, url: str, chash: int) -> None:
+        pass
+
+
+def load_seen_index(storage, query_id: str) -> SeenIndex:
+    return SeenIndex.from_bytes(storage.load_seen_index(query_id) if storage else None)
+
+
+def save_seen_index(storage, query_id: str, index: SeenIndex) -> None:
+    index.expire()
+    if storage and index.dirty:
+        storage.save_seen_index(query_id, index.to_bytes())
+        index.dirty = False
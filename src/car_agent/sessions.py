@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Optional, Tuple
+
+from car_agent.config import Settings
+
+SESSION_MAX_EXTRACTIONS = 16   # remembered extraction results per session
+SESSION_CACHE_MAX_ENTRIES = 1024
+
+
+@dataclass
+class Session:
+    """Server-side conversation state, addressed by `token` ("<id>.<rev>").
+
+    `data` is what process_conversation reads and writes (state, merged
+    criteria). `extractions` holds extraction results keyed by kind and
+    normalized message. `last_turn` holds the last turn's turn_id and result, so
+    a retried turn is answered again instead of being run twice.
+    """
+
+    session_id: str
+    user_id: str
+    rev: int = 0
+    data: Dict[str, Any] = field(default_factory=dict)
+    extractions: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    last_turn: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def token(self) -> str:
+        return f"{self.session_id}.{self.rev}"
+
+    def trim(self) -> None:
+        """Keep the newest SESSION_MAX_EXTRACTIONS extraction results."""
+        while len(self.extractions) > SESSION_MAX_EXTRACTIONS:
+            del self.extractions[next(iter(self.extractions))]
+
+    def to_record(self) -> Dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+class SessionConflict(Exception):
+    """The shared store holds a newer revision than the one the turn started from."""
+
+
+def parse_token(token: Optional[str]) -> Tuple[str, int]:
+    """(session_id, rev); rev -1 for a missing or malformed token."""
+    session_id, _, rev = (token or "").partition(".")
+    return (session_id, int(rev)) if session_id and rev.isdigit() else ("", -1)
+
+
+def first_turn_session_id(user_id: str, turn_id: str) -> str:
+    """Id for a session opened by a tokenless turn, so a retry of that turn finds it."""
+    digest = hashlib.sha256(f"{user_id}\x00{turn_id}".encode("utf-8")).digest()
+    return base64.urlsafe_b64encode(digest[:12]).decode("ascii")
+
+
+class SqliteSessionStore:
+    """Local stand-in for the sessions table: one row per session, expiry checked on read."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(session_id TEXT PRIMARY KEY, record TEXT NOT NULL, expires_at INTEGER NOT NULL)"
+            )
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, int(time.time()))
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, record: Dict[str, Any], ttl_s: float) -> None:
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT record FROM sessions WHERE session_id = ?",
+                                     (record["session_id"],)).fetchone()
+            if row and json.loads(row[0])["rev"] != record["rev"] - 1:
+                raise SessionConflict(record["session_id"])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, record, expires_at) VALUES (?, ?, ?)",
+                (record["session_id"], json.dumps(record), int(time.time() + ttl_s)),
+            )
+
+
+class DynamoSessionStore:
+    """Sessions in DynamoDB: HASH session_id, TTL attribute expires_at."""
+
+    def __init__(self, table):
+        self._table = table
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        from botocore.exceptions import ClientError
+
+        try:
+            item = self._table.get_item(Key={"session_id": session_id}, ConsistentRead=True).get("Item")
+        except ClientError as e:
+            print(f"Error reading session: {e}")
+            return None
+        # TTL deletion can lag by hours, so check expiry ourselves
+        if not item or int(item.get("expires_at", 0)) <= time.time():
+            return None
+        return json.loads(item["record"])
+
+    def put(self, record: Dict[str, Any], ttl_s: float) -> None:
+        from botocore.exceptions import ClientError
+
+        try:
+            self._table.put_item(Item={"session_id": record["session_id"], "user_id": record["user_id"],
+                                       "rev": record["rev"], "record": json.dumps(record),
+                                       "expires_at": int(time.time() + ttl_s)},
+                                 ConditionExpression="attribute_not_exists(session_id) OR rev = :prev",
+                                 ExpressionAttributeValues={":prev": record["rev"] - 1})
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                raise SessionConflict(record["session_id"]) from e
+            print(f"Error writing session: {e}")
+
+
+@dataclass
+class SessionStats:
+    memory_hits: int = 0
+    store_reads: int = 0
+    created: int = 0      # no token, or an unknown/expired/foreign one
+    writes: int = 0
+    conflicts: int = 0    # saves refused because a stale cached copy was used
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+
+
+class SessionStore:
+    """Conversation sessions: bounded in-process LRU read-through in front of an optional shared store.
+
+    Every save bumps the revision in the token handed back to the client. A
+    cached copy is used only when its revision matches the token presented.
+    Another container that served a later turn leaves this one's copy stale, and
+    that copy is then re-read (consistently) from the shared store. A retry
+    still holding the old token can match a stale copy. The shared store only
+    accepts a save one revision past what it holds, so that case raises
+    SessionConflict, and the caller reloads with `fresh=True`.
+    """
+
+    def __init__(self, store=None, max_entries: int = SESSION_CACHE_MAX_ENTRIES, ttl_s: float = 86400):
+        self._store = store
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.stats = SessionStats()
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, token: Optional[str], user_id: str, fresh: bool = False,
+             turn_id: Optional[str] = None) -> Session:
+        """The session for `token`, or a new one if it is unknown, expired or another user's.
+
+        Without a token, `turn_id` names the session, so a retried first turn
+        (whose response, and token, never arrived) finds it again.
+        """
+        session_id, rev = parse_token(token)
+        if not session_id and turn_id:
+            session_id = first_turn_session_id(user_id, turn_id)
+        record = None
+        if session_id:
+            with self._lock:
+                cached = self._memory.get(session_id)
+                if cached and cached[0] > time.time() and cached[1]["rev"] == rev and not fresh:
+                    self._memory.move_to_end(session_id)
+                    record = cached[1]
+            if record is not None:
+                self.stats.incr("memory_hits")
+            elif self._store is not None:
+                self.stats.incr("store_reads")
+                record = self._store.get(session_id)
+            elif cached and cached[0] > time.time():
+                record = cached[1]  # memory-only: the cached copy is the only copy
+        if record is None or record.get("user_id") != user_id:
+            self.stats.incr("created")
+            new_id = first_turn_session_id(user_id, turn_id) if turn_id and not token else secrets.token_urlsafe(12)
+            return Session(session_id=new_id, user_id=user_id)
+        return Session(**json.loads(json.dumps(record)))  # callers mutate it; keep the cached copy intact
+
+    def save(self, session: Session) -> str:
+        """Write the session through to the shared store; returns the new token.
+
+        Raises SessionConflict if the store moved on since the session was loaded.
+        """
+        session.rev += 1
+        record = json.loads(json.dumps(session.to_record()))
+        if self._store is not None:
+            try:
+                self._store.put(record, self.ttl_s)
+            except SessionConflict:
+                session.rev -= 1
+                self.stats.incr("conflicts")
+                raise
+        self.stats.incr("writes")
+        with self._lock:
+            self._memory[session.session_id] = (time.time() + self.ttl_s, record)
+            self._memory.move_to_end(session.session_id)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        return session.token
+
+
+def build_session_store(settings: Settings, dynamodb_resource=None) -> SessionStore:
+    if settings.sessions_table_name:
+        if dynamodb_resource is None:
+            from car_agent.aws.clients import build_dynamodb
+
+            dynamodb_resource = build_dynamodb(settings)
+        store = DynamoSessionStore(dynamodb_resource.Table(settings.sessions_table_name))
+    elif settings.session_sqlite_path:
+        store = SqliteSessionStore(settings.session_sqlite_path)
+    else:
+        store = None
+    return SessionStore(store, ttl_s=settings.session_ttl_s)
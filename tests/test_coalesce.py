@@ -0,0 +1,89 @@
+from car_agent.scraping.coalesce import (
+    CrawlCoalescer,
+    LocalLeaseStore,
+    crawl_key,
+    crawl_spec,
+    filter_shared,
+    group_queries,
+    subsumes,
+)
+
+TOYOTA = {"make": "Toyota", "model": "Corolla", "location": "VIC"}
+
+
+def test_filter_shared_enforces_price_min():
+    listings = [{"url": "a", "price": 5000, "year": 2015, "mileage": 90000},
+                {"url": "b", "price": 12000, "year": 2016, "mileage": 80000}]
+    criteria = dict(TOYOTA, price_min=10000)
+    assert [l["url"] for l in filter_shared(listings, criteria, 10)] == ["b"]
+
+
+def test_transmission_only_shares_identical_values():
+    loose = crawl_spec(TOYOTA)
+    manual = crawl_spec(dict(TOYOTA, transmission="Manual"))
+    assert not subsumes(loose, manual)
+    assert subsumes(manual, crawl_spec(dict(TOYOTA, transmission="manual", price_max=20000)))
+    assert not subsumes(manual, crawl_spec(dict(TOYOTA, transmission="Automatic")))
+
+
+def test_group_queries_keeps_transmission_queries_apart():
+    groups = group_queries({
+        "loose": dict(TOYOTA),
+        "manual": dict(TOYOTA, price_min=10000, transmission="Manual"),
+        "cheap": dict(TOYOTA, price_max=20000),
+    })
+    assert sorted(sorted(members) for _, members in groups) == [["cheap", "loose"], ["manual"]]
+
+
+def test_same_crawl_key_joins_the_same_group():
+    a = dict(TOYOTA, price_max=20000)
+    b = {"make": " toyota", "model": "Corolla ", "location": "Victoria", "price_max": "20000"}
+    assert crawl_key(a) == crawl_key(b)
+    groups = group_queries({"a": a, "b": b, "manual": dict(TOYOTA, transmission="Manual")})
+    assert sorted(sorted(members) for _, members in groups) == [["a", "b"], ["manual"]]
+
+
+def _listings(n):
+    return [{"url": f"u{i}", "price": 1000 * (i + 1), "year": 2015, "mileage": 50000} for i in range(n)]
+
+
+def _fake_crawl(stock, calls):
+    """CrawlFn over a fixed stock of listings, cheapest first, with scrape_drive's cap semantics."""
+    def crawl(criteria, max_results):
+        calls.append(criteria)
+        matched = filter_shared(stock, criteria, len(stock))
+        return matched[:max_results], 1, len(matched) < max_results
+    return crawl
+
+
+def test_capped_crawl_is_not_shared_with_stricter_query():
+    calls = []
+    coalescer = CrawlCoalescer(_fake_crawl(_listings(30), calls))
+    results = coalescer.fetch_many({
+        "loose": (dict(TOYOTA), 5),
+        "strict": (dict(TOYOTA, price_min=20000), 5),
+    })
+    assert [l["url"] for l in results["strict"]] == ["u19", "u20", "u21", "u22", "u23"]
+    assert len(results["loose"]) == 5
+    assert len(calls) == 2
+
+
+def test_complete_crawl_is_shared_with_stricter_query():
+    calls = []
+    coalescer = CrawlCoalescer(_fake_crawl(_listings(4), calls))
+    results = coalescer.fetch_many({
+        "loose": (dict(TOYOTA), 5),
+        "strict": (dict(TOYOTA, price_max=2000), 5),
+    })
+    assert [l["url"] for l in results["strict"]] == ["u0", "u1"]
+    assert len(calls) == 1
+    assert coalescer.report.shared_in_process == 1
+
+
+def test_lease_result_from_capped_crawl_is_not_reused_by_stricter_query():
+    calls, leases = [], LocalLeaseStore()
+    crawl = _fake_crawl(_listings(30), calls)
+    CrawlCoalescer(crawl, leases).fetch(dict(TOYOTA), 5)
+    strict = CrawlCoalescer(crawl, leases).fetch(dict(TOYOTA, price_min=20000), 5)
+    assert [l["url"] for l in strict] == ["u19", "u20", "u21", "u22", "u23"]
+    assert len(calls) == 2
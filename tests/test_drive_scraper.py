@@ -0,0 +1,64 @@
+import pytest
+
+from car_agent.scraping import drive_scraper
+from car_agent.scraping.archive import set_page_archive
+from car_agent.scraping.http_cache import set_detail_cache
+from car_agent.scraping.seen_index import NEW, SEEN, SeenIndex, content_hash
+
+CRITERIA = {"make": "Mazda", "model": "CX-5", "location": "VIC", "price_max": 40000}
+
+
+def _card(i, mileage=50000):
+    return {"url": f"https://www.drive.com.au/cars-for-sale/car/{i}", "name": f"2019 Mazda CX-5 #{i}",
+            "price": 20000 + i, "year": 2019, "mileage": mileage, "location": "VIC",
+            "snippet": f"2019 Mazda CX-5 ${20000 + i}"}
+
+
+@pytest.fixture
+def search_pages(monkeypatch):
+    set_detail_cache(None)
+    set_page_archive(None)
+    pages = {}
+    monkeypatch.setattr(drive_scraper, "fetch_search_page", lambda criteria, page: pages.get(page, []))
+    return pages
+
+
+def test_listing_held_for_llm_fallback_is_not_marked_seen(search_pages, monkeypatch):
+    # Card 0 has no mileage; its detail page only shows a weak "N km" hint, so it waits for the fallback
+    weak = {"url": _card(0)["url"], "name": None, "price": None, "year": None, "mileage": 48000,
+            "location": None, "field_sources": {"mileage": "text"}, "field_confidence": {"mileage": 0.4}}
+    monkeypatch.setattr(drive_scraper, "_scrape_detail_safe", lambda url: dict(weak))
+    cards = [_card(0, mileage=None)] + [_card(i) for i in range(1, 4)]
+    search_pages[1] = cards
+
+    index = SeenIndex()
+    results = list(drive_scraper.scrape_drive_iter(CRITERIA, max_results=3, seen_index=index))
+
+    assert [r["url"] for r in results] == [c["url"] for c in cards[1:]]
+    assert index.status(cards[0]["url"], content_hash(cards[0])) == NEW
+    assert all(index.status(c["url"], content_hash(c)) == SEEN for c in cards[1:])
+
+
+def test_listing_past_max_results_is_not_marked_seen(search_pages):
+    cards = [_card(i) for i in range(4)]
+    search_pages[1] = cards
+
+    index = SeenIndex()
+    results = list(drive_scraper.scrape_drive_iter(CRITERIA, max_results=2, seen_index=index))
+
+    assert len(results) == 2
+    assert [index.status(c["url"], content_hash(c)) for c in cards] == [SEEN, SEEN, NEW, NEW]
+
+
+def test_card_without_year_is_kept_for_extraction():
+    card = dict(_card(5), year=None, name="Mazda CX-5 Maxx Sport", snippet="Mazda CX-5 Maxx Sport $25,000")
+    assert drive_scraper.card_matches_criteria(card, dict(CRITERIA, year_min=2018))
+    old = dict(_card(6), year=2012, snippet="2012 Mazda CX-5 $15,000")
+    assert not drive_scraper.card_matches_criteria(old, dict(CRITERIA, year_min=2018))
+
+
+def test_unique_listing_urls_keep_page_order(search_pages):
+    search_pages[1] = [_card(3), _card(1)]
+    search_pages[2] = [_card(1), _card(2)]
+    urls = drive_scraper.get_unique_listing_urls(CRITERIA, max_page=3)
+    assert urls == [_card(i)["url"] for i in (3, 1, 2)]
@@ -0,0 +1,80 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from car_agent.scraping.blob_store import FileBlobStore
+from car_agent.scraping.http_cache import INDEX_KEY, DetailPageCache
+
+
+class FakeResponse:
+    def __init__(self, html, etag):
+        self.content = html.encode("utf-8")
+        self.headers = {"ETag": etag}
+
+
+def _cache(store, version=1):
+    return DetailPageCache(store, max_bytes=1 << 20, ttl_s=3600, record_version=version)
+
+
+def _indexed_urls(store):
+    return sorted(e["url"] for e in json.loads(store.get(INDEX_KEY)))
+
+
+def test_record_from_older_extractor_is_reextracted(tmp_path):
+    store = FileBlobStore(str(tmp_path))
+    old = _cache(store, version=1)
+    old.put("https://x/1", FakeResponse("<p>page</p>", '"a"'), {"price": 1})
+    old.flush()
+
+    new = _cache(store, version=2)
+    entry = new.lookup("https://x/1")
+    record = new.record("https://x/1", entry, lambda html, url: {"price": 2, "html": html})
+    assert record == {"price": 2, "html": "<p>page</p>"}
+    assert new.stats.reextracted == 1
+    new.flush()
+    assert _cache(store, version=2).lookup("https://x/1")["record_version"] == 2
+
+
+def test_concurrent_flushes_keep_each_others_entries(tmp_path):
+    store = FileBlobStore(str(tmp_path))
+    a, b = _cache(store), _cache(store)
+    a.lookup("https://x/a")
+    b.lookup("https://x/b")  # both loaded the (empty) index before either flushed
+    a.put("https://x/a", FakeResponse("a", '"a"'), {})
+    b.put("https://x/b", FakeResponse("b", '"b"'), {})
+    a.flush()
+    b.flush()
+    assert _indexed_urls(store) == ["https://x/a", "https://x/b"]
+
+
+class RacingStore(FileBlobStore):
+    """Another process writes the index between our read and our conditional put, once."""
+
+    def __init__(self, root, intruder):
+        super().__init__(root)
+        self.intruder = intruder
+
+    def put_if(self, key, data, version):
+        if self.intruder:
+            intruder, self.intruder = self.intruder, None
+            intruder.flush()
+        return super().put_if(key, data, version)
+
+
+def test_flush_retries_when_index_changed_underneath(tmp_path):
+    other = _cache(FileBlobStore(str(tmp_path)))
+    other.put("https://x/other", FakeResponse("o", '"o"'), {})
+    store = RacingStore(str(tmp_path), other)
+    cache = _cache(store)
+    cache.put("https://x/mine", FakeResponse("m", '"m"'), {})
+    cache.flush()
+    assert cache.stats.flush_conflicts == 1
+    assert _indexed_urls(store) == ["https://x/mine", "https://x/other"]
+
+
+def test_concurrent_puts_to_one_key_do_not_collide(tmp_path):
+    store = FileBlobStore(str(tmp_path))
+    blobs = [bytes([i]) * 4096 for i in range(16)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda b: [store.put("index.json", b) for _ in range(20)], blobs))
+    assert store.get("index.json") in blobs
+    assert [p.name for p in tmp_path.iterdir()] == ["index.json"]  # no temp files left behind
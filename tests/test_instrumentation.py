@@ -0,0 +1,27 @@
+import uuid
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from car_agent.llm.instrumentation import CALL_BUFFER_MAX, LLMMetrics
+
+
+def _call(metrics, chain="parse"):
+    run_id = uuid.uuid4()
+    metrics.on_chat_model_start({}, [], run_id=run_id, metadata={"chain": chain},
+                                invocation_params={"model_name": "gpt-4o-mini"})
+    message = AIMessage("{}", usage_metadata={"input_tokens": 10, "output_tokens": 2, "total_tokens": 12})
+    metrics.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+
+
+def test_call_buffer_is_capped_when_emit_is_never_called():
+    metrics = LLMMetrics()
+    for _ in range(CALL_BUFFER_MAX + 50):
+        _call(metrics)
+    assert len(metrics._calls) == CALL_BUFFER_MAX
+    assert metrics.snapshot()["parse/none"]["calls"] == CALL_BUFFER_MAX + 50
+
+    docs = metrics.emf_documents(list(metrics._calls))
+    assert "Retries" not in docs[0]
+    metrics.emit()
+    assert len(metrics._calls) == 0
@@ -0,0 +1,63 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from car_agent.agent import CarScraperAgent
+from car_agent.aws.tables import create_tables
+from car_agent.config import Settings
+from car_agent.jobs import DONE, FAILED, DynamoJobStore, SearchJobs, SqliteJobStore
+
+CRITERIA = {"make": "Mazda", "model": "CX-5", "location": "VIC"}
+
+
+@pytest.fixture
+def dynamo_jobs():
+    with mock_aws():
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+        create_tables(dynamodb, Settings())
+        yield SearchJobs(DynamoJobStore(dynamodb.Table("CarSearchJobs")), dispatch=lambda job_id, run: True)
+
+
+def test_listings_are_stored_as_separate_items(dynamo_jobs):
+    job = dynamo_jobs.submit("u", CRITERIA)
+    assert dynamo_jobs.claim(job["job_id"], job["run"])
+    big = "x" * 150_000  # three of these in one item would pass DynamoDB's 400 KB limit
+    for i in range(5):
+        assert dynamo_jobs.append(job["job_id"], job["run"], {"url": f"u{i}", "snippet": big})
+    assert dynamo_jobs.finish(job["job_id"], job["run"], DONE, search_id="s1")
+
+    got = dynamo_jobs.get(job["job_id"], "u")
+    assert got["status"] == DONE and got["search_id"] == "s1"
+    assert [l["url"] for l in got["listings"]] == [f"u{i}" for i in range(5)]
+
+
+def test_superseded_run_cannot_append(dynamo_jobs):
+    first = dynamo_jobs.submit("u", CRITERIA)
+    dynamo_jobs.claim(first["job_id"], first["run"])
+    assert dynamo_jobs.append(first["job_id"], first["run"], {"url": "old"})
+    dynamo_jobs.finish(first["job_id"], first["run"], FAILED, error="boom")
+
+    second = dynamo_jobs.submit("u", CRITERIA)
+    assert second["run"] != first["run"]
+    dynamo_jobs.claim(second["job_id"], second["run"])
+    assert not dynamo_jobs.append(first["job_id"], first["run"], {"url": "stale"})
+    assert dynamo_jobs.append(second["job_id"], second["run"], {"url": "new"})
+    assert [l["url"] for l in dynamo_jobs.get(second["job_id"], "u")["listings"]] == ["new"]
+
+
+class FailingStorage:
+    def store_search(self, *args, **kwargs):
+        raise RuntimeError("results table is missing")
+
+
+def test_search_job_fails_when_the_search_cannot_be_stored():
+    agent = CarScraperAgent(Settings(), enable_aws=False)
+    agent.search_jobs = SearchJobs(SqliteJobStore(":memory:"), dispatch=lambda job_id, run: True)
+    agent.storage = FailingStorage()
+    agent.scrape_cars_iter = lambda criteria: iter([{"url": "u0"}, {"url": "u1"}])
+
+    job = agent.search_jobs.submit("u", CRITERIA)
+    agent.run_search_job(job["job_id"], job["run"])
+    got = agent.search_jobs.get(job["job_id"], "u")
+    assert got["status"] == FAILED
+    assert "results table is missing" in got["error"]
@@ -0,0 +1,30 @@
+from car_agent.llm.rules import parse_criteria
+
+
+def test_bare_year_after_up_to_is_a_year_not_a_price():
+    parsed = parse_criteria("Mazda CX-5 up to 2020")
+    assert parsed.fields == {"make": "Mazda", "model": "CX-5", "year_max": 2020}
+    assert parsed.confident
+
+
+def test_year_and_price_in_one_message():
+    parsed = parse_criteria("Toyota Corolla up to 2020 under $30k")
+    assert parsed.fields["price_max"] == 30000
+    assert parsed.fields["year_max"] == 2020
+    assert parsed.confident
+
+
+def test_bare_price_still_parses():
+    assert parse_criteria("Mazda CX-5 under 25000").fields["price_max"] == 25000
+    assert parse_criteria("Mazda CX-5 under 20k").fields["price_max"] == 20000
+
+
+def test_conflicting_prices_go_to_the_llm():
+    parsed = parse_criteria("Mazda CX-5 under $20k, budget of 25000")
+    assert not parsed.confident
+
+
+def test_bare_year_goes_to_the_llm():
+    parsed = parse_criteria("2018 Toyota Camry under $25,000 in Sydney")
+    assert not parsed.confident
+    assert "2018" in parsed.unparsed
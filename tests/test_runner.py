@@ -0,0 +1,90 @@
+import pytest
+
+from car_agent.config import Settings
+from car_agent.runner import RecurringRunner
+from car_agent.scraping import drive_scraper
+from car_agent.scraping.archive import set_page_archive
+from car_agent.scraping.http_cache import set_detail_cache
+
+CRITERIA = {"make": "Mazda", "model": "CX-5", "location": "VIC"}
+
+
+class FakeStorage:
+    def __init__(self, queries):
+        self.queries = {q["query_id"]: q for q in queries}
+        self.indexes = {}
+        self.stored = {}
+
+    def get_query(self, qid, consistent=False):
+        return self.queries.get(qid)
+
+    def load_seen_index(self, qid):
+        return self.indexes.get(qid)
+
+    def save_seen_index(self, qid, blob):
+        self.indexes[qid] = blob
+
+    def store_search(self, user_id, criteria, listings, kind, query_id=None):
+        self.stored[query_id] = [l["url"] for l in listings]
+
+    def reschedule_query(self, qid, frequency, ran_at):
+        pass
+
+
+def _card(i):
+    # Search-result cards show no mileage, so every one needs its detail page
+    return {"url": f"https://www.drive.com.au/cars-for-sale/car/{i}", "name": f"2019 Mazda CX-5 #{i}",
+            "price": 20000 + i, "year": 2019, "mileage": None, "location": "VIC",
+            "snippet": f"2019 Mazda CX-5 ${20000 + i}"}
+
+
+@pytest.fixture
+def site(monkeypatch):
+    set_detail_cache(None)
+    set_page_archive(None)
+    cards = [_card(i) for i in range(12)]
+    fetched = []
+
+    def detail(url):
+        fetched.append(url)
+        return {"url": url, "name": None, "price": None, "year": None, "mileage": 40000, "location": None,
+                "field_sources": {"mileage": "dom"}, "field_confidence": {"mileage": 0.8}}
+
+    monkeypatch.setattr(drive_scraper, "fetch_search_page",
+                        lambda criteria, page: [dict(c) for c in cards] if page == 1 else [])
+    monkeypatch.setattr(drive_scraper, "_scrape_detail_safe", detail)
+    return cards, fetched
+
+
+def test_recurring_runs_page_past_seen_listings(site):
+    cards, fetched = site
+    queries = [{"query_id": qid, "user_id": "u", "criteria": CRITERIA, "active": True, "next_run_at": 0}
+               for qid in ("q1", "q2")]
+    storage = FakeStorage(queries)
+    runner = RecurringRunner(Settings(), storage, mailer=None, max_results=5)
+
+    first = runner.run(query_ids=["q1", "q2"], now=1000)
+    assert first.new_listings == 10
+    assert storage.stored["q1"] == [c["url"] for c in cards[:5]]
+
+    fetched.clear()
+    second = runner.run(query_ids=["q1", "q2"], now=2000)
+    assert second.new_listings == 10
+    assert second.changed_listings == 0
+    assert storage.stored["q1"] == [c["url"] for c in cards[5:10]]
+    assert not set(fetched) & {c["url"] for c in cards[:5]}  # seen listings are not fetched again
+
+
+class BrokenIndexStorage(FakeStorage):
+    def load_seen_index(self, qid):
+        raise RuntimeError("ProvisionedThroughputExceededException")
+
+
+def test_query_whose_seen_index_cannot_be_read_is_skipped(site):
+    queries = [{"query_id": "q1", "user_id": "u", "criteria": CRITERIA, "active": True, "next_run_at": 0,
+                "email": "a@example.com"}]
+    storage = BrokenIndexStorage(queries)
+    report = RecurringRunner(Settings(), storage, mailer=None, max_results=5).run(query_ids=["q1"], now=1000)
+    assert report.failed == 1
+    assert report.queries_run == 0
+    assert storage.stored == {} and storage.indexes == {}
@@ -0,0 +1,45 @@
+from car_agent.agent import CarScraperAgent
+from car_agent.config import Settings
+from car_agent.sessions import SessionConflict, SessionStore, SqliteSessionStore
+
+
+class CountingAgent(CarScraperAgent):
+    """Agent whose turns are counted, so a turn run twice shows up."""
+
+    def __init__(self, store):
+        super().__init__(Settings(), enable_aws=False)
+        self.sessions = SessionStore(store)
+        self.search_jobs = None
+        self.turns_run = 0
+
+    def process_conversation(self, *args, **kwargs):
+        self.turns_run += 1
+        return super().process_conversation(*args, **kwargs)
+
+
+class RefusingStore(SqliteSessionStore):
+    def put(self, record, ttl_s):
+        raise SessionConflict(record["session_id"])
+
+
+def test_conflict_merges_into_fresh_session_without_rerunning_turn():
+    store = SqliteSessionStore(":memory:")
+    a, b = CountingAgent(store), CountingAgent(store)
+    first = a.converse("u1", "Mazda CX-5 under $20000", turn_id="t1")
+    b.converse("u1", "Mazda CX-5 under $25000", session_token=first["session_token"], turn_id="t2")
+
+    # A still caches the first revision and answers a turn sent with the stale token
+    stale = a.converse("u1", "Toyota Camry under $30000", session_token=first["session_token"], turn_id="t3")
+    assert a.turns_run == 2
+    assert stale["action"] == "continue"
+    assert stale["session_token"].endswith(".3")
+    saved = store.get(stale["session_token"].split(".")[0])
+    assert saved["rev"] == 3 and saved["data"]["state"] == "ASK_UPDATE_TYPE"
+    assert saved["last_turn"]["turn_id"] == "t3"
+
+
+def test_repeated_conflict_returns_error_instead_of_unsaved_result():
+    agent = CountingAgent(RefusingStore(":memory:"))
+    result = agent.converse("u1", "Mazda CX-5 under $20000", turn_id="t1")
+    assert agent.turns_run == 1
+    assert result["action"] == "error"